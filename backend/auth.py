@@ -1,13 +1,18 @@
 import os
+import time
 import datetime
-from typing import Optional
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from dotenv import load_dotenv
-from database import get_db
+from database import get_db, SessionLocal
+from invalidation import feed
+from password_pool import pwd_context, password_pool
 import models
 
 load_dotenv()
@@ -17,16 +22,23 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated principals are cached per token `sub` for this long (0 disables the cache)
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+# Stateless mode trusts the role claim in the access token and never touches the DB.
+# Role/activation changes then only take effect when the user's token expires.
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes")
+
 bearer_scheme = HTTPBearer()
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    """Blocking hash through the bcrypt pool; async routes use password_pool.hash_password_async."""
+    return password_pool.run_sync(pwd_context.hash, password)
 
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return password_pool.run_sync(pwd_context.verify, plain, hashed)
 
 
 def create_access_token(data: dict) -> str:
@@ -55,17 +67,185 @@ def decode_token(token: str) -> dict:
         )
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: Session = Depends(get_db),
-) -> models.User:
-    payload = decode_token(credentials.credentials)
-    if payload.get("type") != "access":
-        raise HTTPException(status_code=401, detail="Invalid token type")
+# ========================
+#  AUTHENTICATED PRINCIPAL
+# ========================
+@dataclass(frozen=True)
+class Principal:
+    """What authorization needs to know about a user; duck-types models.User for routers."""
+    id: str
+    name: str
+    email: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(id=user.id, name=user.name, email=user.email, role=user.role, is_active=bool(user.is_active))
+
+
+class PrincipalCache:
+    """
+    TTL cache of principals keyed by user id, invalidated across workers via the feed.
+
+    A lookup that read the users table before an invalidation must not cache
+    what it read: callers take generation() before the SELECT and hand it to
+    put(), which drops the principal if any invalidation happened since.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[Principal, float]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        feed.subscribe("user", self.invalidate)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: str) -> Optional[Principal]:
+        if self.ttl <= 0:
+            return None
+        feed.poll()
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        return principal
+
+    def put(self, principal: Principal, generation: int):
+        if self.ttl <= 0:
+            return
+        feed.poll()   # invalidations other workers made while we were reading
+        with self._lock:
+            if generation != self._generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                # Evict the oldest insertion
+                self._entries.pop(next(iter(self._entries)), None)
+            self._entries[principal.id] = (principal, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES)
+
+
+def invalidate_principals(user_ids: Iterable[str] = None):
+    """Drop cached principals in every worker; no ids means all users."""
+    if user_ids is None:
+        feed.publish_all("user")
+    else:
+        feed.publish("user", user_ids)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _track_user_change(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_user_changes(session):
+    # Profile, password, role and activation changes all go through a User flush
+    changed = session.info.pop("changed_user_ids", None)
+    if changed:
+        invalidate_principals(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop("changed_user_ids", None)
+
+
+# Signature-verified access tokens -> payload, so repeat requests skip the HMAC check
+_verified_tokens: Dict[str, dict] = {}
+_verified_tokens_lock = threading.Lock()
+
+
+def _access_payload(token: str) -> Tuple[dict, str]:
+    payload = _verified_tokens.get(token)
+    if payload is None or payload.get("exp", 0) <= time.time():
+        _verified_tokens.pop(token, None)
+        payload = decode_token(token)
+        if payload.get("type") != "access":
+            raise HTTPException(status_code=401, detail="Invalid token type")
+        with _verified_tokens_lock:
+            if len(_verified_tokens) >= PRINCIPAL_CACHE_MAX_ENTRIES:
+                _verified_tokens.pop(next(iter(_verified_tokens)), None)
+            _verified_tokens[token] = payload
 
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
+    return payload, user_id
+
+
+def token_user_id(token: str) -> Optional[str]:
+    """User id of a valid access token (signature and expiry checked, no DB lookup), else None."""
+    try:
+        return _access_payload(token)[1]
+    except HTTPException:
+        return None
+
+
+def resolve_principal(token: str) -> Principal:
+    """Authenticate an access token: stateless claims, then the cache, then the users table."""
+    payload, user_id = _access_payload(token)
+
+    if AUTH_STATELESS:
+        if not payload.get("role"):
+            raise HTTPException(status_code=401, detail="Invalid token payload")
+        return Principal(
+            id=user_id,
+            name=payload.get("name", ""),
+            email=payload.get("email", ""),
+            role=payload["role"],
+            is_active=True,
+        )
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        generation = principal_cache.generation()
+        db = SessionLocal()
+        try:
+            user = db.query(models.User).filter(models.User.id == user_id).first()
+        finally:
+            db.close()
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        principal = Principal.from_user(user)
+        principal_cache.put(principal, generation)
+
+    if not principal.is_active:
+        raise HTTPException(status_code=403, detail="Account is suspended")
+    return principal
+
+
+def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> Principal:
+    return resolve_principal(credentials.credentials)
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: Session = Depends(get_db),
+) -> models.User:
+    """The full, session-bound User row, for endpoints that modify the user."""
+    payload, user_id = _access_payload(credentials.credentials)
 
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -78,7 +258,7 @@ def get_current_user(
 
 def require_roles(*roles):
     """Dependency factory: require the current user to have one of the given roles."""
-    def _role_checker(current_user: models.User = Depends(get_current_user)):
+    def _role_checker(current_user: Principal = Depends(get_current_principal)):
         if current_user.role not in roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
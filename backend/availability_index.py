@@ -0,0 +1,166 @@
+"""
+In-memory index of available vehicles by capacity.
+
+Holds every `available` vehicle as (max_weight, id), sorted, once for the
+whole fleet and once per vehicle_type, so "smallest available vehicle that
+carries 3,200 kg" is one bisect (O(log n)) and the k next-larger ones follow
+it (O(log n + k)).
+
+The index is built from the database at startup and kept in sync the same
+way cached principals are (auth.py): committed ORM changes to Vehicle rows
+(trip status changes, maintenance, vehicle edits) publish the vehicle ids on
+the invalidation feed ("vehicle" channel), and every worker marks those ids
+dirty. Dirty ids are re-read from the database by primary key at the next
+lookup and re-inserted with bisect. Bulk statements on the vehicles table
+(CSV ingest, bulk maintenance) do not say which rows they touched, so they
+mark the whole index dirty and the next lookup rebuilds it.
+"""
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+import metrics
+import models
+from invalidation import feed
+
+CHANNEL = "vehicle"
+
+INDEX_REFRESHES = metrics.registry.counter(
+    "fleetflow_availability_index_refreshes", "Availability index refreshes by scope (full rebuild or dirty rows).", ("scope",))
+
+Entry = Tuple[float, str]   # (max_weight, vehicle id)
+
+
+class AvailabilityIndex:
+    """Available vehicles ordered by max_weight, overall and per vehicle_type."""
+
+    def __init__(self):
+        self._all: List[Entry] = []
+        self._by_type: Dict[str, List[Entry]] = {}
+        self._vehicles: Dict[str, Tuple[str, float]] = {}   # id -> (vehicle_type, max_weight)
+        self._dirty: Set[str] = set()
+        self._stale = True   # needs a full rebuild
+        self._lock = threading.Lock()
+        feed.subscribe(CHANNEL, self.mark_dirty)
+
+    def mark_dirty(self, vehicle_id: Optional[str] = None):
+        """Re-read `vehicle_id` at the next lookup; None means rebuild everything."""
+        with self._lock:
+            if vehicle_id is None:
+                self._stale = True
+            else:
+                self._dirty.add(vehicle_id)
+
+    # ---- maintenance ----
+    def rebuild(self, db: Session):
+        with self._lock:
+            # Reset first: changes announced while the query runs are applied on the next lookup
+            self._stale = False
+            self._dirty.clear()
+        rows = db.query(models.Vehicle.id, models.Vehicle.vehicle_type, models.Vehicle.max_weight).filter(
+            models.Vehicle.status == "available"
+        ).all()
+        with self._lock:
+            self._vehicles = {vid: (vtype, float(max_weight)) for vid, vtype, max_weight in rows}
+            self._all = sorted((w, vid) for vid, (_, w) in self._vehicles.items())
+            self._by_type = {}
+            for w, vid in self._all:
+                self._by_type.setdefault(self._vehicles[vid][0], []).append((w, vid))
+        INDEX_REFRESHES.labels("full").inc()
+
+    def _remove(self, vehicle_id: str):
+        vtype, weight = self._vehicles.pop(vehicle_id)
+        for entries in (self._all, self._by_type[vtype]):
+            del entries[bisect_left(entries, (weight, vehicle_id))]
+
+    def _add(self, vehicle_id: str, vtype: str, weight: float):
+        self._vehicles[vehicle_id] = (vtype, weight)
+        insort(self._all, (weight, vehicle_id))
+        insort(self._by_type.setdefault(vtype, []), (weight, vehicle_id))
+
+    def _refresh(self, db: Session):
+        feed.poll()
+        if self._stale:
+            self.rebuild(db)
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        rows = db.query(models.Vehicle.id, models.Vehicle.vehicle_type, models.Vehicle.max_weight).filter(
+            models.Vehicle.id.in_(dirty), models.Vehicle.status == "available"
+        ).all()
+        with self._lock:
+            for vehicle_id in dirty:
+                if vehicle_id in self._vehicles:
+                    self._remove(vehicle_id)
+            for vid, vtype, max_weight in rows:
+                self._add(vid, vtype, float(max_weight))
+        INDEX_REFRESHES.labels("rows").inc()
+
+    # ---- lookups ----
+    def smallest_fits(self, db: Session, min_capacity: float = 0, vehicle_type: Optional[str] = None,
+                      limit: int = 1) -> List[str]:
+        """Ids of the `limit` smallest available vehicles with max_weight >= min_capacity."""
+        self._refresh(db)
+        with self._lock:
+            entries = self._all if vehicle_type is None else self._by_type.get(vehicle_type, [])
+            start = bisect_left(entries, (min_capacity, ""))
+            return [vid for _, vid in entries[start:start + limit]]
+
+    def __len__(self) -> int:
+        return len(self._vehicles)
+
+
+# Global singleton index
+availability_index = AvailabilityIndex()
+
+metrics.registry.gauge(
+    "fleetflow_availability_index_vehicles", "Available vehicles held by the availability index.",
+    fn=lambda: len(availability_index),
+)
+
+
+def publish_vehicle_changes(vehicle_ids: Iterable[str] = None):
+    """Mark vehicles dirty in every worker; no ids means the whole index."""
+    if vehicle_ids is None:
+        feed.publish_all(CHANNEL)
+    else:
+        feed.publish(CHANNEL, vehicle_ids)
+
+
+# ========================
+#  WRITE TRACKING
+# ========================
+@event.listens_for(models.Vehicle, "after_insert")
+@event.listens_for(models.Vehicle, "after_update")
+@event.listens_for(models.Vehicle, "after_delete")
+def _track_vehicle_change(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_vehicle_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_vehicle_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if getattr(orm_execute_state.statement.table, "name", None) == models.Vehicle.__tablename__:
+        orm_execute_state.session.info["changed_vehicles_all"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_vehicle_changes(session):
+    changed = session.info.pop("changed_vehicle_ids", None)
+    if session.info.pop("changed_vehicles_all", False):
+        publish_vehicle_changes()
+    elif changed:
+        publish_vehicle_changes(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_vehicle_changes(session):
+    session.info.pop("changed_vehicle_ids", None)
+    session.info.pop("changed_vehicles_all", None)
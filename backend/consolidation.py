@@ -0,0 +1,178 @@
+"""
+Load consolidation planning.
+
+Draft trips to the same destination (compared case- and whitespace-
+insensitively) are packed together into available vehicles by cargo
+weight, so several small shipments travel on one vehicle instead of one
+vehicle each.
+
+Per destination, heaviest group first:
+1. First-fit decreasing. Shipments are taken heaviest first and each one
+   goes into the first open load with room left. If none has room, a new
+   load is opened on the largest free vehicle. "First load with room >= w"
+   is a descent in a max segment tree over the loads' remaining capacity,
+   so packing n shipments costs O(n log n).
+2. Right-sizing. The loads' vehicles go back to the pool, and each load
+   (heaviest first) takes the smallest free vehicle that carries it. This is
+   the same best-fit decreasing rule as dispatch.py, and it always succeeds
+   because the vehicles the loads were packed into are a valid choice.
+   Large vehicles stay free for the next destination.
+
+Quality bound: no packing of a group can use fewer vehicles than the
+fewest free vehicles whose capacities add up to the group's weight (the
+largest ones, taken in order). With identical vehicles that bound is
+ceil(weight / capacity), and first-fit decreasing is known to stay within
+11/9 of the optimum plus one. Every group reports its bound next to the
+vehicles it used.
+"""
+import hashlib
+import heapq
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from dispatch import FreeVehicle
+
+
+@dataclass(frozen=True)
+class Shipment:
+    id: str
+    destination: str
+    cargo_weight: float
+
+
+@dataclass
+class Load:
+    destination: str
+    vehicle: FreeVehicle
+    shipments: List[Shipment] = field(default_factory=list)
+    weight: float = 0.0
+
+    @property
+    def spare_capacity(self) -> float:
+        return self.vehicle.max_weight - self.weight
+
+
+@dataclass
+class DestinationGroup:
+    destination: str
+    shipments: int
+    weight: float
+    vehicles: int = 0
+    lower_bound: int = 0
+
+
+@dataclass
+class ConsolidationPlan:
+    loads: List[Load] = field(default_factory=list)
+    groups: List[DestinationGroup] = field(default_factory=list)
+    unplaced: Dict[str, str] = field(default_factory=dict)   # shipment id -> reason
+
+    @property
+    def plan_id(self) -> str:
+        """Fingerprint of the loads: the same inputs give the same id, so a preview can be committed as is."""
+        digest = hashlib.sha256()
+        for load in self.loads:
+            digest.update(f"{load.vehicle.id}:{','.join(s.id for s in load.shipments)};".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @property
+    def lower_bound(self) -> int:
+        return sum(g.lower_bound for g in self.groups)
+
+
+class FirstFitTree:
+    """
+    Remaining room of loads 0..n-1 in a max segment tree: `first_fit(w)` is
+    the leftmost load with room >= w, found in O(log n).
+    """
+
+    def __init__(self, n: int):
+        self.size = 1
+        while self.size < max(n, 1):
+            self.size *= 2
+        self._room = [-1.0] * (2 * self.size)   # loads not opened yet have no room
+
+    def set(self, i: int, room: float):
+        i += self.size
+        self._room[i] = room
+        i //= 2
+        while i:
+            self._room[i] = max(self._room[2 * i], self._room[2 * i + 1])
+            i //= 2
+
+    def first_fit(self, weight: float) -> Optional[int]:
+        if self._room[1] < weight:
+            return None
+        i = 1
+        while i < self.size:
+            i = 2 * i if self._room[2 * i] >= weight else 2 * i + 1
+        return i - self.size
+
+
+def destination_key(destination: str) -> str:
+    return " ".join(destination.split()).casefold()
+
+
+def _lower_bound(capacities: Iterable[float], weight: float) -> int:
+    """Fewest of `capacities` (largest first) that add up to `weight`."""
+    total, count = 0.0, 0
+    for capacity in capacities:
+        if total >= weight:
+            break
+        total += capacity
+        count += 1
+    return count
+
+
+def _pack(destination: str, shipments: List[Shipment], pool: List[Tuple[float, str]],
+          unplaced: Dict[str, str]) -> List[Load]:
+    loads: List[Load] = []
+    tree = FirstFitTree(len(shipments))
+    for shipment in sorted(shipments, key=lambda s: s.cargo_weight, reverse=True):
+        i = tree.first_fit(shipment.cargo_weight)
+        if i is None:
+            if not pool or pool[-1][0] < shipment.cargo_weight:
+                unplaced[shipment.id] = f"No free vehicle can carry {shipment.cargo_weight}kg"
+                continue
+            capacity, vehicle_id = pool.pop()   # open on the largest free vehicle
+            i = len(loads)
+            loads.append(Load(destination, FreeVehicle(vehicle_id, capacity)))
+        load = loads[i]
+        load.shipments.append(shipment)
+        load.weight = round(load.weight + shipment.cargo_weight, 6)   # no float creep past max_weight
+        tree.set(i, load.spare_capacity)
+
+    # Right-size: smallest free vehicle per load, heaviest load first
+    for load in loads:
+        insort(pool, (load.vehicle.max_weight, load.vehicle.id))
+    for load in sorted(loads, key=lambda l: l.weight, reverse=True):
+        capacity, vehicle_id = pool.pop(bisect_left(pool, (load.weight, "")))
+        load.vehicle = FreeVehicle(vehicle_id, capacity)
+    return loads
+
+
+def plan_consolidation(shipments: Sequence[Shipment], vehicles: Sequence[FreeVehicle]) -> ConsolidationPlan:
+    """Pack shipments into vehicles, destination by destination (see module docstring)."""
+    by_destination: Dict[str, List[Shipment]] = {}
+    for shipment in shipments:
+        by_destination.setdefault(destination_key(shipment.destination), []).append(shipment)
+    pool = sorted((v.max_weight, v.id) for v in vehicles)
+
+    plan = ConsolidationPlan()
+    groups = sorted(by_destination.values(), key=lambda g: sum(s.cargo_weight for s in g), reverse=True)
+    for group in groups:
+        destination = group[0].destination
+        loads = _pack(destination, group, pool, plan.unplaced)
+        weight = sum(load.weight for load in loads)
+        # Bound over what was placed, against the pool as it was before packing this group
+        capacities = heapq.merge(
+            (capacity for capacity, _ in reversed(pool)),
+            sorted((load.vehicle.max_weight for load in loads), reverse=True),
+            reverse=True,
+        )
+        plan.loads.extend(loads)
+        plan.groups.append(DestinationGroup(
+            destination, sum(len(load.shipments) for load in loads), weight, len(loads), _lower_bound(capacities, weight),
+        ))
+    return plan
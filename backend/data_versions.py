@@ -0,0 +1,106 @@
+"""
+Per-table data versions.
+
+Every committed ORM write (flushes, `session.execute(insert/update/delete)`,
+`query.delete()`) gives the tables it touched a fresh version token, so
+anything derived from those tables (reports) can be keyed by
+`versions.get(tables)` and is implicitly invalidated by the next write.
+
+Tokens travel over the invalidation feed ("table" channel, key
+"<table>=<token>"), so every worker on the host agrees on them: a worker
+starting up replays the feed file, and tables the feed has no token for
+share a base token: the feed file's random generation, which no later file
+repeats. When the feed is rotated every worker moves to the new base, so a
+key built before a rotation can never come back after it. Writes made outside the API
+(scripts, manual SQL) are not seen; cached consumers should keep a TTL.
+"""
+import threading
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from invalidation import feed
+
+CHANNEL = "table"
+
+
+class DataVersions:
+    """Version token per table, shared by the workers of one host through the feed."""
+
+    def __init__(self):
+        self._tokens: Dict[str, str] = {}
+        self._base = feed.generation()
+        self._lock = threading.Lock()
+        self._replay()
+        feed.subscribe(CHANNEL, self._apply)
+
+    def _replay(self):
+        try:
+            with open(feed.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split(" ", 2)
+                    if len(parts) == 3 and parts[1] == CHANNEL:
+                        self._apply(parts[2])
+        except OSError:
+            pass
+
+    def _apply(self, key: Optional[str]):
+        with self._lock:
+            if key is None:
+                # Feed rotated (or lost): history is gone, start over from the new file
+                self._tokens.clear()
+                self._base = feed.generation()
+                return
+            table, _, token = key.partition("=")
+            if token:
+                self._tokens[table] = token
+
+    def get(self, tables: Iterable[str]) -> Tuple[str, ...]:
+        """Current tokens of `tables` (sorted by name), e.g. for a cache key."""
+        feed.poll()
+        return tuple(f"{t}={self._tokens.get(t, self._base)}" for t in sorted(tables))
+
+    def bump(self, tables: Iterable[str]):
+        token = uuid.uuid4().hex[:12]
+        feed.publish(CHANNEL, [f"{t}={token}" for t in sorted(set(tables))])
+
+
+# Global singleton versions
+versions = DataVersions()
+
+
+# ========================
+#  WRITE TRACKING
+# ========================
+def _track(session: Session, table) -> None:
+    name = getattr(table, "name", None)
+    if name:
+        session.info.setdefault("changed_tables", set()).add(name)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    for obj in session.new | session.deleted:
+        _track(session, obj.__table__)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            _track(session, obj.__table__)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _track(orm_execute_state.session, orm_execute_state.statement.table)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        versions.bump(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("changed_tables", None)
@@ -1,7 +1,10 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
+import metrics
+import slow_query_log
 
 load_dotenv()
 
@@ -13,11 +16,80 @@ if DATABASE_URL.startswith("sqlite"):
 
 engine = create_engine(DATABASE_URL, connect_args=connect_args)
 
+
+# ========================
+#  STATEMENT HOOKS (metrics + slow-query log)
+# ========================
+_time_statements = metrics.METRICS_ENABLED or slow_query_log.enabled()
+
+if _time_statements:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _statement_started(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and (slow_query_log.enabled() or metrics.scraping()):
+            context._statement_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_statement_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if metrics.scraping():
+            metrics.DB_STATEMENT_DURATION.labels(metrics.statement_shape(statement)).observe(elapsed)
+        if slow_query_log.enabled() and elapsed * 1000 >= slow_query_log.SLOW_QUERY_MS:
+            slow_query_log.record(cursor, conn.dialect.name, statement, parameters, executemany, elapsed)
+
+if metrics.METRICS_ENABLED:
+    # The pool has no "before checkout" event, so time its connect() directly
+    _pool_connect = engine.pool.connect
+
+    def _timed_pool_connect():
+        started = time.perf_counter()
+        try:
+            return _pool_connect()
+        finally:
+            metrics.DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+    engine.pool.connect = _timed_pool_connect
+
+    if hasattr(engine.pool, "checkedout"):
+        metrics.registry.gauge(
+            "fleetflow_db_pool_checked_out", "Connections currently checked out of the pool.",
+            fn=engine.pool.checkedout,
+        )
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
+def add_missing_columns(engine) -> list:
+    """
+    Add model columns missing from existing tables (create_all only creates
+    whole tables). New columns must be nullable or have a server_default.
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                elif not column.nullable:
+                    raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a server_default")
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                conn.exec_driver_sql(ddl)
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
 def get_db():
     db = SessionLocal()
     try:
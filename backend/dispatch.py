@@ -0,0 +1,128 @@
+"""
+Automatic dispatch assignment.
+
+Given draft trips, free vehicles and free drivers, pick one vehicle and one
+driver per trip such that:
+- cargo_weight <= max_weight,
+- as many trips as possible are covered,
+- the spare capacity (max_weight - cargo_weight) summed over the assigned
+  trips is as small as possible, so big vehicles stay free for big loads,
+- the drivers used are the highest safety_score ones, the safest going to
+  the heaviest loads.
+
+Vehicles: best-fit decreasing. Trips are taken heaviest first and each gets
+the smallest free vehicle that can carry it. A vehicle able to carry a trip
+can carry every lighter one, so this greedy order is optimal for both goals
+(an exchange argument: swapping any two choices never covers more trips nor
+wastes less). "Smallest free vehicle with max_weight >= w" is a bisect into
+the vehicles sorted by capacity followed by a union-find lookup that skips
+taken slots, so a run costs O((T + V) log V) instead of the O(T * V) of
+scanning the fleet per trip.
+
+Drivers have no vehicle-specific constraint, so they are simply ranked by
+safety_score and dealt out in that order. When there are fewer drivers than
+coverable trips, the heaviest loads are the ones served.
+
+Everything here is plain Python on small dataclasses; dispatch_router.py
+does the loading and writing.
+"""
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+
+@dataclass(frozen=True)
+class PendingTrip:
+    id: str
+    cargo_weight: float
+
+
+@dataclass(frozen=True)
+class FreeVehicle:
+    id: str
+    max_weight: float
+
+
+@dataclass(frozen=True)
+class FreeDriver:
+    id: str
+    safety_score: float
+
+
+@dataclass(frozen=True)
+class Assignment:
+    trip_id: str
+    vehicle_id: str
+    driver_id: str
+    cargo_weight: float
+    max_weight: float
+    safety_score: float
+
+    @property
+    def spare_capacity(self) -> float:
+        return self.max_weight - self.cargo_weight
+
+
+@dataclass
+class AssignmentPlan:
+    assignments: List[Assignment] = field(default_factory=list)
+    unassigned: Dict[str, str] = field(default_factory=dict)   # trip id -> reason
+
+    @property
+    def spare_capacity(self) -> float:
+        return sum(a.spare_capacity for a in self.assignments)
+
+
+class FreeSlots:
+    """
+    Slots 0..n-1 that can each be taken once; `take(i)` claims the first
+    free slot >= i. Union-find with path compression: a taken slot points
+    at its right neighbour, so runs of taken slots are skipped in
+    near-constant amortized time.
+    """
+
+    def __init__(self, n: int):
+        self._next = list(range(n + 1))   # slot n is the "none left" sentinel
+        self.n = n
+
+    def _find(self, i: int) -> int:
+        root = i
+        while self._next[root] != root:
+            root = self._next[root]
+        while self._next[i] != root:
+            self._next[i], i = root, self._next[i]
+        return root
+
+    def take(self, i: int) -> Optional[int]:
+        slot = self._find(i)
+        if slot == self.n:
+            return None
+        self._next[slot] = slot + 1
+        return slot
+
+
+def plan_assignments(
+    trips: Sequence[PendingTrip],
+    vehicles: Sequence[FreeVehicle],
+    drivers: Sequence[FreeDriver],
+) -> AssignmentPlan:
+    """Assign each trip a distinct vehicle and driver (see module docstring)."""
+    fleet = sorted(vehicles, key=lambda v: v.max_weight)
+    capacities = [v.max_weight for v in fleet]
+    slots = FreeSlots(len(fleet))
+    crew = sorted(drivers, key=lambda d: d.safety_score, reverse=True)
+
+    plan = AssignmentPlan()
+    for trip in sorted(trips, key=lambda t: t.cargo_weight, reverse=True):
+        if len(plan.assignments) == len(crew):
+            plan.unassigned[trip.id] = "No on-duty driver left"
+            continue
+        slot = slots.take(bisect_left(capacities, trip.cargo_weight))
+        if slot is None:
+            plan.unassigned[trip.id] = f"No free vehicle can carry {trip.cargo_weight}kg"
+            continue
+        vehicle, driver = fleet[slot], crew[len(plan.assignments)]
+        plan.assignments.append(Assignment(
+            trip.id, vehicle.id, driver.id, trip.cargo_weight, vehicle.max_weight, driver.safety_score,
+        ))
+    return plan
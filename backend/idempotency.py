@@ -0,0 +1,291 @@
+"""
+Idempotency keys for POST/PATCH.
+
+A client that may retry (flaky mobile links) sends `Idempotency-Key: <uuid>`.
+The first request with a key claims it and runs normally; its response
+(status, headers, body) is stored in `idempotency_keys` for
+IDEMPOTENCY_TTL_SECONDS. A retry with the same key and the same request is
+answered from that row alone, with `Idempotent-Replayed: true`, without
+touching the business tables or re-broadcasting WebSocket events.
+
+- keys are scoped per authenticated user; unauthenticated requests pass through
+- same key, different method/path/query/body -> 422
+- same key while the first request is still running -> 409 with Retry-After
+- 5xx, 409, 429 and oversized responses are not stored, so the retry runs again
+- a running request keeps extending its claim, so a long one is never taken over;
+  a claim whose request died (worker crash) is taken over after IDEMPOTENCY_LOCK_SECONDS
+- streamed uploads (/api/bulk, /api/telemetry) are not covered: buffering them
+  here would undo their streaming, and bulk rows are deduplicated by key anyway
+
+Expired rows are purged at most once per IDEMPOTENCY_PURGE_SECONDS per worker.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import time
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+import metrics
+from database import engine
+from models import IdempotencyKey
+
+load_dotenv()
+
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "true").lower() in ("1", "true", "yes")
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+IDEMPOTENCY_PURGE_SECONDS = int(os.getenv("IDEMPOTENCY_PURGE_SECONDS", "300"))
+IDEMPOTENCY_MAX_REQUEST_BYTES = int(os.getenv("IDEMPOTENCY_MAX_REQUEST_BYTES", str(1024 * 1024)))
+IDEMPOTENCY_MAX_RESPONSE_BYTES = int(os.getenv("IDEMPOTENCY_MAX_RESPONSE_BYTES", str(1024 * 1024)))
+
+METHODS = {"POST", "PATCH"}
+EXCLUDED_PREFIXES = (
+    "/auth/",            # never store tokens
+    "/api/bulk/",        # streamed bodies of any size
+    "/api/telemetry",    # high-rate batches with their own backpressure
+)
+MAX_KEY_LENGTH = 255
+UNSTORED_STATUSES = {409, 429}
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+IDEMPOTENCY_REQUESTS = metrics.registry.counter(
+    "fleetflow_idempotency_requests", "Requests with an Idempotency-Key by outcome.", ("outcome",))
+
+_table = IdempotencyKey.__table__
+_last_purge = float("-inf")
+
+
+# ========================
+#  STORE
+# ========================
+def purge_expired(now: Optional[datetime.datetime] = None) -> int:
+    now = now or datetime.datetime.utcnow()
+    with engine.begin() as conn:
+        return conn.execute(delete(_table).where(_table.c.expires_at < now)).rowcount
+
+
+def _maybe_purge(now: datetime.datetime):
+    global _last_purge
+    if time.monotonic() - _last_purge >= IDEMPOTENCY_PURGE_SECONDS:
+        _last_purge = time.monotonic()
+        purge_expired(now)
+
+
+def claim(user_id: str, key: str, fingerprint: str):
+    """None if this request now owns the key, else the existing (live) row."""
+    now = datetime.datetime.utcnow()
+    _maybe_purge(now)
+    lock_until = now + datetime.timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+    where = (_table.c.user_id == user_id, _table.c.key == key)
+    for _ in range(3):
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(_table).values(
+                    user_id=user_id, key=key, fingerprint=fingerprint, status=IN_PROGRESS,
+                    created_at=now, expires_at=lock_until,
+                ))
+            return None
+        except IntegrityError:
+            pass
+        with engine.begin() as conn:
+            row = conn.execute(select(_table).where(*where)).first()
+            if row is None:
+                continue  # purged meanwhile; insert again
+            if row.expires_at > now:
+                return row
+            # Expired (or abandoned claim): take it over unless someone else just did
+            taken = conn.execute(
+                update(_table).where(*where, _table.c.expires_at == row.expires_at).values(
+                    fingerprint=fingerprint, status=IN_PROGRESS, response_status=None,
+                    response_headers=None, response_body=None, created_at=now, expires_at=lock_until,
+                )
+            ).rowcount
+            if taken:
+                return None
+    raise HTTPException(status_code=409, detail="Idempotency-Key is contended; retry")
+
+
+def complete(user_id: str, key: str, status: int, headers: list, body: bytes):
+    expires = datetime.datetime.utcnow() + datetime.timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    with engine.begin() as conn:
+        conn.execute(
+            update(_table).where(_table.c.user_id == user_id, _table.c.key == key).values(
+                status=COMPLETED, response_status=status, response_body=body, expires_at=expires,
+                response_headers=json.dumps([[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers]),
+            )
+        )
+
+
+def extend(user_id: str, key: str):
+    """Push back the lock of a claim whose request is still running."""
+    lock_until = datetime.datetime.utcnow() + datetime.timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+    with engine.begin() as conn:
+        conn.execute(update(_table).where(
+            _table.c.user_id == user_id, _table.c.key == key, _table.c.status == IN_PROGRESS,
+        ).values(expires_at=lock_until))
+
+
+async def _keep_claimed(user_id: str, key: str):
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_LOCK_SECONDS / 3)
+        await run_in_threadpool(extend, user_id, key)
+
+
+def release(user_id: str, key: str):
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(
+            _table.c.user_id == user_id, _table.c.key == key, _table.c.status == IN_PROGRESS))
+
+
+# ========================
+#  MIDDLEWARE
+# ========================
+def fingerprint_request(scope: dict, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1")):
+        digest.update(part.encode() + b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+async def _user_id(headers: Headers) -> Optional[str]:
+    from auth import resolve_principal
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    try:
+        principal = await run_in_threadpool(resolve_principal, token.strip())
+    except HTTPException:
+        return None
+    return principal.id
+
+
+async def _read_body(receive) -> Tuple[Optional[bytes], bool]:
+    """(body, disconnected); body is None once it exceeds IDEMPOTENCY_MAX_REQUEST_BYTES."""
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b"".join(chunks), True
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > IDEMPOTENCY_MAX_REQUEST_BYTES:
+            return None, False
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks), False
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware replaying stored responses for repeated Idempotency-Keys."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METHODS or scope["path"].startswith(EXCLUDED_PREFIXES):
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if key is None:
+            return await self.app(scope, receive, send)
+
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return await JSONResponse(
+                {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"}, status_code=400,
+            )(scope, receive, send)
+        user_id = await _user_id(headers)
+        if user_id is None:
+            return await self.app(scope, receive, send)  # the route answers 401/403 itself
+
+        body, disconnected = await _read_body(receive)
+        if disconnected:
+            return
+        if body is None:
+            return await JSONResponse(
+                {"detail": f"Requests with an Idempotency-Key are limited to {IDEMPOTENCY_MAX_REQUEST_BYTES} bytes"},
+                status_code=413,
+            )(scope, receive, send)
+
+        fingerprint = fingerprint_request(scope, body)
+        try:
+            existing = await run_in_threadpool(claim, user_id, key, fingerprint)
+        except HTTPException as exc:
+            IDEMPOTENCY_REQUESTS.labels("contended").inc()
+            return await JSONResponse({"detail": exc.detail}, status_code=exc.status_code)(scope, receive, send)
+
+        if existing is not None:
+            return await self._answer_existing(existing, fingerprint, scope, receive, send)
+
+        IDEMPOTENCY_REQUESTS.labels("new").inc()
+        await self._run_and_store(user_id, key, body, scope, receive, send)
+
+    async def _answer_existing(self, row, fingerprint, scope, receive, send):
+        if row.fingerprint != fingerprint:
+            IDEMPOTENCY_REQUESTS.labels("mismatch").inc()
+            return await JSONResponse(
+                {"detail": "Idempotency-Key was already used for a different request"}, status_code=422,
+            )(scope, receive, send)
+        if row.status != COMPLETED:
+            IDEMPOTENCY_REQUESTS.labels("in_progress").inc()
+            return await JSONResponse(
+                {"detail": "A request with this Idempotency-Key is still being processed"},
+                status_code=409, headers={"Retry-After": "1"},
+            )(scope, receive, send)
+
+        IDEMPOTENCY_REQUESTS.labels("replayed").inc()
+        raw_headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in json.loads(row.response_headers or "[]")]
+        raw_headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": row.response_status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": row.response_body or b""})
+
+    async def _run_and_store(self, user_id, key, body, scope, receive, send):
+        replayed = False
+
+        async def receive_body():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status_code = 500
+        response_headers: list = []
+        chunks: list = []
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_headers, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body" and size <= IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                chunks.append(chunk)
+            await send(message)
+
+        stored = False
+        heartbeat = asyncio.ensure_future(_keep_claimed(user_id, key))
+        try:
+            await self.app(scope, receive_body, send_wrapper)
+            heartbeat.cancel()
+            if status_code < 500 and status_code not in UNSTORED_STATUSES and size <= IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                await run_in_threadpool(complete, user_id, key, status_code, response_headers, b"".join(chunks))
+                stored = True
+        finally:
+            heartbeat.cancel()
+            if not stored:
+                await run_in_threadpool(release, user_id, key)
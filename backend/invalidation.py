@@ -0,0 +1,156 @@
+"""
+Cross-worker invalidation feed.
+
+In-process caches subscribe to a channel ("user", ...). `publish` notifies
+local subscribers immediately and appends "<pid> <channel> <key>" lines to a
+shared file; other workers on the same host pick them up on their next
+`poll`, which costs one os.stat when nothing changed. When the file grows
+past INVALIDATION_FEED_MAX_BYTES it is rotated, and readers that notice a
+new file drop everything they cache (key None) before reading on.
+
+Every feed file starts with a "# feed <generation>" line holding a random
+id. Inodes are reused (ext4 hands the same one back every other rotation),
+so the generation is what tells files apart, and it doubles as a value
+that is never repeated for consumers that key on "the feed so far".
+"""
+import os
+import threading
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, TextIO
+
+INVALIDATION_FEED_PATH = os.getenv("INVALIDATION_FEED_PATH", "./runtime/invalidation.log")
+INVALIDATION_FEED_MAX_BYTES = int(os.getenv("INVALIDATION_FEED_MAX_BYTES", str(1024 * 1024)))
+
+Callback = Callable[[Optional[str]], None]
+
+HEADER_PREFIX = "# feed "
+
+
+def _new_header() -> str:
+    return f"{HEADER_PREFIX}{uuid.uuid4().hex}\n"
+
+
+def _read_generation(f: TextIO) -> Optional[str]:
+    """Generation in the header of an open feed file; None while it has none (yet)."""
+    first = f.readline()
+    if first.startswith(HEADER_PREFIX) and first.endswith("\n"):
+        return first[len(HEADER_PREFIX):-1]
+    return None
+
+
+class InvalidationFeed:
+    def __init__(self, path: str):
+        self.path = path
+        self._subscribers: Dict[str, List[Callback]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._pid = str(os.getpid())
+        self._inode, self._offset = self._stat()
+        self._generation = self._file_generation()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return st.st_ino, st.st_size
+        except FileNotFoundError:
+            return None, 0
+
+    def _file_generation(self) -> Optional[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return _read_generation(f)
+        except OSError:
+            return None
+
+    def generation(self) -> str:
+        """
+        Random id of the feed file being read, never reused by a later file.
+        Creates the file when there is none, so every state of the feed has one.
+        """
+        if self._generation is None:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "x", encoding="utf-8") as f:
+                    f.write(_new_header())
+            except OSError:
+                pass   # another worker created it first
+            self.poll()
+        # A file without a readable header (legacy, or being created): a one-off id is safe
+        return self._generation or f"x{uuid.uuid4().hex}"
+
+    def subscribe(self, channel: str, callback: Callback):
+        """`callback(key)` runs for every invalidated key; key None means "drop everything"."""
+        self._subscribers[channel].append(callback)
+
+    def _dispatch(self, channel: str, key: Optional[str]):
+        for callback in self._subscribers.get(channel, ()):
+            callback(key)
+
+    def _dispatch_all(self):
+        for channel in list(self._subscribers):
+            self._dispatch(channel, None)
+
+    def publish(self, channel: str, keys: Iterable[str]):
+        keys = [str(k) for k in keys]
+        for key in keys:
+            self._dispatch(channel, None if key == "*" else key)
+        if not keys:
+            return
+        lines = "".join(f"{self._pid} {channel} {key}\n" for key in keys)
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                if f.tell() == 0:
+                    lines = _new_header() + lines
+                f.write(lines)
+                size = f.tell()
+            if size > INVALIDATION_FEED_MAX_BYTES:
+                os.replace(self.path, self.path + ".1")
+        except OSError:
+            # Other workers fall back to their cache TTLs
+            pass
+
+    def publish_all(self, channel: str):
+        """Invalidate every key of `channel` in all workers."""
+        self.publish(channel, ["*"])
+
+    def poll(self):
+        """Apply entries written by other workers since the last poll."""
+        inode, size = self._stat()
+        if inode == self._inode and size == self._offset:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if inode is None:
+                if self._inode is not None:
+                    # Rotated away and not recreated yet: anything may have been missed
+                    self._inode, self._generation, self._offset = None, None, 0
+                    self._dispatch_all()
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                generation = _read_generation(f)
+                if inode != self._inode or generation != self._generation or size < self._offset:
+                    # Rotated (or created): anything may have been missed
+                    self._inode, self._generation, self._offset = inode, generation, 0
+                    self._dispatch_all()
+                if size <= self._offset:
+                    return
+                f.seek(self._offset)
+                data = f.read(size - self._offset)
+            complete = data.rfind("\n") + 1
+            self._offset += len(data[:complete].encode("utf-8"))
+            for line in data[:complete].splitlines():
+                parts = line.split(" ", 2)
+                if len(parts) != 3 or parts[0] in (self._pid, "#"):
+                    continue
+                _, channel, key = parts
+                self._dispatch(channel, None if key == "*" else key)
+        except OSError:
+            pass
+        finally:
+            self._lock.release()
+
+
+# Global singleton feed
+feed = InvalidationFeed(INVALIDATION_FEED_PATH)
@@ -0,0 +1,131 @@
+"""
+Event-loop lag monitor.
+
+A heartbeat task sleeps LOOP_MONITOR_INTERVAL_MS at a time and records how
+late it wakes up (scheduling lag). A watchdog thread checks the heartbeat;
+when it is overdue by more than LOOP_LAG_THRESHOLD_MS the loop is blocked by
+synchronous work, so the watchdog captures the loop thread's stack and the
+route of the task that is running. When the loop comes back the stall is
+logged (logger "fleetflow.loop_monitor") and counted per route in /metrics.
+
+Started and stopped from the app lifespan in main.py.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+from dotenv import load_dotenv
+
+import metrics
+from request_context import route_for_task
+
+load_dotenv()
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+LOOP_STALL_STACK_FRAMES = int(os.getenv("LOOP_STALL_STACK_FRAMES", "25"))
+
+LOOP_LAG = metrics.registry.histogram(
+    "fleetflow_event_loop_lag_seconds", "How late the event-loop heartbeat woke up.",
+    buckets=metrics.FAST_BUCKETS)
+LOOP_STALLS = metrics.registry.counter(
+    "fleetflow_event_loop_stalls", "Event-loop blocks longer than LOOP_LAG_THRESHOLD_MS, by route.", ("route",))
+LOOP_STALL_DURATION = metrics.registry.histogram(
+    "fleetflow_event_loop_stall_seconds", "Duration of event-loop blocks, by route.", ("route",))
+
+logger = logging.getLogger("fleetflow.loop_monitor")
+
+
+class LoopMonitor:
+    def __init__(self, interval_ms: float = LOOP_MONITOR_INTERVAL_MS, threshold_ms: float = LOOP_LAG_THRESHOLD_MS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.last_beat = time.monotonic()
+        self._stall: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ---- event loop side ----
+    async def _heartbeat(self):
+        while True:
+            started = time.perf_counter()
+            self.last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.last_beat = time.monotonic()
+            LOOP_LAG.observe(lag)
+            with self._lock:
+                stall, self._stall = self._stall, None
+            if stall is not None:
+                self._report(stall, lag)
+
+    def _report(self, stall: dict, lag: float):
+        route = stall["route"] or "-"
+        LOOP_STALLS.labels(route).inc()
+        LOOP_STALL_DURATION.labels(route).observe(lag)
+        logger.warning(json.dumps({
+            "event": "event_loop_stall",
+            "lag_ms": round(lag * 1000, 1),
+            "route": stall["route"],
+            "task": stall["task"],
+            "stack": stall["stack"],
+        }))
+
+    # ---- watchdog thread ----
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            overdue = time.monotonic() - self.last_beat - self.interval
+            if overdue < self.threshold or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            stack = [
+                f"{f.filename}:{f.lineno} in {f.name}"
+                for f in traceback.extract_stack(frame)[-LOOP_STALL_STACK_FRAMES:]
+            ]
+            try:
+                task = asyncio.current_task(self.loop)
+            except RuntimeError:
+                task = None
+            with self._lock:
+                self._stall = {
+                    "route": route_for_task(task),
+                    "task": task.get_name() if task is not None else None,
+                    "stack": stack,
+                }
+
+    # ---- lifecycle ----
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+
+
+# Global singleton monitor
+loop_monitor = LoopMonitor()
@@ -9,7 +9,9 @@ Endpoints:
   GET    /auth/me
 
   GET    /api/stats              (Fleet Manager, Dispatcher)
+  GET    /api/dashboard?sections= (All roles; stats, vehicles, drivers, trips, alerts in one call)
   GET    /api/vehicles           (Fleet Manager, Dispatcher)
+  GET    /api/vehicles/available?min_capacity=&vehicle_type=&limit= (Fleet Manager, Dispatcher; best fit first)
   POST   /api/vehicles           (Fleet Manager)
   PATCH  /api/vehicles/{id}      (Fleet Manager)
   DELETE /api/vehicles/{id}      (Fleet Manager)
@@ -22,8 +24,14 @@ Endpoints:
   GET    /api/trips              (Fleet Manager, Dispatcher)
   POST   /api/trips              (Fleet Manager, Dispatcher)
   PATCH  /api/trips/{id}/status  (Fleet Manager, Dispatcher)
+  POST   /api/trips/status:batch (Fleet Manager, Dispatcher)
   DELETE /api/trips/{id}         (Fleet Manager)
 
+  POST   /api/dispatch/auto-assign (Fleet Manager, Dispatcher; preview, or apply to drafts)
+  POST   /api/dispatch/consolidate (Fleet Manager, Dispatcher; preview, or apply a previewed plan_id)
+
+  POST   /api/telemetry          (Fleet Manager, Dispatcher; buffered odometer/GPS/fuel pings, 503 when full)
+
   GET    /api/maintenance        (Fleet Manager, Safety Officer)
   POST   /api/maintenance        (Fleet Manager)
   DELETE /api/maintenance/{id}   (Fleet Manager)
@@ -38,24 +46,68 @@ Endpoints:
   GET    /api/reports/export/csv?report=  (Fleet Manager, Financial Analyst)
   GET    /api/reports/export/pdf?report=  (Fleet Manager, Financial Analyst)
 
+  POST   /api/bulk/vehicles      (Fleet Manager; CSV or NDJSON body)
+  POST   /api/bulk/drivers       (Fleet Manager, Safety Officer)
+  POST   /api/bulk/fuel          (Fleet Manager, Dispatcher)
+  POST   /api/bulk/maintenance   (Fleet Manager)
+
+  GET    /api/search?q=&types=   (All roles; results limited to readable types)
+
+  GET    /api/admin/slow-queries?limit=&route=&min_ms=  (Fleet Manager)
+  GET    /api/admin/profiles     (Fleet Manager; recorded with header X-Profile: 1)
+  GET    /api/admin/profiles/{id} (Fleet Manager; speedscope JSON)
+
   GET    /api/seed               (Initial demo data injection)
 
+  GET    /metrics                (Prometheus text format; disable with METRICS_ENABLED=false)
+
   WS     /ws                    (Live event stream)
+  WS     /ws/telemetry?token=   (Fleet Manager, Dispatcher; telemetry batches, acked per frame)
 """
 
 import datetime
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
-from database import engine, get_db, Base
+from sqlalchemy.orm.exc import StaleDataError
+from database import engine, get_db, Base, SessionLocal, add_missing_columns
 import models
-from auth import hash_password, require_roles, get_current_user
+from auth import hash_password, require_roles, get_current_user, invalidate_principals
 from websocket_manager import manager
-from routers import auth_router, vehicles_router, drivers_router, trips_router, maintenance_router, reports_router, fuel_router
+from password_pool import password_pool
+import metrics
+from request_context import RequestContextMiddleware
+from profiler import ProfilingMiddleware
+from response_compression import COMPRESSION_ENABLED, CompressionMiddleware
+from idempotency import IDEMPOTENCY_ENABLED, IdempotencyMiddleware
+from rate_limit import RATE_LIMIT_ENABLED, RateLimitMiddleware
+from loop_monitor import LOOP_MONITOR_ENABLED, loop_monitor
+from search import ensure_search_indexes
+from availability_index import availability_index
+from telemetry import telemetry_buffer
+from routers import auth_router, vehicles_router, drivers_router, trips_router, maintenance_router, reports_router, fuel_router, search_router, bulk_router, admin_router, dashboard_router, dispatch_router, telemetry_router
 from routers.auth_router import users_router
 
 # Create all tables
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
+ensure_search_indexes(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    with SessionLocal() as db:
+        availability_index.rebuild(db)
+    telemetry_buffer.start()
+    yield
+    await telemetry_buffer.stop()   # writes what is still buffered
+    if LOOP_MONITOR_ENABLED:
+        await loop_monitor.stop()
+
 
 app = FastAPI(
     title="FleetFlow API",
@@ -63,8 +115,15 @@ app = FastAPI(
     version="2.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# Innermost, so stored responses are plain (uncompressed, without CORS headers)
+if IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware)
+# Inside CORS so 429/503 answers stay readable by the browser
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -73,6 +132,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestContextMiddleware)
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+# Outermost, so a profiled request includes every other middleware
+app.add_middleware(ProfilingMiddleware)
+
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    # A versioned row (vehicle, driver, trip) was committed by another request after we read it
+    return JSONResponse(status_code=409, content={"detail": "The record was changed by another request; reload and retry"})
+
+
 # Register all routers
 app.include_router(auth_router.router)
 app.include_router(users_router)
@@ -82,6 +155,13 @@ app.include_router(trips_router.router)
 app.include_router(maintenance_router.router)
 app.include_router(reports_router.router)
 app.include_router(fuel_router.router)
+app.include_router(search_router.router)
+app.include_router(bulk_router.router)
+app.include_router(admin_router.router)
+app.include_router(dashboard_router.router)
+app.include_router(dispatch_router.router)
+app.include_router(telemetry_router.router)
+app.include_router(telemetry_router.stream_router)
 
 
 # ========================
@@ -125,6 +205,7 @@ async def websocket_endpoint(websocket: WebSocket):
       - vehicleCreated   { vehicle object }
       - vehicleStatusUpdated { vehicle object }
       - tripStatusUpdated { trip_id, status }
+      - tripStatusBatchUpdated { updates: [{ trip_id, status }], stats }
       - alert            { type, message, severity, entity_id }
     """
     await manager.connect(websocket)
@@ -145,14 +226,19 @@ async def websocket_endpoint(websocket: WebSocket):
                 models.Trip.status == "draft"
             ).count(),
         }
-        await manager.dashboard_update(stats)
     finally:
+        # Release the connection before awaiting sends: holding it across the
+        # broadcast lets a burst of connects exhaust the pool and block the loop
         db.close()
+    await manager.dashboard_update(stats)
 
     try:
         while True:
             await websocket.receive_text()  # keep alive (ping/pong)
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also on abrupt drops, so dead sockets don't stay in the broadcast set
         manager.disconnect(websocket)
 
 
@@ -176,11 +262,13 @@ def seed_database(db: Session = Depends(get_db)):
         {"name": "Safety Sam",     "email": "safety@fleetflow.com",     "password": "admin123", "role": "Safety Officer"},
         {"name": "Finance Fay",    "email": "finance@fleetflow.com",    "password": "admin123", "role": "Financial Analyst"},
     ]
+    # All demo accounts share one password: hash it once instead of per user
+    hashed = {pw: hash_password(pw) for pw in {u["password"] for u in users_data}}
     for u in users_data:
         db.add(models.User(
             name=u["name"],
             email=u["email"],
-            hashed_password=hash_password(u["password"]),
+            hashed_password=hashed[u["password"]],
             role=u["role"],
             is_active=True,
         ))
@@ -314,10 +402,12 @@ def reset_database(db: Session = Depends(get_db)):
     db.query(models.FuelLog).delete()
     db.query(models.MaintenanceLog).delete()
     db.query(models.Trip).delete()
+    db.query(models.TelemetryPing).delete()
     db.query(models.Driver).delete()
     db.query(models.Vehicle).delete()
     db.query(models.User).delete()
     db.commit()
+    invalidate_principals()
     return seed_database(db)
 
 
@@ -328,4 +418,13 @@ def root():
         "status": "running",
         "docs": "/docs",
         "websocket": "ws://localhost:8001/ws",
+        "password_pool": password_pool.stats(),
     }
+
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def get_metrics():
+    """Prometheus scrape endpoint (per worker process)."""
+    if not metrics.METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,344 @@
+"""
+Prometheus-style metrics.
+
+A small in-process registry (counters, gauges, histograms with labels)
+rendered in the Prometheus text format at GET /metrics. Recording is a dict
+lookup plus a locked increment; everything else (cumulative buckets, label
+escaping, callback gauges) happens at scrape time. Per-statement SQL timing
+is the only hot-path hook with measurable cost, so it only runs while
+something has scraped within METRICS_IDLE_SECONDS.
+
+Every worker process keeps its own registry; scrape each worker (or run a
+single worker) to see the whole picture.
+"""
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_IDLE_SECONDS = float(os.getenv("METRICS_IDLE_SECONDS", "300"))
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "500"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+    suffix = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child series for these label values; past METRICS_MAX_SERIES new values fold into "other"."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                if key not in self._children and len(self._children) >= METRICS_MAX_SERIES:
+                    key = ("other",) * len(self.labelnames)
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def collect(self):
+        name = self.name + self.suffix
+        lines = [f"# HELP {name} {self.documentation}", f"# TYPE {name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render(key, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+    suffix = "_total"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def _render(self, key, child):
+        yield f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn  # computed at scrape time instead of recorded
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def collect(self):
+        if self.fn is None:
+            return super().collect()
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(value)}",
+        ]
+
+    def _render(self, key, child):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def _render(self, key, child):
+        with child.lock:
+            counts, total = list(child.counts), child.sum
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+        yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self.last_scrape = float("-inf")
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        self.last_scrape = time.monotonic()
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# Global singleton registry
+registry = Registry()
+
+
+def scraping() -> bool:
+    """True while someone has scraped recently; gates the costlier per-statement hooks."""
+    return METRICS_ENABLED and time.monotonic() - registry.last_scrape < METRICS_IDLE_SECONDS
+
+
+# ========================
+#  METRIC DEFINITIONS
+# ========================
+HTTP_REQUESTS = registry.counter(
+    "fleetflow_http_requests", "HTTP requests by route template and status code.", ("method", "route", "status"))
+HTTP_DURATION = registry.histogram(
+    "fleetflow_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+HTTP_IN_FLIGHT = registry.gauge(
+    "fleetflow_http_requests_in_flight", "HTTP requests currently being served.")
+
+DB_POOL_WAIT = registry.histogram(
+    "fleetflow_db_pool_checkout_seconds", "Time to check a connection out of the SQLAlchemy pool.",
+    buckets=FAST_BUCKETS)
+DB_STATEMENT_DURATION = registry.histogram(
+    "fleetflow_db_statement_duration_seconds", "SQL statement latency by shape (verb + tables).", ("shape",),
+    buckets=FAST_BUCKETS)
+
+WS_BROADCAST_DURATION = registry.histogram(
+    "fleetflow_ws_broadcast_seconds", "Time to fan one event out to every WebSocket client.", ("event",))
+WS_MESSAGES = registry.counter(
+    "fleetflow_ws_messages_sent", "WebSocket messages sent by outcome.", ("outcome",))
+
+PASSWORD_POOL_WAIT = registry.histogram(
+    "fleetflow_password_pool_wait_seconds", "Queue wait before a bcrypt hash/verify starts.")
+PASSWORD_POOL_REJECTED = registry.counter(
+    "fleetflow_password_pool_rejected", "bcrypt calls rejected by admission control (503).")
+
+REPORT_DURATION = registry.histogram(
+    "fleetflow_report_duration_seconds", "Report and export generation time.", ("report",))
+
+
+# ========================
+#  HELPERS
+# ========================
+_SHAPE_TABLES = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+["`]?([A-Za-z_]\w*)', re.IGNORECASE)
+_shape_cache: Dict[str, str] = {}
+
+
+def statement_shape(statement: str) -> str:
+    """'SELECT trips,vehicles' style label; literals and IN-list lengths never reach it."""
+    shape = _shape_cache.get(statement)
+    if shape is None:
+        words = statement.split(None, 1)
+        verb = words[0].upper() if words else "?"
+        tables = list(dict.fromkeys(t.lower() for t in _SHAPE_TABLES.findall(statement)))
+        shape = f"{verb} {','.join(tables)}".rstrip()
+        if len(_shape_cache) < 5000:
+            _shape_cache[statement] = shape
+    return shape
+
+
+def timed(histogram: Histogram, name: str, param: Optional[str] = None):
+    """
+    Decorator observing a function's duration under label `name`
+    (or "name:<value of keyword param>"). Keeps the signature FastAPI inspects.
+    """
+    def label(kwargs) -> str:
+        return f"{name}:{kwargs.get(param)}" if param else name
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.labels(label(kwargs)).observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.labels(label(kwargs)).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request count/latency per route template (not per raw path)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_DURATION.labels(scope["method"], route).observe(elapsed)
+            HTTP_REQUESTS.labels(scope["method"], route, status_code).inc()
@@ -1,6 +1,6 @@
 import uuid
 import datetime
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Text, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -31,10 +31,13 @@ class Vehicle(Base):
     mileage = Column(Float, default=0)              # km
     status = Column(String, default="available")    # available, on_trip, in_shop, retired
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # optimistic concurrency
 
     trips = relationship("Trip", back_populates="vehicle")
     maintenance_logs = relationship("MaintenanceLog", back_populates="vehicle")
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class Driver(Base):
     __tablename__ = "drivers"
@@ -47,9 +50,12 @@ class Driver(Base):
     duty_status = Column(String, default="on")   # on, off, suspended
     avatar_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # optimistic concurrency
 
     trips = relationship("Trip", back_populates="driver")
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class Trip(Base):
     __tablename__ = "trips"
@@ -63,11 +69,16 @@ class Trip(Base):
     end_time = Column(DateTime, nullable=True)
     status = Column(String, default="draft")        # draft, sent, done, canceled
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # optimistic concurrency
+    consolidated_into = Column(String, ForeignKey("trips.id"), nullable=True)  # canceled draft merged into this trip
+    distance_km = Column(Float, nullable=True)      # from telemetry when the trip is done; None = no pings
 
     vehicle = relationship("Vehicle", back_populates="trips")
     driver = relationship("Driver", back_populates="trips")
     fuel_logs = relationship("FuelLog", back_populates="trip")
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class MaintenanceLog(Base):
     __tablename__ = "maintenance_logs"
@@ -91,3 +102,33 @@ class FuelLog(Base):
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
     trip = relationship("Trip", back_populates="fuel_logs")
+
+
+class TelemetryPing(Base):
+    """Append-only odometer / GPS / fuel-level reading (see telemetry.py)."""
+    __tablename__ = "telemetry_pings"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    vehicle_id = Column(String, ForeignKey("vehicles.id"), nullable=False)
+    recorded_at = Column(DateTime, nullable=False)   # device time, UTC
+    odometer_km = Column(Float, nullable=True)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    fuel_level_pct = Column(Float, nullable=True)
+
+    __table_args__ = (Index("ix_telemetry_pings_vehicle_time", "vehicle_id", "recorded_at"),)
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a POST/PATCH sent with an Idempotency-Key (see idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)     # sha256 of method, path, query and body
+    status = Column(String, nullable=False)          # in_progress, completed
+    response_status = Column(Integer)
+    response_headers = Column(Text)                  # JSON list of [name, value]
+    response_body = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,101 @@
+"""
+Bounded worker pool for bcrypt hashing and verification.
+
+bcrypt costs ~200 ms of CPU per call. Running it in the request worker lets
+a login wave starve every other route, so hashes run on a small dedicated
+thread pool (bcrypt releases the GIL) behind an admission limit: when more
+than PASSWORD_POOL_MAX_PENDING calls are queued or running, new ones are
+rejected with 503 + Retry-After instead of piling up.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+import metrics
+
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", "64"))
+PASSWORD_POOL_RETRY_AFTER = os.getenv("PASSWORD_POOL_RETRY_AFTER", "2")
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordPool:
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        # Queue-wait statistics (seconds between submit and start of hashing)
+        self.calls = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _admit(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                metrics.PASSWORD_POOL_REJECTED.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication is busy, please retry shortly",
+                    headers={"Retry-After": PASSWORD_POOL_RETRY_AFTER},
+                )
+            self._pending += 1
+
+    def _release(self, waited: float):
+        with self._lock:
+            self._pending -= 1
+            self.calls += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        metrics.PASSWORD_POOL_WAIT.observe(waited)
+
+    def _run(self, submitted: float, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._release(started - submitted)
+
+    async def run(self, fn, *args):
+        self._admit()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, time.perf_counter(), fn, *args)
+
+    def run_sync(self, fn, *args):
+        """Blocking variant for sync code paths (seeding, scripts)."""
+        self._admit()
+        return self._executor.submit(self._run, time.perf_counter(), fn, *args).result()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._executor._max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "queue_wait_avg_ms": round(self.wait_total / self.calls * 1000, 2) if self.calls else 0.0,
+            "queue_wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+# Global singleton pool
+password_pool = PasswordPool(PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING)
+
+metrics.registry.gauge(
+    "fleetflow_password_pool_pending", "bcrypt calls queued or running.",
+    fn=lambda: password_pool._pending,
+)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(pwd_context.hash, password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await password_pool.run(pwd_context.verify, plain, hashed)
@@ -0,0 +1,45 @@
+"""
+Row-visibility policies.
+
+Each rule maps a (role, model) pair to a SQL predicate. Routers build their
+list queries through `visible_query` so hidden rows are filtered by the
+database and never loaded, and LIMIT/OFFSET apply to the visible rows only.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Query, Session
+import models
+
+# (role, model) -> predicate factories, combined with AND
+ROW_POLICIES: Dict[Tuple[str, type], List[Callable]] = {
+    # Dispatchers cannot assign vehicles that are in the maintenance shop
+    ("Dispatcher", models.Vehicle): [
+        lambda: models.Vehicle.status != "in_shop",
+    ],
+}
+
+
+def row_predicates(role: str, model) -> list:
+    """SQL predicates that apply to `model` rows for the given role."""
+    return [factory() for factory in ROW_POLICIES.get((role, model), [])]
+
+
+def apply_row_policy(query: Query, model, user) -> Query:
+    """Restrict an existing query on `model` to the rows `user` may see."""
+    predicates = row_predicates(user.role, model)
+    if predicates:
+        query = query.filter(*predicates)
+    return query
+
+
+def visible_query(db: Session, model, user) -> Query:
+    """Start a query on `model` with the user's row policy already applied."""
+    return apply_row_policy(db.query(model), model, user)
+
+
+def paginate(query: Query, offset: int = 0, limit: Optional[int] = None) -> Query:
+    """Apply OFFSET/LIMIT after the row policy so pages never come up short."""
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
@@ -0,0 +1,278 @@
+"""
+On-demand request profiling.
+
+A Fleet Manager sends `X-Profile: 1` with any request; that one request runs
+under a sampling profiler and the response carries `X-Profile-Id`. Profiles
+are saved as speedscope JSON (open at https://www.speedscope.app) under
+PROFILE_DIR and listed/downloaded through /api/admin/profiles.
+
+The sampler is a stdlib thread reading sys._current_frames() every
+PROFILE_INTERVAL_MS. It keeps event-loop stacks that pass through this
+request's middleware frame (so concurrent requests don't leak in) and
+worker-thread stacks whose current job runs in this request's context: the
+middleware sets a ContextVar to the sampler, the threadpool runs each job in
+a copy of the caller's context, and the pool thread's loop frame holds that
+context while the job runs. At most
+PROFILE_MAX_CONCURRENT requests are profiled at once; others run normally
+with `X-Profile-Status: busy`. Headers from anyone else are ignored.
+"""
+import contextvars
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+load_dotenv()
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./runtime/profiles")
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_ROLES = {"Fleet Manager"}
+
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+_slots = threading.BoundedSemaphore(PROFILE_MAX_CONCURRENT) if PROFILE_MAX_CONCURRENT > 0 else None
+
+FrameKey = Tuple[str, str, int]
+
+# The sampler of the request being served, seen by every worker job it starts
+_sampling: contextvars.ContextVar[Optional["Sampler"]] = contextvars.ContextVar("profiler_sampling", default=None)
+
+# Outermost frames of a pool thread (bootstrap + the pool's job loop) searched for the job's context
+WORKER_LOOP_FRAMES = 4
+
+
+class Sampler(threading.Thread):
+    """Samples the stacks belonging to one request until stopped."""
+
+    def __init__(self, loop_thread_id: int, marker_frame):
+        super().__init__(name="request-profiler", daemon=True)
+        self.loop_thread_id = loop_thread_id
+        self.marker_frame = marker_frame
+        self.interval = PROFILE_INTERVAL_MS / 1000
+        self.frames: Dict[FrameKey, int] = {}
+        # thread id -> (samples as frame-index lists, weights in ms)
+        self.samples: Dict[int, Tuple[List[List[int]], List[float]]] = {}
+        self._stop_event = threading.Event()
+        self.started_at = time.perf_counter()
+        self.elapsed = 0.0
+
+    def _runs_our_job(self, outer_frames) -> bool:
+        for frame in outer_frames:
+            for value in frame.f_locals.values():
+                if isinstance(value, contextvars.Context) and value.get(_sampling) is self:
+                    return True
+        return False
+
+    def _stack(self, frame, must_contain=None) -> Optional[List[int]]:
+        keys = []
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            code = frame.f_code
+            keys.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        if must_contain is not None:
+            if not any(f is must_contain for f in frames):
+                return None
+        elif not self._runs_our_job(frames[-WORKER_LOOP_FRAMES:]):
+            return None
+        stack = []
+        for key in reversed(keys):
+            index = self.frames.get(key)
+            if index is None:
+                index = self.frames[key] = len(self.frames)
+            stack.append(index)
+        return stack
+
+    def run(self):
+        me = threading.get_ident()
+        last = time.perf_counter()
+        deadline = last + PROFILE_MAX_SECONDS
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            weight = (now - last) * 1000
+            last = now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id == self.loop_thread_id:
+                    stack = self._stack(frame, must_contain=self.marker_frame)
+                else:
+                    stack = self._stack(frame)
+                if stack:
+                    stacks, weights = self.samples.setdefault(thread_id, ([], []))
+                    stacks.append(stack)
+                    weights.append(weight)
+            if now > deadline:
+                break
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def speedscope(self, name: str) -> dict:
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        profiles = []
+        for thread_id, (stacks, weights) in self.samples.items():
+            label = "event loop" if thread_id == self.loop_thread_id else thread_names.get(thread_id, str(thread_id))
+            profiles.append({
+                "type": "sampled",
+                "name": f"{name} [{label}]",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": stacks,
+                "weights": [round(w, 3) for w in weights],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "fleetflow-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [
+                {"name": n, "file": f, "line": line} for (n, f, line) in sorted(self.frames, key=self.frames.get)
+            ]},
+            "profiles": profiles,
+        }
+
+
+def _bearer_token(scope: dict) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" else None
+    return None
+
+
+def _wants_profile(scope: dict) -> bool:
+    return any(key == b"x-profile" and value.strip() in (b"1", b"true") for key, value in scope.get("headers", []))
+
+
+async def _authorized(scope: dict) -> bool:
+    from auth import resolve_principal
+    token = _bearer_token(scope)
+    if not token:
+        return False
+    try:
+        principal = await run_in_threadpool(resolve_principal, token)
+    except HTTPException:
+        return False
+    return principal.role in PROFILE_ROLES
+
+
+def _save(profile_id: str, sampler: Sampler, route: str, status_code: int) -> dict:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    meta = {
+        "id": profile_id,
+        "route": route,
+        "status": status_code,
+        "created_at": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "duration_ms": round(sampler.elapsed * 1000, 1),
+        "samples": sum(len(w) for _, w in sampler.samples.values()),
+        "threads": len(sampler.samples),
+        "interval_ms": PROFILE_INTERVAL_MS,
+        "pid": os.getpid(),
+    }
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.speedscope.json"), "w", encoding="utf-8") as f:
+        json.dump(sampler.speedscope(route), f)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    _prune()
+    return meta
+
+
+def _prune():
+    metas = sorted(
+        (p for p in os.listdir(PROFILE_DIR) if p.endswith(".meta.json")),
+        key=lambda p: os.path.getmtime(os.path.join(PROFILE_DIR, p)),
+    )
+    for name in metas[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        profile_id = name.split(".", 1)[0]
+        for suffix in (".meta.json", ".speedscope.json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[dict]:
+    """Newest-first metadata of stored profiles."""
+    try:
+        names = [p for p in os.listdir(PROFILE_DIR) if p.endswith(".meta.json")]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda m: m.get("created_at", ""), reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.speedscope.json")
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware running requests marked `X-Profile: 1` under the sampler."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _slots is None or not _wants_profile(scope) or not await _authorized(scope):
+            return await self.app(scope, receive, send)
+
+        if not _slots.acquire(blocking=False):
+            async def send_busy(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-profile-status", b"busy")]
+                await send(message)
+            return await self.app(scope, receive, send_busy)
+
+        profile_id = uuid.uuid4().hex
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode()),
+                    (b"x-profile-status", b"recorded"),
+                ]
+            await send(message)
+
+        sampler = Sampler(threading.get_ident(), sys._getframe())
+        token = _sampling.set(sampler)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            _sampling.reset(token)
+            route = f"{scope['method']} {getattr(scope.get('route'), 'path', None) or scope['path']}"
+            try:
+                await run_in_threadpool(_save, profile_id, sampler, route, status_code)
+            except OSError:
+                pass
+            finally:
+                _slots.release()
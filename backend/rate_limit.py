@@ -0,0 +1,275 @@
+"""
+Per-user admission control and load shedding.
+
+Every API request is put in a route class and charged one token from the
+caller's bucket for that class (users by token subject, anonymous callers by
+client IP). Reports and exports additionally hold one of a few concurrency
+slots while they run. Over the limit the request is answered immediately:
+
+    429 + Retry-After   bucket empty (time until the next token)
+    503 + Retry-After   no free slot for a report/export
+
+so one analyst re-downloading PDFs in a loop is turned away in microseconds
+instead of tying up DB connections and threads. Trip status changes are
+never limited (dispatch-critical), nor are /auth (bcrypt has its own
+admission pool), /api/telemetry (bounded by the telemetry buffer), /ws,
+/metrics and the docs.
+
+Limits are "requests per minute/burst" per class (RATE_LIMIT_READS etc.);
+"0" disables a class. State lives in process memory by default; with
+RATE_LIMIT_STORE=sqlite buckets and slots live in a small SQLite file
+(RATE_LIMIT_DB_PATH) shared by every worker on the host.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+import metrics
+
+load_dotenv()
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "./runtime/rate_limits.db")
+RATE_LIMIT_SLOT_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_SLOT_LEASE_SECONDS", "300"))
+HEAVY_RETRY_AFTER = os.getenv("HEAVY_RETRY_AFTER", "5")
+
+
+def _parse_limit(value: str) -> Optional[Tuple[float, float]]:
+    """'60/10' -> (1.0 token per second, burst 10); '0' -> None (unlimited)."""
+    per_minute, _, burst = value.partition("/")
+    per_minute = float(per_minute)
+    if per_minute <= 0:
+        return None
+    return per_minute / 60, float(burst or max(1.0, per_minute / 6))
+
+
+# class -> (tokens per second, burst)
+RATE_LIMITS: Dict[str, Optional[Tuple[float, float]]] = {
+    "reads": _parse_limit(os.getenv("RATE_LIMIT_READS", "1200/120")),
+    "writes": _parse_limit(os.getenv("RATE_LIMIT_WRITES", "300/60")),
+    "reports": _parse_limit(os.getenv("RATE_LIMIT_REPORTS", "30/10")),
+    "exports": _parse_limit(os.getenv("RATE_LIMIT_EXPORTS", "6/3")),
+}
+# class -> requests running at once (per host with the sqlite store, else per worker)
+CONCURRENCY_LIMITS: Dict[str, int] = {
+    "reports": int(os.getenv("REPORTS_MAX_CONCURRENT", "4")),
+    "exports": int(os.getenv("EXPORTS_MAX_CONCURRENT", "2")),
+}
+
+EXEMPT_PREFIXES = ("/auth/", "/api/telemetry", "/ws", "/metrics", "/docs", "/redoc", "/openapi.json")
+
+RATE_LIMITED = metrics.registry.counter(
+    "fleetflow_rate_limited", "Requests shed by admission control.", ("route_class", "reason"))
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Admission class of a request, or None if it is never limited."""
+    if path.startswith(EXEMPT_PREFIXES) or not path.startswith("/api/"):
+        return None
+    if path.startswith("/api/trips/") and (path.endswith("/status") or path.endswith("/status:batch")):
+        return None  # dispatch-critical
+    if path.startswith("/api/reports/export/"):
+        return "exports"
+    if path.startswith("/api/reports/"):
+        return "reports"
+    return "reads" if method in ("GET", "HEAD", "OPTIONS") else "writes"
+
+
+# ========================
+#  STORES
+# ========================
+class MemoryStore:
+    """Buckets and slots of this worker only."""
+    blocking = False
+    prune_interval = 60.0
+    max_buckets = 50_000
+
+    def __init__(self):
+        # key -> (tokens, updated, seconds to refill from empty)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._slots: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+        self._prune_at = self.max_buckets
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Charge one token; 0 if allowed, else seconds until one is available."""
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is None:
+                # New callers are where the dict grows, allowed or not
+                if now >= self._next_prune or len(self._buckets) >= self._prune_at:
+                    self._prune(now)
+                tokens, updated = burst, now
+            else:
+                tokens, updated, _ = entry
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait == 0.0:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, burst / rate)
+            return wait
+
+    def _prune(self, now: float):
+        # Buckets idle long enough to be full again are equivalent to absent ones;
+        # each by its own class's refill time, not the caller's
+        for key in [k for k, (_, updated, refill) in self._buckets.items() if now - updated > refill]:
+            del self._buckets[key]
+        self._next_prune = now + self.prune_interval
+        # Still crowded with live buckets: don't rescan on every new caller
+        self._prune_at = max(self.max_buckets, 2 * len(self._buckets))
+
+    def acquire(self, name: str, limit: int, lease_id: str, now: float) -> bool:
+        with self._lock:
+            if self._slots.get(name, 0) >= limit:
+                return False
+            self._slots[name] = self._slots.get(name, 0) + 1
+            return True
+
+    def release(self, name: str, lease_id: str):
+        with self._lock:
+            self._slots[name] = max(0, self._slots.get(name, 0) - 1)
+
+
+class SQLiteStore:
+    """Buckets and slots in a SQLite file shared by every worker on the host."""
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS slots (name TEXT, lease_id TEXT PRIMARY KEY, expires REAL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=OFF")
+        return conn
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait == 0.0:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+            return wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, name: str, limit: int, lease_id: str, now: float) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Leases of crashed workers run out after RATE_LIMIT_SLOT_LEASE_SECONDS
+            conn.execute("DELETE FROM slots WHERE expires < ?", (now,))
+            (held,) = conn.execute("SELECT COUNT(*) FROM slots WHERE name = ?", (name,)).fetchone()
+            if held >= limit:
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT INTO slots (name, lease_id, expires) VALUES (?, ?, ?)",
+                         (name, lease_id, now + RATE_LIMIT_SLOT_LEASE_SECONDS))
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, name: str, lease_id: str):
+        self._connect().execute("DELETE FROM slots WHERE lease_id = ?", (lease_id,))
+
+
+def _make_store():
+    if RATE_LIMIT_STORE == "sqlite":
+        return SQLiteStore(RATE_LIMIT_DB_PATH)
+    return MemoryStore()
+
+
+# Global singleton store
+store = _make_store()
+
+
+# ========================
+#  MIDDLEWARE
+# ========================
+def _caller(headers: Headers, scope: dict) -> str:
+    from auth import token_user_id
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token.strip():
+        user_id = token_user_id(token.strip())
+        if user_id:
+            return f"user:{user_id}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else '-'}"
+
+
+async def _call(fn, *args):
+    return await run_in_threadpool(fn, *args) if store.blocking else fn(*args)
+
+
+def _reject(status: int, klass: str, reason: str, retry_after: str, detail: str) -> JSONResponse:
+    RATE_LIMITED.labels(klass, reason).inc()
+    return JSONResponse(
+        {"detail": detail}, status_code=status,
+        headers={"Retry-After": retry_after, "X-RateLimit-Class": klass},
+    )
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware: token buckets per (caller, class), slots for reports and exports."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        klass = route_class(scope["method"], scope["path"])
+        if klass is None:
+            return await self.app(scope, receive, send)
+
+        limit = RATE_LIMITS.get(klass)
+        if limit is not None:
+            rate, burst = limit
+            caller = _caller(Headers(scope=scope), scope)
+            wait = await _call(store.take, f"{caller}:{klass}", rate, burst, time.time())
+            if wait > 0:
+                retry_after = str(max(1, math.ceil(wait)))
+                return await _reject(
+                    429, klass, "rate", retry_after,
+                    f"Too many {klass} requests; retry in {retry_after}s",
+                )(scope, receive, send)
+
+        slots = CONCURRENCY_LIMITS.get(klass, 0)
+        if slots <= 0:
+            return await self.app(scope, receive, send)
+        lease_id = uuid.uuid4().hex
+        if not await _call(store.acquire, klass, slots, lease_id, time.time()):
+            return await _reject(
+                503, klass, "concurrency", HEAVY_RETRY_AFTER,
+                f"Too many {klass} running; retry shortly",
+            )(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await _call(store.release, klass, lease_id)
@@ -0,0 +1,185 @@
+"""
+Versioned cache of report outputs (JSON bodies, CSV and PDF bytes).
+
+Entries are keyed by report, parameters, date and the data versions of the
+tables the report reads (data_versions.py), so a write to `fuel_logs`
+changes the key of every fuel-dependent report and leaves the others, e.g.
+driver alerts, cached. Nothing is ever invalidated explicitly; superseded
+entries simply stop being asked for and age out.
+
+Two tiers:
+- memory: LRU per worker, capped at REPORT_CACHE_MAX_BYTES;
+- disk (REPORT_CACHE_DIR set): one file per entry, shared by the workers of
+  a host (their data versions agree) and surviving restarts, capped at
+  REPORT_CACHE_DISK_MAX_BYTES (oldest files removed first).
+
+Entries expire after REPORT_CACHE_TTL_SECONDS as a backstop for writes the
+API does not see (scripts, manual SQL).
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "3600"))
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "")
+REPORT_CACHE_DISK_MAX_BYTES = int(os.getenv("REPORT_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+REPORT_CACHE_REQUESTS = metrics.registry.counter(
+    "fleetflow_report_cache_requests", "Report cache lookups by outcome (hit tier or miss).", ("report", "outcome"))
+
+
+class ReportCache:
+    """Memory LRU in front of an optional shared directory of cached report bodies."""
+
+    def __init__(self, max_bytes: int, ttl: float, directory: str = "", disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_written = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def digest(key: Hashable) -> str:
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    # ---- memory tier ----
+    def _memory_get(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            body, expires_at = entry
+            if expires_at < time.time():
+                self._drop(digest)
+                return None
+            self._entries.move_to_end(digest)
+            return body
+
+    def _memory_put(self, digest: str, body: bytes, expires_at: float):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if digest in self._entries:
+                self._drop(digest)
+            self._entries[digest] = (body, expires_at)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, digest: str):
+        body, _ = self._entries.pop(digest)
+        self._bytes -= len(body)
+
+    # ---- disk tier ----
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _disk_get(self, digest: str) -> Optional[Tuple[bytes, float]]:
+        path = self._path(digest)
+        try:
+            expires_at = os.stat(path).st_mtime + self.ttl
+            if expires_at < time.time():
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read(), expires_at
+        except OSError:
+            return None
+
+    def _disk_put(self, digest: str, body: bytes):
+        path = self._path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)  # readers in other workers never see a partial file
+        except OSError:
+            return
+        self._disk_written += len(body)
+        if self._disk_written >= self.disk_max_bytes // 10:
+            self._disk_written = 0
+            self.trim_disk()
+
+    def trim_disk(self):
+        """Remove expired files, then the oldest ones until under REPORT_CACHE_DISK_MAX_BYTES."""
+        files, total, now = [], 0, time.time()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_mtime + self.ttl < now:
+                    self._remove(path)
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # ---- public ----
+    def get(self, report: str, key: Hashable) -> Optional[bytes]:
+        """Cached body or None; may read a file, so call it off the event loop when the disk tier is on."""
+        digest = self.digest(key)
+        body = self._memory_get(digest)
+        if body is not None:
+            REPORT_CACHE_REQUESTS.labels(report, "hit_memory").inc()
+            return body
+        if self.directory:
+            entry = self._disk_get(digest)
+            if entry is not None:
+                REPORT_CACHE_REQUESTS.labels(report, "hit_disk").inc()
+                self._memory_put(digest, *entry)
+                return entry[0]
+        REPORT_CACHE_REQUESTS.labels(report, "miss").inc()
+        return None
+
+    def put(self, key: Hashable, body: bytes):
+        digest = self.digest(key)
+        self._memory_put(digest, body, time.time() + self.ttl)
+        if self.directory:
+            self._disk_put(digest, body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Global singleton cache
+report_cache = ReportCache(
+    REPORT_CACHE_MAX_BYTES, REPORT_CACHE_TTL_SECONDS, REPORT_CACHE_DIR, REPORT_CACHE_DISK_MAX_BYTES,
+)
+
+metrics.registry.gauge(
+    "fleetflow_report_cache_memory_bytes", "Bytes held by the in-memory report cache.",
+    fn=lambda: report_cache._bytes,
+)
@@ -0,0 +1,57 @@
+"""
+Per-request context available anywhere below the ASGI app (engine hooks,
+worker threads), e.g. to tag a slow SQL statement with the route that ran it.
+
+The middleware stores the ASGI scope in a ContextVar; routing later adds the
+matched route to that same dict, and Starlette copies the context into the
+threadpool that runs sync endpoints. It also maps the asyncio task serving
+each request to its scope, for code that only knows the task (the event-loop
+watchdog runs on another thread).
+"""
+import asyncio
+import weakref
+from contextvars import ContextVar
+from typing import Optional
+
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+_task_scopes: "weakref.WeakKeyDictionary[asyncio.Task, dict]" = weakref.WeakKeyDictionary()
+
+
+def _describe(scope: Optional[dict]) -> Optional[str]:
+    if scope is None:
+        return None
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "")
+    method = scope.get("method", "WS" if scope.get("type") == "websocket" else "")
+    return f"{method} {path}".strip()
+
+
+def current_route() -> Optional[str]:
+    """'PATCH /api/trips/{trip_id}/status' for the request being served, else None."""
+    return _describe(current_scope.get())
+
+
+def route_for_task(task: Optional[asyncio.Task]) -> Optional[str]:
+    """Route served by `task`, if it is a request task."""
+    return _describe(_task_scopes.get(task)) if task is not None else None
+
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware publishing the current scope to `current_scope`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        token = current_scope.set(scope)
+        task = asyncio.current_task()
+        if task is not None:
+            _task_scopes[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
+            if task is not None:
+                _task_scopes.pop(task, None)
@@ -0,0 +1,235 @@
+"""
+Response compression (gzip, and brotli / zstd when their packages are installed).
+
+The encoding is negotiated per request from Accept-Encoding (q-values
+honoured, ties broken by COMPRESSION_ENCODINGS order). Bodies are compressed
+chunk by chunk as the app sends them, each chunk flushed so a
+StreamingResponse (CSV export, streamed JSON list) reaches the client
+progressively instead of being buffered; chunks smaller than
+COMPRESSION_FLUSH_BYTES are flushed together. Only text-like media types are
+compressed (PDFs and images already are), single bodies below
+COMPRESSION_MIN_BYTES are sent as-is, and chunks of COMPRESSION_THREAD_BYTES
+or more are compressed in the threadpool so large exports don't block the
+event loop.
+
+Optional packages: `pip install brotli zstandard`.
+"""
+import os
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+load_dotenv()
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip").split(",") if e.strip()]
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+COMPRESSION_THREAD_BYTES = int(os.getenv("COMPRESSION_THREAD_BYTES", str(64 * 1024)))
+COMPRESSION_FLUSH_BYTES = int(os.getenv("COMPRESSION_FLUSH_BYTES", str(16 * 1024)))
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+SKIP_STATUSES = {204, 206, 304}
+
+COMPRESSION_BYTES = metrics.registry.counter(
+    "fleetflow_compression_bytes", "Response bytes before (in) and after (out) compression.", ("encoding", "stage"))
+COMPRESSION_SECONDS = metrics.registry.counter(
+    "fleetflow_compression_seconds", "Time spent compressing response bodies.", ("encoding",))
+
+
+# ========================
+#  COMPRESSORS
+# ========================
+class _Gzip:
+    def __init__(self):
+        self._c = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes, final: bool, flush: bool = True) -> bytes:
+        out = self._c.compress(data)
+        if final:
+            return out + self._c.flush(zlib.Z_FINISH)
+        return out + self._c.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+
+class _Brotli:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool, flush: bool = True) -> bytes:
+        out = self._c.process(data)
+        if final:
+            return out + self._c.finish()
+        return out + self._c.flush() if flush else out
+
+
+class _Zstd:
+    def __init__(self):
+        self._c = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes, final: bool, flush: bool = True) -> bytes:
+        out = self._c.compress(data)
+        if final:
+            return out + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+        return out + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+
+
+def available_encodings() -> Dict[str, Callable]:
+    """Compressor factories usable in this process, in server preference order."""
+    factories = {"gzip": _Gzip}
+    if brotli is not None:
+        factories["br"] = _Brotli
+    if zstandard is not None:
+        factories["zstd"] = _Zstd
+    return {name: factories[name] for name in COMPRESSION_ENCODINGS if name in factories}
+
+
+_ENCODERS = available_encodings()
+
+
+def negotiate(accept_encoding: str, encoders: Optional[List[str]] = None) -> Optional[str]:
+    """Best encoding for an Accept-Encoding header, or None for identity."""
+    encoders = list(_ENCODERS) if encoders is None else encoders
+    if not accept_encoding or not encoders:
+        return None
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    wildcard = weights.get("*", 0.0)
+    ranked = [(weights.get(name, wildcard), -i, name) for i, name in enumerate(encoders)]
+    q, _, name = max(ranked)
+    return name if q > 0 else None
+
+
+def _compressible(headers: Headers, status: int) -> bool:
+    if status in SKIP_STATUSES or status < 200 or "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _add_vary(headers: MutableHeaders):
+    vary = headers.get("vary", "")
+    if "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+
+
+# ========================
+#  MIDDLEWARE
+# ========================
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing (streamed) response bodies per Accept-Encoding."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _ENCODERS:
+            return await self.app(scope, receive, send)
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start_message = None
+        buffered: List[bytes] = []
+        compressor = None
+        passthrough = False
+        unflushed = 0
+
+        async def compress(data: bytes, final: bool) -> bytes:
+            # Tiny chunks (a CSV line each) are flushed together; a flush per chunk would wreck the ratio
+            nonlocal unflushed
+            unflushed += len(data)
+            flush = unflushed >= COMPRESSION_FLUSH_BYTES
+            if flush or final:
+                unflushed = 0
+            started = time.perf_counter()
+            if len(data) >= COMPRESSION_THREAD_BYTES:
+                out = await run_in_threadpool(compressor.compress, data, final, flush)
+            else:
+                out = compressor.compress(data, final, flush)
+            COMPRESSION_SECONDS.labels(encoding).inc(time.perf_counter() - started)
+            COMPRESSION_BYTES.labels(encoding, "in").inc(len(data))
+            COMPRESSION_BYTES.labels(encoding, "out").inc(len(out))
+            return out
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", []))
+                headers = MutableHeaders(raw=message["headers"])
+                length = headers.get("content-length")
+                if _compressible(headers, message["status"]):
+                    _add_vary(headers)
+                    passthrough = encoding is None or (
+                        length is not None and length.isdigit() and int(length) < COMPRESSION_MIN_BYTES)
+                else:
+                    passthrough = True
+                if passthrough:
+                    return await send(message)
+                start_message = message
+                return
+
+            if compressor is not None:
+                more_body = message.get("more_body", False)
+                body = await compress(message.get("body", b""), final=not more_body)
+                if body or not more_body:
+                    await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            if message["type"] != "http.response.body":
+                passthrough = True
+                await send(start_message)
+                if buffered:
+                    await send({"type": "http.response.body", "body": b"".join(buffered), "more_body": True})
+                return await send(message)
+
+            # Hold back at most COMPRESSION_MIN_BYTES until we know the body is worth compressing
+            buffered.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+            size = sum(len(b) for b in buffered)
+            if more_body and size < COMPRESSION_MIN_BYTES:
+                return
+            body = b"".join(buffered)
+            buffered.clear()
+            if not more_body and size < COMPRESSION_MIN_BYTES:
+                passthrough = True
+                await send(start_message)
+                return await send({"type": "http.response.body", "body": body, "more_body": False})
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            compressor = _ENCODERS[encoding]()
+            headers["Content-Encoding"] = encoding
+            del headers["Content-Length"]
+            body = await compress(body, final=not more_body)
+            if not more_body:
+                headers["Content-Length"] = str(len(body))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
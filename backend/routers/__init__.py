@@ -1,4 +1,4 @@
-from routers import auth_router, vehicles_router, drivers_router, trips_router, maintenance_router, reports_router, fuel_router
+from routers import auth_router, vehicles_router, drivers_router, trips_router, maintenance_router, reports_router, fuel_router, search_router, bulk_router, admin_router, dashboard_router, dispatch_router, telemetry_router
 
 __all__ = [
     "auth_router",
@@ -8,4 +8,10 @@ __all__ = [
     "maintenance_router",
     "reports_router",
     "fuel_router",
+    "search_router",
+    "bulk_router",
+    "admin_router",
+    "dashboard_router",
+    "dispatch_router",
+    "telemetry_router",
 ]
@@ -0,0 +1,48 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+import models
+from auth import require_roles
+import profiler
+import slow_query_log
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(100, ge=1, le=1000),
+    route: Optional[str] = Query(None, description="Substring of the route, e.g. 'vehicle-profitability'"),
+    min_ms: float = Query(0, ge=0),
+    current_user: models.User = Depends(require_roles("Fleet Manager")),
+):
+    """Newest slow statements from this host's slow-query log, with parameter shapes, route and plan."""
+    entries = await run_in_threadpool(slow_query_log.read_entries, limit, route, min_ms)
+    return {
+        "threshold_ms": slow_query_log.SLOW_QUERY_MS,
+        "sample_rate": slow_query_log.SLOW_QUERY_SAMPLE_RATE,
+        "count": len(entries),
+        "entries": entries,
+    }
+
+
+@router.get("/profiles")
+async def get_profiles(
+    current_user: models.User = Depends(require_roles("Fleet Manager")),
+):
+    """Profiles recorded on this host via the X-Profile header, newest first."""
+    profiles = await run_in_threadpool(profiler.list_profiles)
+    return {"count": len(profiles), "profiles": profiles}
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(
+    profile_id: str,
+    current_user: models.User = Depends(require_roles("Fleet Manager")),
+):
+    """Download one profile as speedscope JSON (open it at https://www.speedscope.app)."""
+    path = profiler.profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=f"profile-{profile_id}.speedscope.json")
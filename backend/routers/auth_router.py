@@ -1,12 +1,14 @@
 import datetime
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from database import get_db
 import models
 import schemas
-from auth import hash_password, verify_password, create_access_token, create_refresh_token, decode_token, get_current_user
+from auth import create_access_token, create_refresh_token, decode_token, get_current_user
+from password_pool import hash_password_async, verify_password_async
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -23,36 +25,46 @@ class ChangePasswordRequest(BaseModel):
     new_password: str
 
 
+# The async handlers below await the bcrypt pool; their queries run in the
+# threadpool so they never block the event loop
+def _user_by_email(db: Session, email: str) -> Optional[models.User]:
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def _save(db: Session, user: models.User) -> models.User:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
 @router.post("/register", response_model=schemas.UserResponse, status_code=201)
-def register(req: schemas.RegisterRequest, db: Session = Depends(get_db)):
+async def register(req: schemas.RegisterRequest, db: Session = Depends(get_db)):
     """Register a new user. Only Flask Manager can add Safety Officer / Financial Analyst roles."""
     allowed_roles = ["Fleet Manager", "Dispatcher", "Safety Officer", "Financial Analyst"]
     if req.role not in allowed_roles:
         raise HTTPException(status_code=400, detail=f"Invalid role. Choose from: {allowed_roles}")
 
-    existing = db.query(models.User).filter(models.User.email == req.email).first()
+    existing = await run_in_threadpool(_user_by_email, db, req.email)
     if existing:
         raise HTTPException(status_code=400, detail="User with this email already exists")
 
     user = models.User(
         name=req.name,
         email=req.email,
-        hashed_password=hash_password(req.password),
+        hashed_password=await hash_password_async(req.password),
         role=req.role,
         is_active=True,
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    return await run_in_threadpool(_save, db, user)
 
 
 @router.post("/login", response_model=schemas.TokenResponse)
-def login(req: schemas.LoginRequest, db: Session = Depends(get_db)):
+async def login(req: schemas.LoginRequest, db: Session = Depends(get_db)):
     """Login with email + password. Returns JWT access + refresh tokens."""
-    user = db.query(models.User).filter(models.User.email == req.email).first()
+    user = await run_in_threadpool(_user_by_email, db, req.email)
 
-    if not user or not verify_password(req.password, user.hashed_password):
+    if not user or not await verify_password_async(req.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
@@ -125,18 +137,18 @@ def update_me(
 
 
 @router.patch("/me/password")
-def change_password(
+async def change_password(
     req: ChangePasswordRequest,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """Change the currently authenticated user's password."""
-    if not verify_password(req.current_password, current_user.hashed_password):
+    if not await verify_password_async(req.current_password, current_user.hashed_password):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     if len(req.new_password) < 6:
         raise HTTPException(status_code=400, detail="New password must be at least 6 characters")
-    current_user.hashed_password = hash_password(req.new_password)
-    db.commit()
+    current_user.hashed_password = await hash_password_async(req.new_password)
+    await run_in_threadpool(db.commit)
     return {"msg": "Password updated successfully"}
 
 
@@ -0,0 +1,394 @@
+"""
+Bulk ingest endpoints for onboarding whole depots.
+
+Request bodies are CSV (header row + one record per line; quoted fields may
+span lines) or NDJSON (one JSON object per line) and are read as a stream.
+Records are validated in batches, checked for duplicates / missing parents
+with one set-based query per batch, and written with executemany in one
+transaction per batch. Errors refer to the line a record starts on.
+"""
+import csv
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import get_db
+import models
+import schemas
+from auth import require_roles
+from websocket_manager import manager
+from routers.vehicles_router import build_stats
+
+router = APIRouter(prefix="/api/bulk", tags=["Bulk Ingest"])
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "2000"))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+BULK_MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", str(1024 * 1024)))
+
+CSV_TYPES = {"text/csv", "application/csv"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+
+
+@dataclass(frozen=True)
+class BulkSpec:
+    schema: type                     # pydantic create schema, same as the single-row POST
+    model: type                      # ORM model to insert into
+    unique_field: Optional[str] = None   # column that must not already exist
+    parent_field: Optional[str] = None   # foreign key column that must exist
+    parent_model: Optional[type] = None
+
+
+BULK_SPECS = {
+    "vehicles": BulkSpec(schemas.VehicleCreate, models.Vehicle, unique_field="plate_number"),
+    "drivers": BulkSpec(schemas.DriverCreate, models.Driver, unique_field="license_number"),
+    "fuel": BulkSpec(schemas.FuelLogCreate, models.FuelLog, parent_field="trip_id", parent_model=models.Trip),
+    "maintenance": BulkSpec(schemas.MaintenanceCreate, models.MaintenanceLog, parent_field="vehicle_id", parent_model=models.Vehicle),
+}
+
+
+class _Report:
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < BULK_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+
+def _detect_format(request: Request, fmt: Optional[str]) -> str:
+    if fmt:
+        if fmt not in ("csv", "ndjson"):
+            raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+        return fmt
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in CSV_TYPES:
+        return "csv"
+    if content_type in NDJSON_TYPES:
+        return "ndjson"
+    raise HTTPException(
+        status_code=415,
+        detail="Send text/csv or application/x-ndjson (or pass ?format=csv|ndjson)",
+    )
+
+
+def _decode(raw: bytes, line_no: int) -> Optional[str]:
+    try:
+        return raw.decode("utf-8-sig" if line_no == 1 else "utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        return None
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yield (line_number, raw line without its newline) from the streamed body
+    without buffering it whole. A line longer than BULK_MAX_LINE_BYTES is a 413.
+    """
+    pending = bytearray()
+    line_no = 0
+    async for chunk in request.stream():
+        search = len(pending)   # the bytes before this chunk hold no newline
+        pending += chunk
+        start = 0
+        while (end := pending.find(b"\n", search)) >= 0:
+            line_no += 1
+            yield line_no, bytes(pending[start:end])
+            start = search = end + 1
+        del pending[:start]
+        if len(pending) > BULK_MAX_LINE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Line {line_no + 1} is longer than {BULK_MAX_LINE_BYTES} bytes")
+    if pending:
+        line_no += 1
+        yield line_no, bytes(pending)
+
+
+class _QueuedLines:
+    """Source of one csv.reader: lines are queued as they arrive, and the reader
+    is only advanced once the queue holds a whole record."""
+
+    def __init__(self):
+        self.lines: Deque[str] = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _iter_ndjson(request: Request, report: _Report) -> AsyncIterator[Tuple[int, dict]]:
+    async for line_no, raw in _iter_lines(request):
+        text = _decode(raw, line_no)
+        if text is None:
+            report.received += 1
+            report.error(line_no, "Line is not valid UTF-8")
+            continue
+        if not text.strip():
+            continue
+        report.received += 1
+        try:
+            record = json.loads(text)
+        except ValueError as exc:
+            report.error(line_no, f"Invalid JSON: {exc}")
+            continue
+        if not isinstance(record, dict):
+            report.error(line_no, "Each line must be a JSON object")
+            continue
+        yield line_no, record
+
+
+async def _iter_csv_rows(request: Request, report: _Report) -> AsyncIterator[Tuple[int, Optional[List[str]]]]:
+    """
+    Yield (line the record starts on, values) per CSV record; quoted fields may
+    span lines. Values are None for a record with a line that is not UTF-8.
+    """
+    queued = _QueuedLines()
+    reader = csv.reader(queued)
+    first_line, quotes, size, undecodable = None, 0, 0, False
+    async for line_no, raw in _iter_lines(request):
+        text = _decode(raw, line_no)
+        if first_line is None:
+            first_line = line_no
+        # Quotes come in pairs ("" escapes one), so an odd count means a quoted field is still open
+        quotes += raw.count(b'"')
+        size += len(raw) + 1
+        if text is None:
+            undecodable = True
+        else:
+            queued.lines.append(text + "\n")
+        if quotes % 2:
+            if size > BULK_MAX_LINE_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Line {first_line}: record is longer than {BULK_MAX_LINE_BYTES} bytes (unclosed quote?)",
+                )
+            continue
+        record_line, first_line, quotes, size = first_line, None, 0, 0
+        if undecodable:
+            queued.lines.clear()
+            undecodable = False
+            yield record_line, None
+            continue
+        try:
+            yield record_line, next(reader)
+        except csv.Error as exc:
+            queued.lines.clear()
+            report.received += 1
+            report.error(record_line, f"Invalid CSV: {exc}")
+    if first_line is not None:
+        queued.lines.clear()
+        report.received += 1
+        report.error(first_line, "Quoted field is not closed")
+
+
+async def _iter_records(request: Request, fmt: str, report: _Report) -> AsyncIterator[Tuple[int, dict]]:
+    """Yield (line_number, record) pairs; records that fail to parse are reported and skipped."""
+    if fmt == "ndjson":
+        async for item in _iter_ndjson(request, report):
+            yield item
+        return
+
+    header = None
+    async for line_no, values in _iter_csv_rows(request, report):
+        if values is None:
+            if header is None:
+                raise HTTPException(status_code=400, detail=f"Line {line_no}: CSV header is not valid UTF-8")
+            report.received += 1
+            report.error(line_no, "Line is not valid UTF-8")
+            continue
+        if not values or (len(values) == 1 and not values[0].strip()):
+            continue
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        report.received += 1
+        if len(values) != len(header):
+            report.error(line_no, f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty CSV cells mean "not provided" so schema defaults apply
+        yield line_no, {k: v for k, v in zip(header, values) if v != ""}
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors()
+    )
+
+
+def _write_batch(
+    db: Session,
+    spec: BulkSpec,
+    batch: List[Tuple[int, dict]],
+    seen: set,
+    report: _Report,
+    mark_in_shop: bool,
+):
+    """
+    Validate, deduplicate and insert one batch in a single transaction. If the
+    database still rejects it, the batch is retried row by row.
+    """
+    valid: List[Tuple[int, BaseModel]] = []
+    for line_no, record in batch:
+        try:
+            valid.append((line_no, spec.schema.model_validate(record)))
+        except ValidationError as exc:
+            report.error(line_no, _validation_message(exc))
+
+    if spec.unique_field:
+        column = getattr(spec.model, spec.unique_field)
+        keys = {getattr(item, spec.unique_field) for _, item in valid}
+        existing = {row[0] for row in db.query(column).filter(column.in_(keys))} if keys else set()
+        kept = []
+        for line_no, item in valid:
+            key = getattr(item, spec.unique_field)
+            if key in existing:
+                report.error(line_no, f"{spec.unique_field} '{key}' already exists")
+            elif key in seen:
+                report.error(line_no, f"Duplicate {spec.unique_field} '{key}' in upload")
+            else:
+                seen.add(key)
+                kept.append((line_no, item))
+        valid = kept
+
+    if spec.parent_field:
+        parent_ids = {getattr(item, spec.parent_field) for _, item in valid}
+        found = (
+            {row[0] for row in db.query(spec.parent_model.id).filter(spec.parent_model.id.in_(parent_ids))}
+            if parent_ids else set()
+        )
+        kept = []
+        for line_no, item in valid:
+            if getattr(item, spec.parent_field) in found:
+                kept.append((line_no, item))
+            else:
+                report.error(line_no, f"{spec.parent_model.__name__} '{getattr(item, spec.parent_field)}' not found")
+        valid = kept
+
+    if not valid:
+        return
+
+    try:
+        _insert_rows(db, spec, [item.model_dump() for _, item in valid], mark_in_shop)
+    except IntegrityError:
+        # A row raced in after the duplicate check (or broke another constraint):
+        # retry the batch row by row so only the offending lines fail
+        db.rollback()
+        for line_no, item in valid:
+            try:
+                _insert_rows(db, spec, [item.model_dump()], mark_in_shop)
+            except IntegrityError as exc:
+                db.rollback()
+                report.error(line_no, f"Rejected by the database: {exc.orig}")
+                continue
+            report.inserted += 1
+        return
+    report.inserted += len(valid)
+
+
+def _insert_rows(db: Session, spec: BulkSpec, rows: List[dict], mark_in_shop: bool):
+    db.execute(insert(spec.model), rows)
+
+    # Business Rule: maintenance → vehicle goes in_shop (same as POST /api/maintenance)
+    if spec.model is models.MaintenanceLog and mark_in_shop:
+        db.query(models.Vehicle).filter(
+            models.Vehicle.id.in_({r["vehicle_id"] for r in rows})
+        ).update({models.Vehicle.status: "in_shop", models.Vehicle.version: models.Vehicle.version + 1},
+                 synchronize_session=False)
+
+    db.commit()
+
+
+async def _ingest(request: Request, db: Session, resource: str, fmt: Optional[str], mark_in_shop: bool = True) -> dict:
+    spec = BULK_SPECS[resource]
+    fmt = _detect_format(request, fmt)
+    report = _Report()
+    seen: set = set()
+    started = time.perf_counter()
+
+    batch: List[Tuple[int, dict]] = []
+    async for line_no, record in _iter_records(request, fmt, report):
+        batch.append((line_no, record))
+        if len(batch) >= BULK_BATCH_SIZE:
+            await run_in_threadpool(_write_batch, db, spec, batch, seen, report, mark_in_shop)
+            batch = []
+    if batch:
+        await run_in_threadpool(_write_batch, db, spec, batch, seen, report, mark_in_shop)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "resource": resource,
+        "format": fmt,
+        "received": report.received,
+        "inserted": report.inserted,
+        "failed": report.failed,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "rows_per_sec": round(report.received / elapsed) if elapsed > 0 else None,
+    }
+
+    if report.inserted:
+        await manager.broadcast("bulkImported", summary)
+        await manager.broadcast("dashboardUpdate", await run_in_threadpool(build_stats, db))
+
+    return {
+        **summary,
+        "errors": sorted(report.errors, key=lambda e: e["line"]),
+        "errors_truncated": report.failed > len(report.errors),
+    }
+
+
+@router.post("/vehicles")
+async def bulk_vehicles(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager")),
+):
+    """Bulk-create vehicles. Plates already in the fleet or repeated in the upload are rejected per row."""
+    return await _ingest(request, db, "vehicles", fmt)
+
+
+@router.post("/drivers")
+async def bulk_drivers(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Safety Officer")),
+):
+    """Bulk-create drivers. Duplicate license numbers are rejected per row."""
+    return await _ingest(request, db, "drivers", fmt)
+
+
+@router.post("/fuel")
+async def bulk_fuel_logs(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
+):
+    """Bulk-create fuel logs. Rows referencing unknown trips are rejected."""
+    return await _ingest(request, db, "fuel", fmt)
+
+
+@router.post("/maintenance")
+async def bulk_maintenance(
+    request: Request,
+    fmt: Optional[str] = Query(None, alias="format"),
+    mark_in_shop: bool = Query(True, description="Set referenced vehicles to in_shop; disable for history imports"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager")),
+):
+    """Bulk-create maintenance logs. Referenced vehicles go in_shop unless mark_in_shop=false."""
+    return await _ingest(request, db, "maintenance", fmt, mark_in_shop)
@@ -0,0 +1,79 @@
+import asyncio
+import datetime
+import time
+from typing import Callable, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from database import SessionLocal
+import models
+import schemas
+from auth import require_roles
+from fast_json import FastJSONResponse, RowSerializer
+from policies import visible_query
+from routers.reports_router import build_alerts
+from routers.trips_router import list_trips
+from routers.vehicles_router import build_stats
+
+router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
+
+# Same read permissions as the standalone endpoint of each section
+DASHBOARD_ROLES = {
+    "stats": {"Fleet Manager", "Dispatcher", "Safety Officer", "Financial Analyst"},
+    "vehicles": {"Fleet Manager", "Dispatcher"},
+    "drivers": {"Fleet Manager", "Dispatcher", "Safety Officer"},
+    "trips": {"Fleet Manager", "Dispatcher"},
+    "alerts": {"Fleet Manager", "Safety Officer", "Dispatcher"},
+}
+
+_vehicle_serializer = RowSerializer(schemas.VehicleResponse)
+_driver_serializer = RowSerializer(schemas.DriverResponse)
+_trip_serializer = RowSerializer(schemas.TripResponse)
+
+# section -> (db, user) -> JSON-ready value; rows are converted before the session closes
+SECTION_LOADERS: Dict[str, Callable] = {
+    "stats": lambda db, user: build_stats(db),
+    "vehicles": lambda db, user: _vehicle_serializer.dicts(
+        visible_query(db, models.Vehicle, user).order_by(models.Vehicle.created_at, models.Vehicle.id).all()
+    ),
+    "drivers": lambda db, user: _driver_serializer.dicts(db.query(models.Driver).all()),
+    "trips": lambda db, user: _trip_serializer.dicts(list_trips(db)),
+    "alerts": lambda db, user: build_alerts(db),
+}
+
+
+def _load_section(name: str, user) -> tuple:
+    """Run one section on its own session (sessions are not shared across threads)."""
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        value = SECTION_LOADERS[name](db, user)
+    finally:
+        db.close()
+    return value, round((time.perf_counter() - started) * 1000, 2)
+
+
+@router.get("", response_model=schemas.DashboardSnapshot)
+async def get_dashboard(
+    sections: Optional[str] = Query(None, description="Comma-separated: stats,vehicles,drivers,trips,alerts"),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher", "Safety Officer", "Financial Analyst")),
+):
+    """
+    Everything the dashboard opens with, in one authenticated round-trip.
+    Sections the caller's role may not read are left out; they load concurrently.
+    """
+    requested = [s.strip() for s in sections.split(",") if s.strip()] if sections else list(SECTION_LOADERS)
+    unknown = [s for s in requested if s not in SECTION_LOADERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {unknown}. Choose from: {list(SECTION_LOADERS)}")
+
+    names = [s for s in dict.fromkeys(requested) if current_user.role in DASHBOARD_ROLES[s]]
+    if not names:
+        raise HTTPException(status_code=403, detail="Access denied for the requested sections")
+
+    results = await asyncio.gather(*(run_in_threadpool(_load_section, name, current_user) for name in names))
+
+    payload = {"generated_at": datetime.datetime.utcnow(), "timings_ms": {}}
+    for name, (value, elapsed_ms) in zip(names, results):
+        payload[name] = value
+        payload["timings_ms"][name] = elapsed_ms
+    return FastJSONResponse(payload)
@@ -0,0 +1,204 @@
+import datetime
+import time
+from dataclasses import asdict
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from database import get_db
+import models
+import schemas
+from auth import require_roles
+from consolidation import Shipment, plan_consolidation
+from dispatch import FreeDriver, FreeVehicle, PendingTrip, plan_assignments
+from policies import apply_row_policy
+from routers.trips_router import apply_trip_status, build_stats, commit_with_retries
+from websocket_manager import manager
+
+router = APIRouter(prefix="/api/dispatch", tags=["Dispatch"])
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+@router.post("/auto-assign", response_model=schemas.AutoAssignResponse)
+async def auto_assign(
+    body: schemas.AutoAssignRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
+):
+    """
+    Propose a vehicle and driver for every draft trip (or the given
+    `trip_ids`): capacity-respecting, least spare capacity, safest drivers
+    first (see dispatch.py). With `apply: true` the drafts are rewritten to
+    the proposal; drafts do not reserve, so nothing is dispatched until each
+    trip is sent.
+    """
+    requested = set(body.trip_ids or [])
+
+    def attempt():
+        timings = {}
+        started = time.perf_counter()
+        trips_q = db.query(models.Trip.id, models.Trip.cargo_weight).filter(models.Trip.status == "draft")
+        if body.trip_ids is not None:
+            trips_q = trips_q.filter(models.Trip.id.in_(requested))
+        trips = [PendingTrip(*row) for row in trips_q]
+        vehicles_q = db.query(models.Vehicle.id, models.Vehicle.max_weight).filter(models.Vehicle.status == "available")
+        vehicles = [FreeVehicle(*row) for row in apply_row_policy(vehicles_q, models.Vehicle, current_user)]
+        drivers = [
+            FreeDriver(driver_id, safety_score or 0)
+            for driver_id, safety_score in db.query(models.Driver.id, models.Driver.safety_score).filter(
+                models.Driver.duty_status == "on",
+                models.Driver.license_expiry_date >= datetime.date.today(),
+            )
+        ]
+        timings["load"] = _elapsed_ms(started)
+
+        started = time.perf_counter()
+        plan = plan_assignments(trips, vehicles, drivers)
+        for trip_id in requested - {t.id for t in trips}:
+            plan.unassigned[trip_id] = "Trip not found or not a draft"
+        timings["solve"] = _elapsed_ms(started)
+
+        changed = []
+        if body.apply and plan.assignments:
+            started = time.perf_counter()
+            proposal = {a.trip_id: a for a in plan.assignments}
+            for trip in db.query(models.Trip).filter(
+                models.Trip.id.in_(proposal), models.Trip.status == "draft",
+            ):
+                a = proposal[trip.id]
+                if (trip.vehicle_id, trip.driver_id) != (a.vehicle_id, a.driver_id):
+                    trip.vehicle_id, trip.driver_id = a.vehicle_id, a.driver_id
+                    changed.append({"trip_id": trip.id, "vehicle_id": a.vehicle_id, "driver_id": a.driver_id})
+            timings["apply"] = _elapsed_ms(started)
+        return plan, changed, timings
+
+    if body.apply:
+        plan, changed, timings = await commit_with_retries(db, attempt)
+    else:
+        plan, changed, timings = attempt()
+        db.rollback()
+    if changed:
+        await manager.broadcast("tripsAutoAssigned", {"updates": changed})
+
+    return {
+        "applied": body.apply,
+        "assignments": [{**asdict(a), "spare_capacity": a.spare_capacity} for a in plan.assignments],
+        "unassigned": [{"trip_id": trip_id, "detail": detail} for trip_id, detail in plan.unassigned.items()],
+        "spare_capacity": plan.spare_capacity,
+        "timings_ms": timings,
+    }
+
+
+@router.post("/consolidate", response_model=schemas.ConsolidationResponse)
+async def consolidate(
+    body: schemas.ConsolidateRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
+):
+    """
+    Pack draft trips (all, or `trip_ids`) going to the same destination into
+    as few available vehicles as possible (see consolidation.py). Previews by
+    default; pass the preview's `plan_id` with `apply: true` to commit exactly
+    that plan. Committing replaces each multi-trip load by one draft trip
+    carrying the summed cargo, driven by the safest eligible driver of its
+    drafts; the merged drafts are canceled with `consolidated_into` set.
+    Single-trip loads just move to their right-sized vehicle.
+    """
+    requested = set(body.trip_ids or [])
+
+    def attempt():
+        timings = {}
+        started = time.perf_counter()
+        trips_q = db.query(
+            models.Trip.id, models.Trip.destination, models.Trip.cargo_weight, models.Trip.driver_id,
+        ).filter(models.Trip.status == "draft").order_by(models.Trip.created_at, models.Trip.id)
+        if body.trip_ids is not None:
+            trips_q = trips_q.filter(models.Trip.id.in_(requested))
+        rows = trips_q.all()
+        driver_of = {trip_id: driver_id for trip_id, _, _, driver_id in rows}
+        vehicles_q = db.query(models.Vehicle.id, models.Vehicle.max_weight).filter(models.Vehicle.status == "available")
+        vehicles = [FreeVehicle(*row) for row in apply_row_policy(vehicles_q, models.Vehicle, current_user)]
+        eligible = dict(db.query(models.Driver.id, models.Driver.safety_score).filter(
+            models.Driver.id.in_(set(driver_of.values())),
+            models.Driver.duty_status == "on",
+            models.Driver.license_expiry_date >= datetime.date.today(),
+        ).all()) if driver_of else {}
+        timings["load"] = _elapsed_ms(started)
+
+        started = time.perf_counter()
+        # Only drafts whose driver could take them out now, so every load has a driver
+        plan = plan_consolidation([
+            Shipment(trip_id, destination, cargo_weight)
+            for trip_id, destination, cargo_weight, driver_id in rows if driver_id in eligible
+        ], vehicles)
+        for trip_id, driver_id in driver_of.items():
+            if driver_id not in eligible:
+                plan.unplaced[trip_id] = "Driver is not on duty or has an expired license"
+        for trip_id in requested - set(driver_of):
+            plan.unplaced[trip_id] = "Trip not found or not a draft"
+        loads = []
+        for load in plan.loads:
+            drivers = [driver_of[s.id] for s in load.shipments]
+            loads.append({
+                "destination": load.destination,
+                "vehicle_id": load.vehicle.id,
+                "max_weight": load.vehicle.max_weight,
+                "cargo_weight": load.weight,
+                "spare_capacity": load.spare_capacity,
+                "trip_ids": [s.id for s in load.shipments],
+                "driver_id": max(drivers, key=lambda d: eligible[d] or 0),
+            })
+        timings["solve"] = _elapsed_ms(started)
+
+        if body.apply:
+            if body.plan_id and body.plan_id != plan.plan_id:
+                raise HTTPException(status_code=409, detail="Drafts or vehicles changed since the preview; preview again")
+            started = time.perf_counter()
+            trips = {t.id: t for t in db.query(models.Trip).filter(
+                models.Trip.id.in_(driver_of), models.Trip.status == "draft",
+            )}
+            if any(trip_id not in trips for load in loads for trip_id in load["trip_ids"]):
+                raise HTTPException(status_code=409, detail="Drafts changed while consolidating; preview again")
+            for load in loads:
+                if len(load["trip_ids"]) == 1:
+                    trips[load["trip_ids"][0]].vehicle_id = load["vehicle_id"]
+                    continue
+                load["trip_id"] = models.generate_uuid()
+                db.add(models.Trip(
+                    id=load["trip_id"], vehicle_id=load["vehicle_id"], driver_id=load["driver_id"],
+                    destination=load["destination"], cargo_weight=load["cargo_weight"], status="draft",
+                ))
+            db.flush()  # consolidated trips exist before the drafts point at them
+            for load in loads:
+                for trip_id in load["trip_ids"] if load.get("trip_id") else ():
+                    apply_trip_status(trips[trip_id], "canceled")
+                    trips[trip_id].consolidated_into = load["trip_id"]
+            timings["apply"] = _elapsed_ms(started)
+        return plan, loads, timings
+
+    if body.apply:
+        plan, loads, timings = await commit_with_retries(db, attempt)
+        merged = [{"trip_id": l["trip_id"], "trip_ids": l["trip_ids"], "vehicle_id": l["vehicle_id"]} for l in loads if l.get("trip_id")]
+        if merged:
+            await manager.broadcast("tripsConsolidated", {"loads": merged})
+            await manager.broadcast("dashboardUpdate", build_stats(db))
+    else:
+        plan, loads, timings = attempt()
+        db.rollback()
+
+    return {
+        "plan_id": plan.plan_id,
+        "applied": body.apply,
+        "vehicles_before": sum(len(l["trip_ids"]) for l in loads),
+        "vehicles_after": len(loads),
+        "lower_bound": plan.lower_bound,
+        "loads": loads,
+        "groups": [
+            {"destination": g.destination, "trips": g.shipments, "cargo_weight": g.weight,
+             "vehicles": g.vehicles, "lower_bound": g.lower_bound}
+            for g in plan.groups
+        ],
+        "unplaced": [{"trip_id": trip_id, "detail": detail} for trip_id, detail in plan.unplaced.items()],
+        "timings_ms": timings,
+    }
@@ -5,16 +5,20 @@ from database import get_db
 import models
 import schemas
 from auth import require_roles
+from fast_json import RowSerializer
 
 router = APIRouter(prefix="/api/fuel", tags=["Fuel Logs"])
 
+fuel_log_list_serializer = RowSerializer(schemas.FuelLogResponse)
+
 
 @router.get("", response_model=List[schemas.FuelLogResponse])
 def get_fuel_logs(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(require_roles("Fleet Manager", "Financial Analyst")),
 ):
-    return db.query(models.FuelLog).order_by(models.FuelLog.created_at.desc()).all()
+    logs = db.query(models.FuelLog).order_by(models.FuelLog.created_at.desc()).all()
+    return fuel_log_list_serializer.response(logs)
 
 
 @router.post("", response_model=schemas.FuelLogResponse, status_code=201)
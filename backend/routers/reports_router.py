@@ -1,24 +1,70 @@
 import io
 import csv
 import datetime
-from typing import List
+from typing import Callable, Iterable, List
 from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract
-from database import get_db
+from database import SessionLocal
 import models
 import schemas
 from auth import require_roles
+from data_versions import versions
+from fast_json import dumps
+from metrics import REPORT_DURATION, timed
+from report_cache import REPORT_CACHE_ENABLED, report_cache
+from single_flight import reports_flight
 
 router = APIRouter(prefix="/api/reports", tags=["Reports"])
 
+# Tables each export reads; a write to any of them gives its results a new key
+REPORT_TABLES = {
+    "fuel": ("fuel_logs", "trips", "vehicles"),
+    "expenses": ("maintenance_logs", "vehicles"),
+    "profitability": ("vehicles", "maintenance_logs", "trips", "fuel_logs"),
+}
+MONTHLY_EXPENSES_TABLES = ("maintenance_logs", "fuel_logs")
+ALERTS_TABLES = ("drivers", "vehicles")
 
-@router.get("/fuel-efficiency", response_model=List[schemas.FuelEfficiencyReport])
-def get_fuel_efficiency(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_roles("Fleet Manager", "Financial Analyst")),
-):
+
+def _compute_and_cache(key: tuple, compute: Callable, params: dict) -> bytes:
+    body = compute(**params)
+    if REPORT_CACHE_ENABLED:
+        report_cache.put(key, body)
+    return body
+
+
+async def _shared(name: str, tables: Iterable[str], compute: Callable, **params) -> bytes:
+    """
+    Result of `compute(**params)` from the report cache, or computed once for all
+    identical concurrent requests. Reports are not user-scoped, so callers with
+    different roles share results.
+    """
+    key = (name, tuple(sorted(params.items())), versions.get(tables), datetime.date.today())
+    if REPORT_CACHE_ENABLED:
+        if report_cache.directory:
+            body = await run_in_threadpool(report_cache.get, name, key)
+        else:
+            body = report_cache.get(name, key)
+        if body is not None:
+            return body
+    return await reports_flight.do(key, _compute_and_cache, key, compute, params)
+
+
+def _json(body: bytes) -> Response:
+    return Response(body, media_type="application/json")
+
+
+def _trip_distance(trip: models.Trip) -> float:
+    """Telemetry distance of a completed trip, else the cargo * 0.01 km per kg estimate."""
+    if trip.distance_km is not None:
+        return trip.distance_km
+    return trip.cargo_weight * 0.01 if trip.cargo_weight else 0
+
+
+def build_fuel_efficiency(db: Session) -> list:
     """Fuel efficiency report: km/l and cost/km per trip."""
     fuel_logs = db.query(models.FuelLog).all()
     report = []
@@ -28,29 +74,38 @@ def get_fuel_efficiency(
         if not trip or not trip.vehicle:
             continue
 
-        # Estimate distance from mileage delta (simplified: cargo * 0.01 km per kg heuristic)
-        distance_est = trip.cargo_weight * 0.01 if trip.cargo_weight else 0
+        distance_est = _trip_distance(trip)
         efficiency = round(distance_est / log.fuel_used, 2) if log.fuel_used > 0 else None
         cost_per_km = round(log.fuel_cost / distance_est, 2) if distance_est > 0 else None
 
-        report.append(schemas.FuelEfficiencyReport(
-            trip_id=trip.id,
-            vehicle_plate=trip.vehicle.plate_number,
-            destination=trip.destination,
-            fuel_used=log.fuel_used,
-            fuel_cost=log.fuel_cost,
-            efficiency_km_per_l=efficiency,
-            cost_per_km=cost_per_km,
-        ))
+        report.append({
+            "trip_id": trip.id,
+            "vehicle_plate": trip.vehicle.plate_number,
+            "destination": trip.destination,
+            "fuel_used": log.fuel_used,
+            "fuel_cost": log.fuel_cost,
+            "efficiency_km_per_l": efficiency,
+            "cost_per_km": cost_per_km,
+        })
 
     return report
 
 
-@router.get("/monthly-expenses")
-def monthly_expenses(
-    db: Session = Depends(get_db),
+@timed(REPORT_DURATION, "fuel-efficiency")
+def compute_fuel_efficiency() -> bytes:
+    with SessionLocal() as db:
+        return dumps(build_fuel_efficiency(db))
+
+
+@router.get("/fuel-efficiency", response_model=List[schemas.FuelEfficiencyReport])
+async def get_fuel_efficiency(
     current_user: models.User = Depends(require_roles("Fleet Manager", "Financial Analyst")),
 ):
+    """Fuel efficiency report: km/l and cost/km per trip."""
+    return _json(await _shared("fuel-efficiency", REPORT_TABLES["fuel"], compute_fuel_efficiency))
+
+
+def build_monthly_expenses(db: Session) -> list:
     """Monthly expense summary: maintenance + fuel costs."""
     result = []
 
@@ -81,11 +136,21 @@ def monthly_expenses(
     return result
 
 
-@router.get("/vehicle-profitability")
-def vehicle_profitability(
-    db: Session = Depends(get_db),
+@timed(REPORT_DURATION, "monthly-expenses")
+def compute_monthly_expenses() -> bytes:
+    with SessionLocal() as db:
+        return dumps(build_monthly_expenses(db))
+
+
+@router.get("/monthly-expenses")
+async def monthly_expenses(
     current_user: models.User = Depends(require_roles("Fleet Manager", "Financial Analyst")),
 ):
+    """Monthly expense summary: maintenance + fuel costs."""
+    return _json(await _shared("monthly-expenses", MONTHLY_EXPENSES_TABLES, compute_monthly_expenses))
+
+
+def build_vehicle_profitability(db: Session) -> list:
     """Cost per vehicle: maintenance + fuel costs aggregated."""
     vehicles = db.query(models.Vehicle).all()
     result = []
@@ -113,13 +178,21 @@ def vehicle_profitability(
     return result
 
 
-@router.get("/export/csv")
-def export_csv(
-    report: str = "fuel",
-    db: Session = Depends(get_db),
+@timed(REPORT_DURATION, "vehicle-profitability")
+def compute_vehicle_profitability() -> bytes:
+    with SessionLocal() as db:
+        return dumps(build_vehicle_profitability(db))
+
+
+@router.get("/vehicle-profitability")
+async def vehicle_profitability(
     current_user: models.User = Depends(require_roles("Fleet Manager", "Financial Analyst")),
 ):
-    """Export any report as CSV. ?report=fuel|expenses|profitability"""
+    """Cost per vehicle: maintenance + fuel costs aggregated."""
+    return _json(await _shared("vehicle-profitability", REPORT_TABLES["profitability"], compute_vehicle_profitability))
+
+
+def build_export_csv(db: Session, report: str) -> bytes:
     output = io.StringIO()
     writer = csv.writer(output)
 
@@ -130,7 +203,7 @@ def export_csv(
             trip = log.trip
             if not trip:
                 continue
-            dist = trip.cargo_weight * 0.01 if trip.cargo_weight else 0
+            dist = _trip_distance(trip)
             eff = round(dist / log.fuel_used, 2) if log.fuel_used > 0 else "N/A"
             cpk = round(log.fuel_cost / dist, 2) if dist > 0 else "N/A"
             writer.writerow([trip.id, trip.vehicle.plate_number if trip.vehicle else "-", trip.destination, log.fuel_used, log.fuel_cost, eff, cpk])
@@ -151,22 +224,31 @@ def export_csv(
             cpk = round(tc / v.mileage, 2) if v.mileage > 0 else "N/A"
             writer.writerow([v.id, v.plate_number, v.vehicle_type, v.mileage, round(mc, 2), round(fc, 2), round(tc, 2), cpk])
 
-    output.seek(0)
+    return output.getvalue().encode("utf-8")
+
+
+@timed(REPORT_DURATION, "export-csv", param="report")
+def compute_export_csv(report: str) -> bytes:
+    with SessionLocal() as db:
+        return build_export_csv(db, report)
+
+
+@router.get("/export/csv")
+async def export_csv(
+    report: str = "fuel",
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Financial Analyst")),
+):
+    """Export any report as CSV. ?report=fuel|expenses|profitability"""
+    body = await _shared("export-csv", REPORT_TABLES.get(report, ()), compute_export_csv, report=report)
     filename = f"fleetflow_{report}_{datetime.date.today()}.csv"
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode("utf-8")),
+    return Response(
+        body,
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
 
-@router.get("/export/pdf")
-def export_pdf(
-    report: str = "fuel",
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_roles("Fleet Manager", "Financial Analyst")),
-):
-    """Export any report as PDF."""
+def build_export_pdf(db: Session, report: str) -> bytes:
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import A4, landscape
     from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -188,7 +270,7 @@ def export_pdf(
             trip = log.trip
             if not trip:
                 continue
-            dist = trip.cargo_weight * 0.01 if trip.cargo_weight else 0
+            dist = _trip_distance(trip)
             eff = f"{round(dist / log.fuel_used, 2)} km/L" if log.fuel_used > 0 else "N/A"
             data.append([
                 trip.id[:8] + "...",
@@ -236,22 +318,32 @@ def export_pdf(
     elements.append(table)
 
     doc.build(elements)
-    buffer.seek(0)
+    return buffer.getvalue()
+
+
+@timed(REPORT_DURATION, "export-pdf", param="report")
+def compute_export_pdf(report: str) -> bytes:
+    with SessionLocal() as db:
+        return build_export_pdf(db, report)
+
 
+@router.get("/export/pdf")
+async def export_pdf(
+    report: str = "fuel",
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Financial Analyst")),
+):
+    """Export any report as PDF."""
+    body = await _shared("export-pdf", REPORT_TABLES.get(report, ()), compute_export_pdf, report=report)
     filename = f"fleetflow_{report}_{datetime.date.today()}.pdf"
-    return StreamingResponse(
-        buffer,
+    return Response(
+        body,
         media_type="application/pdf",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
 
-@router.get("/alerts")
-def get_alerts(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_roles("Fleet Manager", "Safety Officer", "Dispatcher")),
-):
-    """Return current active alerts: expired licenses, overweight risks, vehicles in shop."""
+def build_alerts(db: Session) -> list:
+    """Current active alerts: expired licenses, overweight risks, vehicles in shop."""
     alerts = []
     today = datetime.date.today()
     warning_threshold = today + datetime.timedelta(days=30)
@@ -283,3 +375,16 @@ def get_alerts(
         })
 
     return alerts
+
+
+def compute_alerts() -> bytes:
+    with SessionLocal() as db:
+        return dumps(build_alerts(db))
+
+
+@router.get("/alerts")
+async def get_alerts(
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Safety Officer", "Dispatcher")),
+):
+    """Return current active alerts: expired licenses, overweight risks, vehicles in shop."""
+    return _json(await _shared("alerts", ALERTS_TABLES, compute_alerts))
@@ -0,0 +1,71 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+from database import get_db
+import models
+from auth import require_roles
+from policies import row_predicates
+from search import SEARCH_TARGETS, search
+
+router = APIRouter(prefix="/api/search", tags=["Search"])
+
+# Same read permissions as the list endpoints of each resource
+SEARCH_ROLES = {
+    "trips": {"Fleet Manager", "Dispatcher"},
+    "maintenance": {"Fleet Manager", "Safety Officer"},
+    "drivers": {"Fleet Manager", "Dispatcher", "Safety Officer"},
+    "vehicles": {"Fleet Manager", "Dispatcher"},
+}
+
+SEARCH_MODELS = {
+    "trips": models.Trip,
+    "maintenance": models.MaintenanceLog,
+    "drivers": models.Driver,
+    "vehicles": models.Vehicle,
+}
+
+
+def _policy_sql(db: Session, role: str, model) -> Optional[str]:
+    """Render the row policy for (role, model) as SQL for the raw search query."""
+    predicates = row_predicates(role, model)
+    if not predicates:
+        return None
+    return str(and_(*predicates).compile(
+        dialect=db.get_bind().dialect,
+        compile_kwargs={"literal_binds": True},
+    ))
+
+
+@router.get("")
+def search_all(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[str] = Query(None, description="Comma-separated: trips,maintenance,drivers,vehicles"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher", "Safety Officer", "Financial Analyst")),
+):
+    """Ranked full-text search over trip destinations, maintenance notes, driver names and plates."""
+    requested = [t.strip() for t in types.split(",") if t.strip()] if types else list(SEARCH_TARGETS)
+    unknown = [t for t in requested if t not in SEARCH_TARGETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {unknown}. Choose from: {list(SEARCH_TARGETS)}")
+
+    kinds = [t for t in requested if current_user.role in SEARCH_ROLES[t]]
+    if not kinds:
+        raise HTTPException(status_code=403, detail="Access denied for the requested search types")
+
+    extra_where = {}
+    for kind in kinds:
+        where = _policy_sql(db, current_user.role, SEARCH_MODELS[kind])
+        if where:
+            extra_where[kind] = where
+
+    return {
+        "query": q,
+        "types": kinds,
+        "offset": offset,
+        "limit": limit,
+        "results": search(db, q, kinds, limit=limit, offset=offset, extra_where=extra_where),
+    }
@@ -0,0 +1,123 @@
+"""
+Telemetry ingestion: batches over HTTP, or a stream of batches over a
+WebSocket. Both only validate and buffer; see telemetry.py for the flusher
+and the backpressure rules.
+"""
+import datetime
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+import models
+import schemas
+from auth import require_roles, resolve_principal
+from telemetry import TELEMETRY_PINGS, TELEMETRY_RETRY_AFTER, known_vehicle_ids, telemetry_buffer
+
+router = APIRouter(prefix="/api/telemetry", tags=["Telemetry"])
+stream_router = APIRouter(tags=["Telemetry"])
+
+INGEST_ROLES = ("Fleet Manager", "Dispatcher")
+
+# validate_json parses and validates in one pass, without building a dict first
+_BATCH = TypeAdapter(schemas.TelemetryBatch)
+
+
+def _naive_utc(value: datetime.datetime) -> datetime.datetime:
+    # Trip start/end times are naive UTC; keep pings comparable with them. Done here
+    # rather than in a schema validator, which costs more than the whole ping's parse
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def _rows(pings: List[schemas.TelemetryPingIn]) -> Tuple[List[dict], int]:
+    """Insertable rows for pings of known vehicles, and how many were rejected."""
+    known = await known_vehicle_ids(p.vehicle_id for p in pings)
+    received_at = datetime.datetime.utcnow()
+    rows = [
+        {
+            "vehicle_id": p.vehicle_id,
+            "recorded_at": _naive_utc(p.recorded_at) if p.recorded_at else received_at,
+            "odometer_km": p.odometer_km,
+            "lat": p.lat,
+            "lon": p.lon,
+            "fuel_level_pct": p.fuel_level_pct,
+        }
+        for p in pings if p.vehicle_id in known
+    ]
+    rejected = len(pings) - len(rows)
+    if rejected:
+        TELEMETRY_PINGS.labels("rejected").inc(rejected)
+    return rows, rejected
+
+
+def _detail(rejected: int) -> Optional[str]:
+    return f"{rejected} pings for unknown vehicles were dropped" if rejected else None
+
+
+@router.post("", response_model=schemas.TelemetryAccepted, status_code=202)
+async def ingest_telemetry(
+    request: Request,
+    current_user: models.User = Depends(require_roles(*INGEST_ROLES)),
+):
+    """
+    Buffer a batch of pings `{"pings": [...]}`; they are written within
+    TELEMETRY_FLUSH_INTERVAL_MS. A batch is taken whole or not at all: when
+    the buffer is full the answer is 503 with Retry-After and nothing of the
+    batch was kept.
+    """
+    try:
+        batch = _BATCH.validate_json(await request.body())
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors(include_url=False))
+    if len(batch.pings) > telemetry_buffer.max_pings:
+        raise HTTPException(status_code=413, detail=f"At most {telemetry_buffer.max_pings} pings per batch")
+
+    rows, rejected = await _rows(batch.pings)
+    if not telemetry_buffer.offer(rows):
+        raise HTTPException(
+            status_code=503,
+            detail="Telemetry buffer is full; retry later",
+            headers={"Retry-After": TELEMETRY_RETRY_AFTER},
+        )
+    return {"accepted": len(rows), "rejected": rejected, "detail": _detail(rejected)}
+
+
+@stream_router.websocket("/ws/telemetry")
+async def telemetry_stream(websocket: WebSocket, token: str = Query(...)):
+    """
+    Stream of batches: each frame, text or binary (UTF-8 JSON), is
+    `{"pings": [...]}` and is answered with `{"accepted", "rejected"}` once
+    buffered. While the buffer is full the next frame is not read, so a fast
+    sender is slowed down by TCP instead of being refused.
+    """
+    try:
+        principal = await run_in_threadpool(resolve_principal, token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    if principal.role not in INGEST_ROLES:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            frame = message.get("text") or message.get("bytes") or ""
+            try:
+                batch = _BATCH.validate_json(frame)
+            except ValidationError as exc:
+                await websocket.send_json({"error": exc.errors(include_url=False, include_context=False, include_input=False)})
+                continue
+            if len(batch.pings) > telemetry_buffer.max_pings:
+                await websocket.send_json({"error": f"At most {telemetry_buffer.max_pings} pings per batch"})
+                continue
+            rows, rejected = await _rows(batch.pings)
+            await telemetry_buffer.put(rows)
+            await websocket.send_json({"accepted": len(rows), "rejected": rejected, "detail": _detail(rejected)})
+    except WebSocketDisconnect:
+        pass
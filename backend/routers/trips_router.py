@@ -1,15 +1,31 @@
+import asyncio
 import datetime
-from typing import List
+import os
+import random
+from typing import Callable, Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, object_session
+from sqlalchemy.orm.exc import StaleDataError
 from database import get_db
+import metrics
 import models
 import schemas
 from auth import require_roles
 from websocket_manager import manager
+from fast_json import RowSerializer
+from telemetry import trip_distances_km
 
 router = APIRouter(prefix="/api/trips", tags=["Trips"])
 
+TRIP_STATUSES = ["draft", "sent", "done", "canceled"]
+MAX_BATCH_SIZE = 1000
+RESERVATION_RETRIES = int(os.getenv("RESERVATION_RETRIES", "5"))
+
+RESERVATION_CONFLICTS = metrics.registry.counter(
+    "fleetflow_reservation_conflicts", "Trip status commits that lost a version race, by outcome.", ("outcome",))
+
+trip_list_serializer = RowSerializer(schemas.TripResponse)
+
 
 def build_stats(db: Session) -> dict:
     return {
@@ -32,13 +48,22 @@ def build_stats(db: Session) -> dict:
     }
 
 
+def list_trips(db: Session) -> List[models.Trip]:
+    """All trips, newest first, with vehicle and driver loaded in the same query."""
+    return (
+        db.query(models.Trip)
+        .options(joinedload(models.Trip.vehicle), joinedload(models.Trip.driver))
+        .order_by(models.Trip.created_at.desc())
+        .all()
+    )
+
+
 @router.get("", response_model=List[schemas.TripResponse])
 def get_trips(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
 ):
-    trips = db.query(models.Trip).order_by(models.Trip.created_at.desc()).all()
-    return trips
+    return trip_list_serializer.response(list_trips(db))
 
 
 @router.post("", response_model=schemas.TripResponse, status_code=201)
@@ -111,26 +136,44 @@ async def create_trip(
     return trip
 
 
-@router.patch("/{trip_id}/status", response_model=schemas.TripResponse)
-async def update_trip_status(
-    trip_id: str,
-    body: schemas.TripStatusUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
-):
-    """Update trip status. Drives vehicle/driver availability automatically."""
-    trip = db.query(models.Trip).filter(models.Trip.id == trip_id).first()
-    if not trip:
-        raise HTTPException(status_code=404, detail="Trip not found")
+async def commit_with_retries(db: Session, attempt: Callable):
+    """
+    Optimistic concurrency for vehicle/driver/trip changes: `attempt()` reads
+    and mutates rows, then the commit's UPDATEs only match the versions that
+    were read (`WHERE id = ? AND version = ?`). If another request committed
+    first, everything is rolled back and `attempt()` runs again on fresh
+    rows, re-checking availability, up to RESERVATION_RETRIES times.
+    No row locks are held between the read and the commit.
+    """
+    for retry in range(RESERVATION_RETRIES):
+        try:
+            result = attempt()
+            db.commit()
+            return result
+        except StaleDataError:
+            db.rollback()
+            RESERVATION_CONFLICTS.labels("retried").inc()
+            await asyncio.sleep(random.uniform(0, 0.005 * 2 ** retry))
+        except Exception:
+            # Hand the connection back now, not at request teardown: this runs on
+            # the event loop, and a pool emptied by parked requests would block it
+            db.rollback()
+            raise
+    RESERVATION_CONFLICTS.labels("exhausted").inc()
+    raise HTTPException(status_code=409, detail="Trip, vehicle or driver changed concurrently; retry")
 
-    new_status = body.status.lower()
-    allowed = ["draft", "sent", "done", "canceled"]
-    if new_status not in allowed:
-        raise HTTPException(status_code=400, detail=f"Status must be one of: {allowed}")
+
+def apply_trip_status(trip: models.Trip, new_status: str, now: datetime.datetime = None,
+                      distances: Dict[str, Optional[float]] = None):
+    """
+    Move a trip to `new_status`, driving vehicle/driver availability and mileage.
+    `distances` (trip_distances_km for the batch) saves a telemetry lookup per completed trip.
+    """
+    now = now or datetime.datetime.utcnow()
 
     if new_status == "sent":
         # Trip starts: vehicle and driver become on_trip
-        trip.start_time = datetime.datetime.utcnow()
+        trip.start_time = now
         if trip.vehicle:
             trip.vehicle.status = "on_trip"
         if trip.driver:
@@ -138,24 +181,137 @@ async def update_trip_status(
 
     elif new_status == "done":
         # Trip ends: vehicle + driver back to available, mileage auto-updated
-        trip.end_time = datetime.datetime.utcnow()
+        trip.end_time = now
         if trip.vehicle:
-            # auto update mileage based on cargo/time (simple estimate)
-            mileage_estimate = trip.cargo_weight * 0.01  # simplified: 0.01km per kg
-            trip.vehicle.mileage = (trip.vehicle.mileage or 0) + mileage_estimate
-            trip.vehicle.status = "available"
-        if trip.driver:
+            db = object_session(trip)
+            if distances is None and db is not None:
+                with db.no_autoflush:
+                    distances = trip_distances_km(db, [trip.id], now)
+            trip.distance_km = (distances or {}).get(trip.id)
+            # Without telemetry for the trip, fall back to the estimate: 0.01km per kg
+            distance = trip.distance_km if trip.distance_km is not None else trip.cargo_weight * 0.01
+            trip.vehicle.mileage = (trip.vehicle.mileage or 0) + distance
+            # Only release what the trip reserved (not a vehicle sent to the shop meanwhile)
+            if trip.vehicle.status == "on_trip":
+                trip.vehicle.status = "available"
+        if trip.driver and trip.driver.duty_status == "on_trip":
             trip.driver.duty_status = "on"
 
-    elif new_status == "canceled":
-        # Cancel: release vehicle and driver if they were reserved
+    elif new_status == "canceled" and trip.status == "sent":
+        # Cancel: release vehicle and driver if they were reserved (drafts reserve nothing)
         if trip.vehicle and trip.vehicle.status == "on_trip":
             trip.vehicle.status = "available"
         if trip.driver and trip.driver.duty_status == "on_trip":
             trip.driver.duty_status = "on"
 
     trip.status = new_status
-    db.commit()
+
+
+def dispatch_blocker(trip: models.Trip):
+    """Reason a draft cannot be sent right now, or None. Used by single and batch dispatch."""
+    if not trip.vehicle or trip.vehicle.status != "available":
+        return f"Vehicle is not available. Current status: {trip.vehicle.status if trip.vehicle else 'missing'}"
+    if not trip.driver or trip.driver.duty_status != "on":
+        return f"Driver is not on duty. Status: {trip.driver.duty_status if trip.driver else 'missing'}"
+    if trip.driver.license_expiry_date < datetime.date.today():
+        return f"Driver {trip.driver.name}'s license has expired on {trip.driver.license_expiry_date}"
+    if trip.cargo_weight > trip.vehicle.max_weight:
+        return f"Cargo weight ({trip.cargo_weight}kg) exceeds vehicle max capacity ({trip.vehicle.max_weight}kg)"
+    return None
+
+
+@router.post("/status:batch", response_model=List[schemas.TripStatusBatchResult])
+async def update_trip_status_batch(
+    body: schemas.TripStatusBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
+):
+    """
+    Apply status changes to many trips in one transaction.
+    Trips, vehicles and drivers are loaded with one query; drafts being sent must
+    have an available vehicle and on-duty driver, so a vehicle or driver claimed
+    earlier in the same batch is not double-booked. Each trip gets its own outcome.
+    """
+    if len(body.updates) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} updates per batch")
+
+    trip_ids = {u.trip_id for u in body.updates}
+    now = datetime.datetime.utcnow()
+
+    def attempt():
+        trips = {
+            t.id: t
+            for t in db.query(models.Trip)
+            .options(joinedload(models.Trip.vehicle), joinedload(models.Trip.driver))
+            .filter(models.Trip.id.in_(trip_ids))
+        } if trip_ids else {}
+        # Telemetry distances of every trip being completed, in one go
+        distances = trip_distances_km(db, {u.trip_id for u in body.updates if u.status.lower() == "done"}, now)
+
+        results = []
+        applied = []
+        for u in body.updates:
+            new_status = u.status.lower()
+            trip = trips.get(u.trip_id)
+            if not trip:
+                results.append(schemas.TripStatusBatchResult(trip_id=u.trip_id, ok=False, detail="Trip not found"))
+                continue
+            if new_status not in TRIP_STATUSES:
+                results.append(schemas.TripStatusBatchResult(
+                    trip_id=u.trip_id, ok=False, detail=f"Status must be one of: {TRIP_STATUSES}",
+                ))
+                continue
+            if new_status == "sent" and trip.status == "draft":
+                blocker = dispatch_blocker(trip)
+                if blocker:
+                    results.append(schemas.TripStatusBatchResult(trip_id=u.trip_id, ok=False, status=trip.status, detail=blocker))
+                    continue
+
+            apply_trip_status(trip, new_status, now, distances)
+            applied.append({"trip_id": trip.id, "status": new_status})
+            results.append(schemas.TripStatusBatchResult(trip_id=trip.id, ok=True, status=new_status))
+        return results, applied
+
+    results, applied = await commit_with_retries(db, attempt)
+    if applied:
+        await manager.broadcast("tripStatusBatchUpdated", {"updates": applied, "stats": build_stats(db)})
+
+    return results
+
+
+@router.patch("/{trip_id}/status", response_model=schemas.TripResponse)
+async def update_trip_status(
+    trip_id: str,
+    body: schemas.TripStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
+):
+    """
+    Update trip status. Drives vehicle/driver availability automatically.
+    Sending a draft reserves its vehicle and driver; if either is no longer
+    free (e.g. another dispatcher just sent a trip with it) the answer is 409.
+    """
+    new_status = body.status.lower()
+
+    def attempt():
+        trip = (
+            db.query(models.Trip)
+            .options(joinedload(models.Trip.vehicle), joinedload(models.Trip.driver))
+            .filter(models.Trip.id == trip_id)
+            .first()
+        )
+        if not trip:
+            raise HTTPException(status_code=404, detail="Trip not found")
+        if new_status not in TRIP_STATUSES:
+            raise HTTPException(status_code=400, detail=f"Status must be one of: {TRIP_STATUSES}")
+        if new_status == "sent" and trip.status == "draft":
+            blocker = dispatch_blocker(trip)
+            if blocker:
+                raise HTTPException(status_code=409, detail=blocker)
+        apply_trip_status(trip, new_status)
+        return trip
+
+    trip = await commit_with_retries(db, attempt)
     db.refresh(trip)
 
     await manager.broadcast("tripStatusUpdated", {"trip_id": trip.id, "status": new_status})
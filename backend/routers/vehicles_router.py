@@ -1,11 +1,13 @@
 import datetime
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from database import get_db
 import models
 import schemas
 from auth import get_current_user, require_roles
+from availability_index import availability_index
+from policies import visible_query, paginate
 from websocket_manager import manager
 
 router = APIRouter(prefix="/api/vehicles", tags=["Vehicles"])
@@ -46,14 +48,35 @@ def vehicle_to_dict(v: models.Vehicle) -> dict:
 
 @router.get("", response_model=List[schemas.VehicleResponse])
 def get_vehicles(
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
 ):
-    """Get all vehicles. Dispatchers do NOT see in_shop vehicles."""
-    vehicles = db.query(models.Vehicle).all()
-    if current_user.role == "Dispatcher":
-        vehicles = [v for v in vehicles if v.status != "in_shop"]
-    return vehicles
+    """Get all vehicles. Dispatchers do NOT see in_shop vehicles (see policies.py)."""
+    query = visible_query(db, models.Vehicle, current_user).order_by(
+        models.Vehicle.created_at, models.Vehicle.id
+    )
+    return paginate(query, offset, limit).all()
+
+
+@router.get("/available", response_model=List[schemas.VehicleResponse])
+def get_available_vehicles(
+    min_capacity: float = Query(0, ge=0, description="Required max_weight in kg"),
+    vehicle_type: Optional[str] = Query(None),
+    limit: int = Query(10, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("Fleet Manager", "Dispatcher")),
+):
+    """
+    Available vehicles that can carry `min_capacity`, smallest first: the
+    first one is the best fit. Served from the in-memory availability index.
+    """
+    ids = availability_index.smallest_fits(db, min_capacity, vehicle_type, limit)
+    if not ids:
+        return []
+    vehicles = {v.id: v for v in db.query(models.Vehicle).filter(models.Vehicle.id.in_(ids))}
+    return [vehicles[vid] for vid in ids if vid in vehicles]
 
 
 @router.post("", response_model=schemas.VehicleResponse, status_code=201)
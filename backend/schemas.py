@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, List
 from datetime import date, datetime
 
@@ -122,6 +122,19 @@ class TripCreate(BaseModel):
 class TripStatusUpdate(BaseModel):
     status: str   # draft, sent, done, canceled
 
+class TripStatusBatchItem(BaseModel):
+    trip_id: str
+    status: str
+
+class TripStatusBatchRequest(BaseModel):
+    updates: List[TripStatusBatchItem]
+
+class TripStatusBatchResult(BaseModel):
+    trip_id: str
+    ok: bool
+    status: Optional[str] = None
+    detail: Optional[str] = None
+
 class TripVehicle(BaseModel):
     id: str
     plate_number: str
@@ -150,11 +163,96 @@ class TripResponse(BaseModel):
     created_at: datetime
     vehicle: Optional[TripVehicle]
     driver: Optional[TripDriver]
+    consolidated_into: Optional[str] = None
+    distance_km: Optional[float] = None
 
     class Config:
         from_attributes = True
 
 
+# =====================
+#  TELEMETRY SCHEMAS
+# =====================
+
+class TelemetryPingIn(BaseModel):
+    vehicle_id: str
+    recorded_at: Optional[datetime] = None   # default: time received; stored as naive UTC
+    odometer_km: Optional[float] = Field(None, ge=0)
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lon: Optional[float] = Field(None, ge=-180, le=180)
+    fuel_level_pct: Optional[float] = Field(None, ge=0, le=100)
+
+class TelemetryBatch(BaseModel):
+    pings: List[TelemetryPingIn]
+
+class TelemetryAccepted(BaseModel):
+    accepted: int
+    rejected: int                             # pings for unknown vehicles
+    detail: Optional[str] = None
+
+
+# =====================
+#  DISPATCH SCHEMAS
+# =====================
+
+class AutoAssignRequest(BaseModel):
+    trip_ids: Optional[List[str]] = None   # default: every draft trip
+    apply: bool = False                    # false: preview only
+
+class AutoAssignment(BaseModel):
+    trip_id: str
+    vehicle_id: str
+    driver_id: str
+    cargo_weight: float
+    max_weight: float
+    spare_capacity: float
+    safety_score: float
+
+class AutoAssignUnassigned(BaseModel):
+    trip_id: str
+    detail: str
+
+class AutoAssignResponse(BaseModel):
+    applied: bool
+    assignments: List[AutoAssignment]
+    unassigned: List[AutoAssignUnassigned]
+    spare_capacity: float
+    timings_ms: dict
+
+class ConsolidateRequest(BaseModel):
+    trip_ids: Optional[List[str]] = None   # default: every draft trip
+    apply: bool = False                    # false: preview only
+    plan_id: Optional[str] = None          # when applying: refuse unless the plan is still this preview
+
+class ConsolidatedLoad(BaseModel):
+    destination: str
+    vehicle_id: str
+    max_weight: float
+    cargo_weight: float
+    spare_capacity: float
+    trip_ids: List[str]
+    driver_id: Optional[str] = None        # safest eligible driver among the drafts
+    trip_id: Optional[str] = None          # consolidated trip created when applied
+
+class ConsolidationGroup(BaseModel):
+    destination: str
+    trips: int
+    cargo_weight: float
+    vehicles: int
+    lower_bound: int
+
+class ConsolidationResponse(BaseModel):
+    plan_id: str
+    applied: bool
+    vehicles_before: int
+    vehicles_after: int
+    lower_bound: int
+    loads: List[ConsolidatedLoad]
+    groups: List[ConsolidationGroup]
+    unplaced: List[AutoAssignUnassigned]
+    timings_ms: dict
+
+
 # =====================
 #  MAINTENANCE SCHEMAS
 # =====================
@@ -232,3 +330,18 @@ class AlertResponse(BaseModel):
     message: str
     severity: str
     entity_id: str
+
+
+# =====================
+#  DASHBOARD SNAPSHOT
+# =====================
+
+class DashboardSnapshot(BaseModel):
+    """GET /api/dashboard: only the requested sections the caller's role may see are present."""
+    generated_at: datetime
+    timings_ms: dict
+    stats: Optional[DashboardStats] = None
+    vehicles: Optional[List[VehicleResponse]] = None
+    drivers: Optional[List[DriverResponse]] = None
+    trips: Optional[List[TripResponse]] = None
+    alerts: Optional[List[AlertResponse]] = None
@@ -0,0 +1,173 @@
+"""
+Dispatch assignment benchmark.
+
+Builds random instances shaped like generate_fleet's data (vehicle classes
+from cargo bikes to heavy trucks, loads of 20-100% of a class capacity,
+gaussian safety scores) and runs three assigners on each:
+
+    optimized  dispatch.plan_assignments: best-fit decreasing with
+               bisect + union-find, O((T + V) log V)
+    first_fit  naive greedy: trips in arrival order, first free vehicle
+               and first free driver that fit, O(T * V)
+    best_fit   naive greedy: trips in arrival order, smallest free vehicle
+               that fits (full scan per trip), O(T * V)
+
+For each it reports the time, the trips covered, the total spare capacity
+(lower is better) and the mean safety score of the drivers used. Naive runs
+are skipped when T * V exceeds --naive-limit.
+
+--consolidate DRAFTSxDESTINATIONS runs consolidation.plan_consolidation on
+small drafts (900-1800 kg) spread over that many destinations, with a fleet
+as large as the draft count, and reports the time, vehicles before (one per
+draft) and after, the lower bound and kg moved per vehicle.
+
+Usage (from backend/):
+    python -m scripts.bench_dispatch --sizes 1000x2000,5000x10000,20000x40000
+    python -m scripts.bench_dispatch --sizes "" --consolidate 1000x50,5000x200,20000x500
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from consolidation import Shipment, plan_consolidation
+from dispatch import Assignment, AssignmentPlan, FreeDriver, FreeVehicle, PendingTrip, plan_assignments
+from scripts.bench_endpoints import DEFAULT_RESULTS_DIR, _git_commit
+from scripts.generate_fleet import VEHICLE_TYPES
+
+
+def _instance(trips: int, vehicles: int, drivers: int, seed: int):
+    rng = random.Random(seed)
+    weights = [t[3] for t in VEHICLE_TYPES]
+    fleet = []
+    for i, (_, lo, hi, _) in enumerate(rng.choices(VEHICLE_TYPES, weights=weights, k=vehicles)):
+        fleet.append(FreeVehicle(f"v{i}", float(round(rng.uniform(lo, hi), -1) or lo)))
+    loads = []
+    for i, (_, _, hi, _) in enumerate(rng.choices(VEHICLE_TYPES, weights=weights, k=trips)):
+        loads.append(PendingTrip(f"t{i}", round(hi * rng.uniform(0.2, 1.0), 1)))
+    crew = [FreeDriver(f"d{i}", round(min(100.0, max(10.0, rng.gauss(85, 9))), 1)) for i in range(drivers)]
+    return loads, fleet, crew
+
+
+def _naive(trips: List[PendingTrip], vehicles: List[FreeVehicle], drivers: List[FreeDriver], best_fit: bool) -> AssignmentPlan:
+    plan = AssignmentPlan()
+    free = list(vehicles)
+    for trip in trips:
+        if len(plan.assignments) == len(drivers):
+            plan.unassigned[trip.id] = "No on-duty driver left"
+            continue
+        chosen: Optional[int] = None
+        for i, vehicle in enumerate(free):
+            if vehicle.max_weight >= trip.cargo_weight:
+                if not best_fit:
+                    chosen = i
+                    break
+                if chosen is None or vehicle.max_weight < free[chosen].max_weight:
+                    chosen = i
+        if chosen is None:
+            plan.unassigned[trip.id] = "No free vehicle"
+            continue
+        vehicle, driver = free.pop(chosen), drivers[len(plan.assignments)]
+        plan.assignments.append(Assignment(
+            trip.id, vehicle.id, driver.id, trip.cargo_weight, vehicle.max_weight, driver.safety_score,
+        ))
+    return plan
+
+
+ASSIGNERS: Dict[str, Callable] = {
+    "optimized": plan_assignments,
+    "first_fit": lambda t, v, d: _naive(t, v, d, best_fit=False),
+    "best_fit": lambda t, v, d: _naive(t, v, d, best_fit=True),
+}
+
+
+def _consolidation_run(size: str, seed: int) -> dict:
+    n_drafts, n_destinations = (int(x) for x in size.lower().split("x"))
+    rng = random.Random(seed)
+    _, fleet, _ = _instance(0, n_drafts, 0, seed)
+    drafts = [Shipment(f"t{i}", f"City {rng.randrange(n_destinations)}", float(rng.randint(900, 1800)))
+              for i in range(n_drafts)]
+    started = time.perf_counter()
+    plan = plan_consolidation(drafts, fleet)
+    elapsed = time.perf_counter() - started
+    placed = sum(len(load.shipments) for load in plan.loads)
+    weight = sum(load.weight for load in plan.loads)
+    return {
+        "ms": round(elapsed * 1000, 2),
+        "vehicles_before": placed,
+        "vehicles_after": len(plan.loads),
+        "lower_bound": plan.lower_bound,
+        "unplaced": len(plan.unplaced),
+        "kg_per_vehicle_before": round(weight / placed, 1) if placed else None,
+        "kg_per_vehicle_after": round(weight / len(plan.loads), 1) if plan.loads else None,
+    }
+
+
+def _check(plan: AssignmentPlan):
+    vehicles = [a.vehicle_id for a in plan.assignments]
+    drivers = [a.driver_id for a in plan.assignments]
+    assert len(set(vehicles)) == len(vehicles), "vehicle assigned twice"
+    assert len(set(drivers)) == len(drivers), "driver assigned twice"
+    assert all(a.cargo_weight <= a.max_weight for a in plan.assignments), "overweight assignment"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000x2000,5000x10000,20000x40000", help="Comma-separated TRIPSxVEHICLES")
+    parser.add_argument("--drivers", type=float, default=1.5, help="On-duty drivers per trip")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--consolidate", default="", help="Comma-separated DRAFTSxDESTINATIONS consolidation runs")
+    parser.add_argument("--naive-limit", type=int, default=25_000_000, help="Skip naive runs above this T * V")
+    parser.add_argument("--output", help="Result file (default: bench_results/dispatch-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    result: Dict = {"commit": _git_commit(), "seed": args.seed, "drivers_per_trip": args.drivers, "runs": {}, "consolidation": {}}
+    for size in filter(None, args.sizes.split(",")):
+        n_trips, n_vehicles = (int(x) for x in size.lower().split("x"))
+        trips, vehicles, drivers = _instance(n_trips, n_vehicles, int(n_trips * args.drivers), args.seed)
+        runs = {}
+        for name, assign in ASSIGNERS.items():
+            if name != "optimized" and n_trips * n_vehicles > args.naive_limit:
+                continue
+            started = time.perf_counter()
+            plan = assign(trips, vehicles, drivers)
+            elapsed = time.perf_counter() - started
+            _check(plan)
+            assigned = len(plan.assignments)
+            runs[name] = {
+                "ms": round(elapsed * 1000, 2),
+                "assigned": assigned,
+                "spare_capacity_kg": round(plan.spare_capacity, 1),
+                "mean_safety_score": round(sum(a.safety_score for a in plan.assignments) / assigned, 2) if assigned else None,
+            }
+            print(
+                f"{size:>12} {name:>10}: {runs[name]['ms']:>10.2f}ms  assigned {assigned:>6}/{n_trips}  "
+                f"spare {runs[name]['spare_capacity_kg']:>14,.0f}kg  safety {runs[name]['mean_safety_score']}",
+                file=sys.stderr,
+            )
+        result["runs"][size] = runs
+
+    for size in filter(None, args.consolidate.split(",")):
+        run = result["consolidation"][size] = _consolidation_run(size, args.seed)
+        print(
+            f"{size:>12} consolidate: {run['ms']:>8.2f}ms  vehicles {run['vehicles_before']} -> {run['vehicles_after']} "
+            f"(lower bound {run['lower_bound']})  kg/vehicle {run['kg_per_vehicle_before']} -> {run['kg_per_vehicle_after']}",
+            file=sys.stderr,
+        )
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"dispatch-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+"""
+Endpoint benchmark suite.
+
+Boots the FastAPI app in-process (httpx ASGITransport, inside the app's
+lifespan so the availability index and telemetry flusher are running)
+against generated datasets and drives the routes listed in main.py's
+docstring at a fixed concurrency. For every route it records throughput,
+p50/p95/p99 latency, SQL statements per request and how far the route raised
+RSS above what it started with, and writes the run to JSON so runs can be
+compared for regressions. With --encodings every route
+also runs per Accept-Encoding, reporting bytes on the wire, compression
+ratio and time spent compressing (the CPU-for-bandwidth trade).
+
+Each dataset size runs in its own subprocess, because the database engine
+is bound when the app is imported. The report cache is off in those runs, so
+reports.* rows measure the queries; with --warm-cache the reports run again
+in a second subprocess with the cache on and are recorded as
+`<route>@warm`.
+
+Usage (from backend/):
+    python -m scripts.bench_endpoints --sizes small,medium --concurrency 8 --requests 200
+    python -m scripts.bench_endpoints --sizes small --routes stats,trips.list --compare bench_results/prev.json
+    python -m scripts.bench_endpoints --sizes small --routes trips.list,reports.export_csv --encodings identity,gzip,br,zstd
+    python -m scripts.bench_endpoints --sizes small,medium --warm-cache
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from scripts.generate_fleet import DEMO_PASSWORD, PRESETS
+
+DEFAULT_DATA_DIR = "./bench_data"
+DEFAULT_RESULTS_DIR = "./bench_results"
+DOC_ROUTE_RE = re.compile(r"^\s+(GET|POST|PATCH|DELETE)\s+(/\S+)", re.MULTILINE)
+
+
+@dataclass
+class BenchRoute:
+    name: str
+    method: str
+    path: str                       # as written in main.py's docstring
+    build: Optional[Callable] = None  # ctx -> kwargs for client.request (url/json/params), per request
+    weight: float = 1.0             # share of --requests (heavy routes run fewer)
+    role: str = "admin"
+
+
+def _trip_create(ctx):
+    return {"url": "/api/trips", "json": {
+        "vehicle_id": ctx["vehicle_id"], "driver_id": ctx["driver_id"],
+        "destination": "Bench City, BC → Load Town, LT", "cargo_weight": 10,
+    }}
+
+
+def _vehicle_create(ctx):
+    return {"url": "/api/vehicles", "json": {
+        "plate_number": f"BENCH-{ctx['run']}-{next(ctx['seq'])}", "vehicle_type": "Cargo Van", "max_weight": 1000,
+    }}
+
+
+def _driver_create(ctx):
+    return {"url": "/api/drivers", "json": {
+        "name": "Bench Driver", "license_number": f"BENCH-{ctx['run']}-{next(ctx['seq'])}",
+        "license_expiry_date": str(datetime.date.today() + datetime.timedelta(days=365)),
+    }}
+
+
+def _trip_status(ctx):
+    return {"url": f"/api/trips/{ctx['draft_trip_id']}/status", "json": {"status": "draft"}}
+
+
+def _trip_status_batch(ctx):
+    return {"url": "/api/trips/status:batch", "json": {
+        "updates": [{"trip_id": tid, "status": "draft"} for tid in ctx["draft_trip_ids"]],
+    }}
+
+
+ROUTES: List[BenchRoute] = [
+    BenchRoute("auth.login", "POST", "/auth/login", lambda ctx: {"url": "/auth/login", "json": {
+        "email": "admin@fleetflow.com", "password": DEMO_PASSWORD}}, weight=0.25, role="anonymous"),
+    BenchRoute("auth.refresh", "POST", "/auth/refresh", lambda ctx: {"url": "/auth/refresh", "json": {
+        "refresh_token": ctx["refresh_token"]}}, role="anonymous"),
+    BenchRoute("auth.me", "GET", "/auth/me"),
+    BenchRoute("stats", "GET", "/api/stats"),
+    BenchRoute("dashboard", "GET", "/api/dashboard?sections=", weight=0.1),
+    BenchRoute("vehicles.list", "GET", "/api/vehicles", weight=0.5),
+    BenchRoute("vehicles.list.dispatcher", "GET", "/api/vehicles", weight=0.5, role="dispatcher"),
+    BenchRoute("vehicles.available", "GET", "/api/vehicles/available?min_capacity=&vehicle_type=&limit=", lambda ctx: {
+        "url": "/api/vehicles/available", "params": {"min_capacity": 3200, "limit": 10}}),
+    BenchRoute("vehicles.create", "POST", "/api/vehicles", _vehicle_create),
+    BenchRoute("vehicles.update", "PATCH", "/api/vehicles/{id}", lambda ctx: {
+        "url": f"/api/vehicles/{ctx['vehicle_id']}", "json": {"mileage": ctx["vehicle_mileage"]}}),
+    BenchRoute("drivers.list", "GET", "/api/drivers", weight=0.5),
+    BenchRoute("drivers.create", "POST", "/api/drivers", _driver_create),
+    BenchRoute("drivers.update", "PATCH", "/api/drivers/{id}", lambda ctx: {
+        "url": f"/api/drivers/{ctx['driver_id']}", "json": {"safety_score": ctx["driver_safety_score"]}}),
+    BenchRoute("trips.list", "GET", "/api/trips", weight=0.1),
+    BenchRoute("trips.create", "POST", "/api/trips", _trip_create),
+    BenchRoute("trips.status", "PATCH", "/api/trips/{id}/status", _trip_status),
+    BenchRoute("trips.status_batch", "POST", "/api/trips/status:batch", _trip_status_batch, weight=0.5),
+    BenchRoute("dispatch.auto_assign", "POST", "/api/dispatch/auto-assign", lambda ctx: {
+        "url": "/api/dispatch/auto-assign", "json": {}}, weight=0.1),
+    BenchRoute("dispatch.consolidate", "POST", "/api/dispatch/consolidate", lambda ctx: {
+        "url": "/api/dispatch/consolidate", "json": {}}, weight=0.1),
+    BenchRoute("telemetry.ingest", "POST", "/api/telemetry", lambda ctx: {"url": "/api/telemetry", "json": {
+        "pings": [{"vehicle_id": ctx["vehicle_id"], "odometer_km": ctx["vehicle_mileage"]}] * 100}}),
+    BenchRoute("maintenance.list", "GET", "/api/maintenance", weight=0.5),
+    BenchRoute("fuel.list", "GET", "/api/fuel", weight=0.1),
+    BenchRoute("fuel.create", "POST", "/api/fuel", lambda ctx: {"url": "/api/fuel", "json": {
+        "trip_id": ctx["draft_trip_id"], "fuel_used": 1, "fuel_cost": 1}}),
+    BenchRoute("reports.fuel_efficiency", "GET", "/api/reports/fuel-efficiency", weight=0.1),
+    BenchRoute("reports.monthly_expenses", "GET", "/api/reports/monthly-expenses", weight=0.1),
+    BenchRoute("reports.vehicle_profitability", "GET", "/api/reports/vehicle-profitability", weight=0.1),
+    BenchRoute("reports.alerts", "GET", "/api/reports/alerts", weight=0.5),
+    BenchRoute("reports.export_csv", "GET", "/api/reports/export/csv?report=", lambda ctx: {
+        "url": "/api/reports/export/csv", "params": {"report": "fuel"}}, weight=0.05),
+    BenchRoute("reports.export_pdf", "GET", "/api/reports/export/pdf?report=", lambda ctx: {
+        "url": "/api/reports/export/pdf", "params": {"report": "expenses"}}, weight=0.02),
+    BenchRoute("search", "GET", "/api/search?q=&types=", lambda ctx: {
+        "url": "/api/search", "params": {"q": "chicago houston"}}),
+]
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size; None where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class _RssWatch:
+    """
+    Highest RSS reached while one route runs, relative to its start. ru_maxrss
+    is a lifetime peak, so later routes would inherit earlier routes' peaks;
+    without /proc the growth of that peak is the best available.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="bench-rss", daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, _rss_mb() or 0.0)
+
+    def __enter__(self):
+        self.start_mb = _rss_mb()
+        self.peak_mb = self.start_mb or 0.0
+        self.start_peak_mb = _peak_rss_mb()
+        if self.start_mb is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start_mb is not None:
+            self._stop.set()
+            self._thread.join()
+            self.end_mb = _rss_mb()
+            self.peak_mb = max(self.peak_mb, self.end_mb)
+            self.delta_mb = self.peak_mb - self.start_mb
+        else:
+            self.end_mb = _peak_rss_mb()
+            self.delta_mb = self.end_mb - self.start_peak_mb
+
+
+def uncovered_doc_routes(doc: str) -> List[str]:
+    """Routes in main.py's docstring with no benchmark (deletes, bulk, seed and status-changing writes)."""
+    covered = {(r.method, r.path) for r in ROUTES}
+    return [f"{m} {p}" for m, p in DOC_ROUTE_RE.findall(doc or "") if (m, p) not in covered]
+
+
+# ========================
+#  WORKER (one dataset size)
+# ========================
+async def _prepare_context(client, db_session_factory, models) -> dict:
+    tokens = {}
+    for role, email in (("admin", "admin@fleetflow.com"), ("dispatcher", "dispatcher@fleetflow.com")):
+        r = await client.post("/auth/login", json={"email": email, "password": DEMO_PASSWORD})
+        r.raise_for_status()
+        tokens[role] = {"Authorization": f"Bearer {r.json()['token']}"}
+        refresh_token = r.json()["refresh_token"]
+    tokens["anonymous"] = {}
+
+    db = db_session_factory()
+    try:
+        today = datetime.date.today()
+        vehicle = db.query(models.Vehicle).filter(
+            models.Vehicle.status == "available", models.Vehicle.max_weight >= 100
+        ).first()
+        driver = db.query(models.Driver).filter(
+            models.Driver.duty_status == "on", models.Driver.license_expiry_date > today
+        ).first()
+    finally:
+        db.close()
+    if not vehicle or not driver:
+        raise RuntimeError("Dataset has no available vehicle / on-duty driver for trip benchmarks")
+
+    ctx = {
+        "tokens": tokens,
+        "refresh_token": refresh_token,
+        "run": uuid.uuid4().hex[:8],
+        "seq": itertools.count(),
+        "vehicle_id": vehicle.id,
+        "vehicle_mileage": vehicle.mileage,
+        "driver_id": driver.id,
+        "driver_safety_score": driver.safety_score,
+    }
+    drafts = []
+    for _ in range(20):
+        r = await client.post(**_trip_create(ctx), headers=tokens["admin"])
+        r.raise_for_status()
+        drafts.append(r.json()["id"])
+    ctx["draft_trip_id"] = drafts[0]
+    ctx["draft_trip_ids"] = drafts
+    return ctx
+
+
+def _compression_totals(encoding: str):
+    from response_compression import COMPRESSION_BYTES, COMPRESSION_SECONDS
+    return (
+        COMPRESSION_SECONDS.labels(encoding).value,
+        COMPRESSION_BYTES.labels(encoding, "in").value,
+        COMPRESSION_BYTES.labels(encoding, "out").value,
+    )
+
+
+async def _run_route(client, route: BenchRoute, ctx: dict, n: int, concurrency: int, query_counter: dict,
+                     encoding: str = "identity") -> dict:
+    headers = {**ctx["tokens"][route.role], "Accept-Encoding": encoding}
+    build = route.build or (lambda _: {"url": route.path})
+
+    # Warm up caches / lazy imports outside the measurement
+    await client.request(route.method, headers=headers, **build(ctx))
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    bytes_out = 0
+    wire_bytes = 0
+    queue = iter(range(n))
+
+    async def worker():
+        nonlocal bytes_out, wire_bytes
+        for _ in queue:
+            kwargs = build(ctx)
+            started = time.perf_counter()
+            r = await client.request(route.method, headers=headers, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+            bytes_out += len(r.content)
+            wire_bytes += r.num_bytes_downloaded
+
+    compression_before = _compression_totals(encoding)
+    queries_before = query_counter["n"]
+    cpu_before = time.process_time()
+    started = time.perf_counter()
+    with _RssWatch() as rss:
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, n))))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 2)
+    compress_seconds, compress_in, compress_out = (
+        after - before for after, before in zip(_compression_totals(encoding), compression_before))
+    return {
+        "method": route.method,
+        "path": route.path,
+        "requests": n,
+        "concurrency": concurrency,
+        "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": round(n / wall, 1) if wall else None,
+        "latency_ms": {
+            "mean": ms(statistics.fmean(latencies)),
+            "p50": ms(_percentile(latencies, 50)),
+            "p95": ms(_percentile(latencies, 95)),
+            "p99": ms(_percentile(latencies, 99)),
+            "max": ms(latencies[-1]),
+        },
+        "queries_per_request": round((query_counter["n"] - queries_before) / n, 2),
+        "cpu_ms_per_request": round((time.process_time() - cpu_before) / n * 1000, 2),
+        "response_bytes_avg": round(bytes_out / n),
+        "encoding": encoding,
+        "wire_bytes_avg": round(wire_bytes / n),
+        "compress_ms_per_request": round(compress_seconds / n * 1000, 3),
+        "compression_ratio": round(compress_in / compress_out, 2) if compress_out else None,
+        "rss_mb": round(rss.end_mb, 1),
+        "rss_peak_delta_mb": round(rss.delta_mb, 1),
+    }
+
+
+async def _run_worker(args) -> dict:
+    import httpx
+    from sqlalchemy import event
+    import main
+    import models
+    from database import engine, SessionLocal
+
+    query_counter = {"n": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_):
+        query_counter["n"] += 1
+
+    selected = [r for r in ROUTES if not args.routes or r.name in args.routes]
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    # ASGITransport sends no lifespan events; run the app's lifespan around the client instead
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        ctx = await _prepare_context(client, SessionLocal, models)
+        for route in selected:
+            n = max(1, int(args.requests * route.weight))
+            for encoding in args.encodings:
+                # identity keeps the bare route name so --compare works across runs
+                name = route.name if encoding == "identity" else f"{route.name}@{encoding}"
+                results[name] = r = await _run_route(
+                    client, route, ctx, n, args.concurrency, query_counter, encoding)
+                print(
+                    f"  [{args.size}] {name:<32} {r['throughput_rps']:>8} rps  "
+                    f"p50 {r['latency_ms']['p50']:>8}ms  p95 {r['latency_ms']['p95']:>8}ms  "
+                    f"p99 {r['latency_ms']['p99']:>8}ms  {r['queries_per_request']:>7} q/req  "
+                    f"{r['wire_bytes_avg']:>9} B  {r['compress_ms_per_request']:>7} ms zip  "
+                    f"+{r['rss_peak_delta_mb']} MB RSS",
+                    file=sys.stderr,
+                )
+    uncovered = uncovered_doc_routes(main.__doc__)
+    if uncovered and not args.routes:
+        print(f"  [{args.size}] not benchmarked: {', '.join(uncovered)}", file=sys.stderr)
+    return {"routes": results, "uncovered_routes": uncovered}
+
+
+# ========================
+#  DRIVER
+# ========================
+def _dataset_path(data_dir: str, size: str) -> str:
+    return os.path.abspath(os.path.join(data_dir, f"fleet_{size}.db"))
+
+
+def _ensure_dataset(data_dir: str, size: str, seed: int) -> str:
+    path = _dataset_path(data_dir, size)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Generating {size} dataset at {path} ...", file=sys.stderr)
+        subprocess.run(
+            [sys.executable, "-m", "scripts.generate_fleet", "--preset", size,
+             "--seed", str(seed), "--database-url", f"sqlite:///{path}"],
+            check=True,
+        )
+    return path
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: dict, current: dict, threshold: float) -> List[str]:
+    """p95 regressions above `threshold` (fraction) for routes present in both runs."""
+    regressions = []
+    for size, run in current["results"].items():
+        before = previous.get("results", {}).get(size, {}).get("routes", {})
+        for name, stats in run["routes"].items():
+            if name not in before:
+                continue
+            old, new = before[name]["latency_ms"]["p95"], stats["latency_ms"]["p95"]
+            if old > 0 and (new - old) / old > threshold:
+                regressions.append(f"[{size}] {name}: p95 {old}ms -> {new}ms (+{(new - old) / old:.0%})")
+    return regressions
+
+
+def _run_size(args, size: str, path: str, routes: Optional[set], report_cache: bool) -> dict:
+    cmd = [sys.executable, "-m", "scripts.bench_endpoints", "--worker", "--size", size,
+           "--concurrency", str(args.concurrency), "--requests", str(args.requests)]
+    if routes:
+        cmd += ["--routes", ",".join(sorted(routes))]
+    cmd += ["--encodings", ",".join(args.encodings)]
+    env = {
+        **os.environ, "DATABASE_URL": f"sqlite:///{path}", "RATE_LIMIT_ENABLED": "false",
+        "REPORT_CACHE_ENABLED": "true" if report_cache else "false",
+        # The client shares the app's event loop, so stall reports would blame the benchmark itself
+        "LOOP_MONITOR_ENABLED": "false",
+    }
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, check=True)
+    return json.loads(proc.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="small", help=f"Comma-separated presets: {','.join(PRESETS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per light route (heavy ones run fewer)")
+    parser.add_argument("--routes", help="Comma-separated route names to run (default: all)")
+    parser.add_argument("--encodings", default="identity",
+                        help="Comma-separated Accept-Encodings to run every route with, e.g. identity,gzip,br,zstd")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Also run reports.* with the report cache on, recorded as <route>@warm")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default: bench_results/endpoints-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous result file to check for p95 regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Regression threshold for --compare (0.2 = 20%%)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.routes = set(args.routes.split(",")) if args.routes else None
+    args.encodings = [e.strip() for e in args.encodings.split(",") if e.strip()]
+
+    if args.worker:
+        result = asyncio.run(_run_worker(args))
+        json.dump(result, sys.stdout)
+        return result
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in PRESETS]
+    if unknown:
+        parser.error(f"unknown sizes {unknown}; choose from {list(PRESETS)}")
+
+    run = {
+        "meta": {
+            "started_at": datetime.datetime.utcnow().isoformat() + "Z",
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+            "encodings": args.encodings,
+            "report_cache": "off" + (", reports also @warm" if args.warm_cache else ""),
+        },
+        "results": {},
+    }
+    for size in sizes:
+        path = _ensure_dataset(args.data_dir, size, args.seed)
+        # Measures capacity, so admission control (rate_limit.py) is off; the report
+        # cache is off too, or every report request after the first would be a hit
+        result = _run_size(args, size, path, args.routes, report_cache=False)
+        if args.warm_cache:
+            warm_routes = {r.name for r in ROUTES if r.name.startswith("reports.")}
+            warm = _run_size(args, size, path, warm_routes & args.routes if args.routes else warm_routes, report_cache=True)
+            result["routes"].update({f"{name}@warm": stats for name, stats in warm["routes"].items()})
+        run["results"][size] = {"dataset": PRESETS[size], **result}
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"endpoints-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), run, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+    return run
+
+
+if __name__ == "__main__":
+    main()
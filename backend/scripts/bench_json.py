@@ -0,0 +1,174 @@
+"""
+JSON list serialization benchmark.
+
+Loads every trip and fuel log of a generated dataset and times the ways a
+list endpoint can turn ORM rows into a response body:
+
+    stdlib         response_model validation + jsonable_encoder + json.dumps
+                   (FastAPI before it used Pydantic's dump_json)
+    response_model TypeAdapter validation + Pydantic dump_json (current FastAPI)
+    fast/validate  fast_json.RowSerializer with FAST_JSON_VALIDATE=true
+    fast/trusted   fast_json.RowSerializer (default): rows -> dicts -> orjson
+    fast/stdlib    fast/trusted with the stdlib json fallback
+
+plus the trips query with and without eager-loaded vehicle/driver, and the
+GET /api/trips and GET /api/fuel endpoints end to end.
+
+Usage (from backend/):
+    python -m scripts.bench_json --size small --repeat 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict
+
+from scripts.bench_endpoints import DEFAULT_RESULTS_DIR, _ensure_dataset, _git_commit
+from scripts.generate_fleet import DEMO_PASSWORD
+
+
+def _best_of(repeat: int, fn: Callable) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _serializers(model, rows) -> Dict[str, Callable]:
+    import fast_json
+    from fastapi.encoders import jsonable_encoder
+
+    trusted = fast_json.RowSerializer(model, validate=False)
+    validating = fast_json.RowSerializer(model, validate=True)
+    adapter = trusted.adapter
+
+    def stdlib():
+        return json.dumps(jsonable_encoder(adapter.validate_python(rows, from_attributes=True))).encode()
+
+    def response_model():
+        return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+    def fast(serializer):
+        return lambda: b"".join(serializer.iter_array(rows))
+
+    def fast_stdlib():
+        saved, fast_json.orjson = fast_json.orjson, None
+        try:
+            return fast(trusted)()
+        finally:
+            fast_json.orjson = saved
+
+    cases = {
+        "stdlib": stdlib,
+        "response_model": response_model,
+        "fast/validate": fast(validating),
+        "fast/trusted": fast(trusted),
+    }
+    if fast_json.orjson is not None:
+        cases["fast/stdlib"] = fast_stdlib
+    return cases
+
+
+async def _endpoint_times(repeat: int) -> Dict[str, float]:
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login = await client.post("/auth/login", json={"email": "admin@fleetflow.com", "password": DEMO_PASSWORD})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['token']}"}
+        times = {}
+        for path in ("/api/trips", "/api/fuel"):
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                response.raise_for_status()
+                best = min(best, time.perf_counter() - started)
+            times[f"GET {path}"] = best
+        return times
+
+
+def run(size: str, data_dir: str, seed: int, repeat: int) -> dict:
+    os.environ["DATABASE_URL"] = f"sqlite:///{_ensure_dataset(data_dir, size, seed)}"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    # Imported late so DATABASE_URL takes effect
+    from sqlalchemy.orm import joinedload
+    from database import SessionLocal
+    import models
+    import schemas
+
+    results: Dict[str, Dict[str, float]] = {}
+    db = SessionLocal()
+    try:
+        def load_trips(eager: bool):
+            def fn():
+                db.expunge_all()
+                query = db.query(models.Trip)
+                if eager:
+                    query = query.options(joinedload(models.Trip.vehicle), joinedload(models.Trip.driver))
+                trips = query.order_by(models.Trip.created_at.desc()).all()
+                for trip in trips:  # what serialization would touch
+                    trip.vehicle, trip.driver
+                return trips
+            return fn
+
+        results["trips query"] = {
+            "lazy": _best_of(1, load_trips(False)),
+            "joinedload": _best_of(repeat, load_trips(True)),
+        }
+        trips = load_trips(True)()
+        fuel_logs = db.query(models.FuelLog).order_by(models.FuelLog.created_at.desc()).all()
+
+        for name, model, rows in (
+            ("trips", schemas.TripResponse, trips),
+            ("fuel", schemas.FuelLogResponse, fuel_logs),
+        ):
+            cases = _serializers(model, rows)
+            reference = json.loads(cases["response_model"]())
+            for label, fn in cases.items():
+                if json.loads(fn()) != reference:
+                    raise SystemExit(f"{name}/{label}: output differs from response_model")
+            results[f"{name} serialize ({len(rows)} rows)"] = {label: _best_of(repeat, fn) for label, fn in cases.items()}
+    finally:
+        db.close()
+
+    results["endpoints"] = asyncio.run(_endpoint_times(repeat))
+    return results
+
+
+def _print(results: dict):
+    for group, cases in results.items():
+        print(group)
+        baseline = next(iter(cases.values()))
+        for label, seconds in cases.items():
+            speedup = "" if group == "endpoints" else f"  {baseline / seconds:>6.1f}x"
+            print(f"  {label:<22} {seconds * 1000:>10.1f} ms{speedup}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="small", help="Dataset preset (see scripts.generate_fleet)")
+    parser.add_argument("--data-dir", default="./bench_data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N per case")
+    parser.add_argument("--output", help=f"Write results JSON here (e.g. {DEFAULT_RESULTS_DIR}/json.json)")
+    args = parser.parse_args(argv)
+
+    results = run(args.size, args.data_dir, args.seed, args.repeat)
+    _print(results)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"size": args.size, "commit": _git_commit(), "results": results}, f, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Noisy-neighbour overload benchmark for admission control (rate_limit.py).
+
+Runs the API under uvicorn twice against a copy of a generated dataset, once
+with RATE_LIMIT_ENABLED=false and once with it on. In each run a dispatcher
+cycles a draft trip's status (PATCH /api/trips/{id}/status) at a steady rate,
+first alone (baseline) and then while one Fleet Manager hammers a report
+export from --noisy-concurrency loops that retry immediately, ignoring
+Retry-After. Reports the dispatcher's latency percentiles in both phases and
+the noisy client's status codes, so the two runs show how much of the
+baseline the limiter preserves.
+
+Usage (from backend/):
+    python -m scripts.bench_overload --size small --noisy-concurrency 32 --duration 20
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from scripts.bench_endpoints import DEFAULT_DATA_DIR, DEFAULT_RESULTS_DIR, _ensure_dataset, _git_commit, _percentile
+from scripts.bench_websocket import _free_port, _start_server, _wait_ready
+from scripts.generate_fleet import DEMO_PASSWORD
+
+
+async def _login(client: httpx.AsyncClient, email: str) -> dict:
+    r = await client.post("/auth/login", json={"email": email, "password": DEMO_PASSWORD})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['token']}"}
+
+
+async def _create_draft(client: httpx.AsyncClient, headers: dict) -> str:
+    vehicles = (await client.get("/api/vehicles", headers=headers)).json()
+    drivers = (await client.get("/api/drivers", headers=headers)).json()
+    today = datetime.date.today().isoformat()
+    vehicle = next((v for v in vehicles if v["status"] == "available"), None)
+    driver = next((d for d in drivers if d["duty_status"] == "on" and d["license_expiry_date"] > today), None)
+    if not vehicle or not driver:
+        raise RuntimeError("Need an available vehicle and an on-duty driver to create a trip")
+    r = await client.post("/api/trips", headers=headers, json={
+        "vehicle_id": vehicle["id"], "driver_id": driver["id"],
+        "destination": "Overload Bench", "cargo_weight": 1,
+    })
+    r.raise_for_status()
+    return r.json()["id"]
+
+
+async def _dispatcher(client: httpx.AsyncClient, headers: dict, trip_id: str, args, seconds: float) -> dict:
+    latencies: List[float] = []
+    errors = timeouts = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            r = await client.patch(f"/api/trips/{trip_id}/status", headers=headers, json={"status": "draft"},
+                                   timeout=args.request_timeout)
+            if r.status_code != 200:
+                errors += 1
+        except httpx.TimeoutException:
+            timeouts += 1
+        except httpx.HTTPError:
+            errors += 1
+        elapsed = time.perf_counter() - started
+        latencies.append(elapsed * 1000)
+        await asyncio.sleep(max(0.0, 1 / args.rate - elapsed))
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "timeouts": timeouts,
+        "latency_ms": {f"p{p}": round(_percentile(latencies, p), 2) for p in (50, 95, 99)},
+    }
+
+
+async def _noisy(client: httpx.AsyncClient, headers: dict, url: str, codes: Counter):
+    while True:
+        try:
+            r = await client.get(url, headers=headers)
+            codes[r.status_code] += 1
+        except httpx.HTTPError:
+            codes["error"] += 1
+
+
+async def _run_once(db_path: str, limited: bool, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="fleetflow-overload-")
+    shutil.copy(db_path, os.path.join(workdir, "ws_bench.db"))
+    port = _free_port()
+    proc = _start_server(port, workdir, RATE_LIMIT_ENABLED=str(limited).lower())
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.noisy_concurrency + 10)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            await _wait_ready(client, proc)
+            manager = await _login(client, "admin@fleetflow.com")
+            dispatcher = await _login(client, "dispatcher@fleetflow.com")
+            trip_id = await _create_draft(client, dispatcher)
+
+            baseline = await _dispatcher(client, dispatcher, trip_id, args, args.baseline)
+
+            codes: Counter = Counter()
+            url = f"/api/reports/export/{args.export}?report={args.report}"
+            noisy = [asyncio.create_task(_noisy(client, manager, url, codes))
+                     for _ in range(args.noisy_concurrency)]
+            overloaded = await _dispatcher(client, dispatcher, trip_id, args, args.duration)
+            # Abandon in-flight exports; the server is torn down right after
+            for task in noisy:
+                task.cancel()
+            await asyncio.gather(*noisy, return_exceptions=True)
+    finally:
+        proc.kill()  # terminate() would wait for the abandoned exports to finish
+        proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "baseline": baseline,
+        "overloaded": overloaded,
+        "noisy_status_codes": {str(k): v for k, v in sorted(codes.items(), key=str)},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="small", help="Dataset preset (see generate_fleet)")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--export", choices=["csv", "pdf"], default="pdf")
+    parser.add_argument("--report", default="fuel", help="Report the noisy client exports")
+    parser.add_argument("--noisy-concurrency", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=10.0, help="Dispatcher status changes per second")
+    parser.add_argument("--baseline", type=float, default=5.0, help="Seconds of dispatcher traffic alone")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of dispatcher traffic under overload")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Dispatcher requests slower than this count as timeouts")
+    parser.add_argument("--output", help="Result file (default: bench_results/overload-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    db_path = _ensure_dataset(args.data_dir, args.size, args.seed)
+    result: Dict = {
+        "commit": _git_commit(),
+        "size": args.size,
+        "noisy": {"url": f"/api/reports/export/{args.export}?report={args.report}",
+                  "concurrency": args.noisy_concurrency},
+        "runs": {},
+    }
+    for limited in (False, True):
+        label = "limited" if limited else "unlimited"
+        run = asyncio.run(_run_once(db_path, limited, args))
+        result["runs"][label] = run
+        print(
+            f"{label:>9}: status p50 {run['baseline']['latency_ms']['p50']} -> {run['overloaded']['latency_ms']['p50']}ms  "
+            f"p99 {run['baseline']['latency_ms']['p99']} -> {run['overloaded']['latency_ms']['p99']}ms  "
+            f"timeouts {run['overloaded']['timeouts']}  noisy {run['noisy_status_codes']}",
+            file=sys.stderr,
+        )
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"overload-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    return result
+
+
+if __name__ == "__main__":
+    main()
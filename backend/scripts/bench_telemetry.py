@@ -0,0 +1,195 @@
+"""
+Telemetry ingestion throughput benchmark.
+
+Starts the API under uvicorn against a throwaway seeded database, then has
+--clients concurrent senders push batches of --batch pings (spread over the
+seeded vehicles) for --seconds, either as POST /api/telemetry requests or,
+with --ws, as frames on /ws/telemetry. A 503 is honoured by sleeping for its
+Retry-After. Afterwards it waits for the flusher and counts the rows that
+reached the telemetry_pings table.
+
+Reports pings/sec accepted and written, 503s, request (or frame ack)
+latency, and the buffer depth from /metrics at the end of the load.
+
+Usage (from backend/):
+    python -m scripts.bench_telemetry --clients 16 --batch 1000 --seconds 10
+    python -m scripts.bench_telemetry --ws --clients 16 --batch 1000 --seconds 10
+    TELEMETRY_BUFFER_MAX_PINGS=20000 python -m scripts.bench_telemetry --clients 32   # force backpressure
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import List
+
+import httpx
+
+try:
+    import websockets
+except ImportError:  # pragma: no cover - optional benchmark dependency
+    websockets = None
+
+from scripts.bench_endpoints import DEFAULT_RESULTS_DIR, _git_commit, _percentile
+from scripts.bench_websocket import BACKEND_DIR, _free_port, _login, _start_server, _wait_ready
+
+
+class Tally:
+    def __init__(self):
+        self.accepted = 0
+        self.codes: Counter = Counter()
+        self.latencies: List[float] = []
+
+
+def _body(vehicle_ids: List[str], batch: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    pings = []
+    for i in range(batch):
+        pings.append({
+            "vehicle_id": rng.choice(vehicle_ids),
+            "recorded_at": (now + datetime.timedelta(milliseconds=i)).isoformat() + "Z",
+            "odometer_km": round(rng.uniform(0, 300000), 1),
+            "lat": round(rng.uniform(25, 49), 5),
+            "lon": round(rng.uniform(-124, -67), 5),
+            "fuel_level_pct": round(rng.uniform(5, 100), 1),
+        })
+    return json.dumps({"pings": pings}).encode()
+
+
+async def _http_sender(client: httpx.AsyncClient, headers: dict, body: bytes, deadline: float, tally: Tally):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        r = await client.post("/api/telemetry", content=body, headers=headers)
+        tally.latencies.append(time.perf_counter() - started)
+        tally.codes[r.status_code] += 1
+        if r.status_code == 202:
+            tally.accepted += r.json()["accepted"]
+        elif r.status_code == 503:
+            await asyncio.sleep(float(r.headers.get("Retry-After", "1")))
+
+
+async def _ws_sender(url: str, body: bytes, deadline: float, tally: Tally):
+    frame = body.decode()
+    async with websockets.connect(url, ping_interval=None, max_size=None) as ws:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await ws.send(frame)
+            ack = json.loads(await ws.recv())
+            tally.latencies.append(time.perf_counter() - started)
+            tally.codes["ack" if "accepted" in ack else "error"] += 1
+            tally.accepted += ack.get("accepted", 0)
+
+
+def _buffer_depth(metrics_text: str) -> float:
+    for line in metrics_text.splitlines():
+        if line.startswith("fleetflow_telemetry_buffer_pings "):
+            return float(line.split()[1])
+    return 0.0
+
+
+async def run(args) -> dict:
+    if args.ws and websockets is None:
+        raise SystemExit("The websockets package is required for --ws: pip install websockets")
+    workdir = tempfile.mkdtemp(prefix="fleetflow-telemetry-")
+    db_path = os.path.join(workdir, "ws_bench.db")
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    # Create the schema up front: workers racing create_all on an empty database trip over each other
+    subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND_DIR, check=True, env={
+        **os.environ, "DATABASE_URL": f"sqlite:///{db_path}",
+        "INVALIDATION_FEED_PATH": os.path.join(workdir, "invalidation.log"),
+    })
+    proc = _start_server(port, workdir, workers=args.workers)
+    tally = Tally()
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=args.clients)) as client:
+            await _wait_ready(client, proc)
+            await client.post("/api/seed")
+            headers = await _login(client)
+            vehicle_ids = [v["id"] for v in (await client.get("/api/vehicles", headers=headers)).json()]
+            bodies = [_body(vehicle_ids, args.batch, seed) for seed in range(args.clients)]
+
+            started = time.perf_counter()
+            deadline = started + args.seconds
+            if args.ws:
+                token = headers["Authorization"].split()[1]
+                url = base_url.replace("http", "ws", 1) + f"/ws/telemetry?token={token}"
+                await asyncio.gather(*(_ws_sender(url, body, deadline, tally) for body in bodies))
+            else:
+                headers = {**headers, "Content-Type": "application/json"}
+                await asyncio.gather(*(_http_sender(client, headers, body, deadline, tally) for body in bodies))
+            elapsed = time.perf_counter() - started
+            depth = _buffer_depth((await client.get("/metrics")).text)
+            await asyncio.sleep(args.drain)
+    finally:
+        proc.terminate()   # the lifespan writes what is still buffered
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    with sqlite3.connect(db_path) as conn:
+        written = conn.execute("SELECT COUNT(*) FROM telemetry_pings").fetchone()[0]
+    lat = sorted(tally.latencies)
+    ms = lambda v: round(v * 1000, 2)
+    return {
+        "meta": {
+            "started_at": datetime.datetime.utcnow().isoformat() + "Z",
+            "git_commit": _git_commit(),
+            "transport": "ws" if args.ws else "http",
+            "clients": args.clients,
+            "batch": args.batch,
+            "seconds": args.seconds,
+            "workers": args.workers,
+        },
+        "accepted": tally.accepted,
+        "written": written,
+        "accepted_per_sec": round(tally.accepted / elapsed, 1),
+        "codes": {str(k): v for k, v in tally.codes.items()},
+        "buffer_depth_at_end": depth,
+        "latency_ms": {
+            "p50": ms(_percentile(lat, 50)), "p95": ms(_percentile(lat, 95)),
+            "p99": ms(_percentile(lat, 99)), "max": ms(lat[-1]) if lat else 0.0,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent senders")
+    parser.add_argument("--batch", type=int, default=1000, help="Pings per request / frame")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--ws", action="store_true", help="Stream over /ws/telemetry instead of POST")
+    parser.add_argument("--drain", type=float, default=2.0, help="Seconds to wait for the flusher after the load")
+    parser.add_argument("--output", help="Result file (default: bench_results/telemetry-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    print(
+        f"{result['meta']['transport']} {args.clients} clients x {args.batch} pings: "
+        f"{result['accepted_per_sec']:,.0f} pings/s accepted, {result['accepted']:,} accepted, "
+        f"{result['written']:,} written, codes {result['codes']}, "
+        f"p50 {result['latency_ms']['p50']}ms p99 {result['latency_ms']['p99']}ms",
+        file=sys.stderr,
+    )
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"telemetry-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    return result
+
+
+if __name__ == "__main__":
+    main()
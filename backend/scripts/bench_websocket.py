@@ -0,0 +1,439 @@
+"""
+WebSocket fan-out load benchmark.
+
+Starts the API under uvicorn against a throwaway seeded database (or targets
+--url), opens N simulated /ws clients, then fires trip status changes through
+the REST API and times every tripStatusUpdated event until it reaches each
+client. Reports the delivery latency distribution, messages/sec, dropped
+and dead sockets, and the server's memory per connection.
+
+Slow consumers exercise ConnectionManager.broadcast under backpressure:
+  --slow-clients N --slow-mode stall   connect with a tiny receive buffer and never read
+  --slow-clients N --slow-mode lag     read one message every --slow-delay seconds
+Dead clients (--dead-clients) drop their TCP connection without a close frame.
+A stalled socket only pushes back once the kernel buffers between it and the
+server are full (a few MB on loopback); --batch-size N sends the changes via
+POST /api/trips/status:batch, whose single large tripStatusBatchUpdated
+message per request gets there quickly.
+
+Requires the `websockets` package (also what uvicorn uses to serve /ws).
+
+Usage (from backend/):
+    python -m scripts.bench_websocket --clients 2000 --events 100 --rate 10
+    python -m scripts.bench_websocket --clients 1000 --slow-clients 5 --events 20000 --batch-size 500 --rate 0
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+
+try:
+    import websockets
+except ImportError:  # pragma: no cover - optional benchmark dependency
+    websockets = None
+
+from scripts.bench_endpoints import DEFAULT_RESULTS_DIR, _git_commit, _percentile
+from scripts.generate_fleet import DEMO_PASSWORD
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SLOW_RCVBUF = 4096
+
+
+class Tally:
+    """Shared counters for every simulated client."""
+
+    def __init__(self):
+        self.sent: List[Tuple[str, float]] = []  # (trip id, time issued) per status change, in send order
+        self.latencies: List[float] = []
+        self.event_messages = 0
+        self.messages = 0
+        self.connect_failures = 0
+        self.dropped = 0                       # healthy clients closed by the server / network
+        self.slow_closed = 0                   # slow consumers the server gave up on
+        self.first_event_at: Optional[float] = None
+        self.last_event_at: Optional[float] = None
+
+    def record(self, raw, now: float, seen: int) -> int:
+        """Match a client's message against the send log; returns the client's new position in it."""
+        self.messages += 1
+        msg = json.loads(raw)
+        if msg.get("event") == "tripStatusUpdated":
+            trip_ids = [msg["data"].get("trip_id")]
+        elif msg.get("event") == "tripStatusBatchUpdated":
+            trip_ids = [u.get("trip_id") for u in msg["data"].get("updates", [])]
+        else:
+            return seen
+        for trip_id in trip_ids:
+            # Broadcasts arrive in send order; skip changes whose request failed without one
+            while seen < len(self.sent) and self.sent[seen][0] != trip_id:
+                seen += 1
+            if seen == len(self.sent):
+                break
+            self.event_messages += 1
+            self.latencies.append(now - self.sent[seen][1])
+            seen += 1
+        self.first_event_at = self.first_event_at or now
+        self.last_event_at = now
+        return seen
+
+
+def _raise_fd_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = hard if hard != resource.RLIM_INFINITY else max(soft, needed)
+    if soft < target:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    if target < needed:
+        print(f"warning: open-file limit {target} is below the {needed} sockets needed", file=sys.stderr)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid: Optional[int]) -> Optional[float]:
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+# ========================
+#  CLIENTS
+# ========================
+async def _healthy_client(url: str, tally: Tally, ready: asyncio.Event, stop: asyncio.Event):
+    try:
+        ws = await websockets.connect(url, ping_interval=None, max_queue=None, open_timeout=30)
+    except Exception:
+        tally.connect_failures += 1
+        ready.set()
+        return
+    ready.set()
+    seen = 0
+    try:
+        async for raw in ws:
+            seen = tally.record(raw, time.perf_counter(), seen)
+    except Exception:
+        pass
+    finally:
+        if not stop.is_set():
+            tally.dropped += 1
+        await ws.close()
+
+
+async def _slow_client(url: str, host: str, port: int, mode: str, delay: float, tally: Tally, stop: asyncio.Event):
+    # Tiny receive buffer so the server's send buffer fills after a handful of events
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SLOW_RCVBUF)
+    sock.setblocking(False)
+    try:
+        await asyncio.get_running_loop().sock_connect(sock, (host, port))
+        ws = await websockets.connect(url, sock=sock, ping_interval=None, max_queue=1, open_timeout=30)
+    except Exception:
+        tally.connect_failures += 1
+        sock.close()
+        return
+    try:
+        if mode == "stall":
+            await stop.wait()
+        else:
+            while not stop.is_set():
+                await ws.recv()
+                await asyncio.sleep(delay)
+    except Exception:
+        if not stop.is_set():
+            tally.slow_closed += 1
+    finally:
+        ws.transport.abort()
+
+
+async def _dead_client(url: str, tally: Tally):
+    try:
+        ws = await websockets.connect(url, ping_interval=None, open_timeout=30)
+    except Exception:
+        tally.connect_failures += 1
+        return
+    ws.transport.abort()   # no close frame: the server finds out on its next send
+
+
+# ========================
+#  REST DRIVER
+# ========================
+async def _login(client: httpx.AsyncClient) -> dict:
+    r = await client.post("/auth/login", json={"email": "admin@fleetflow.com", "password": DEMO_PASSWORD})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['token']}"}
+
+
+async def _create_drafts(client: httpx.AsyncClient, headers: dict, n: int) -> List[str]:
+    vehicles = (await client.get("/api/vehicles", headers=headers)).json()
+    drivers = (await client.get("/api/drivers", headers=headers)).json()
+    today = datetime.date.today().isoformat()
+    vehicle = next((v for v in vehicles if v["status"] == "available"), None)
+    driver = next((d for d in drivers if d["duty_status"] == "on" and d["license_expiry_date"] > today), None)
+    if not vehicle or not driver:
+        raise RuntimeError("Need an available vehicle and an on-duty driver to create trips")
+    ids = []
+    for _ in range(n):
+        r = await client.post("/api/trips", headers=headers, json={
+            "vehicle_id": vehicle["id"], "driver_id": driver["id"],
+            "destination": "Fan-out Bench", "cargo_weight": 1,
+        })
+        r.raise_for_status()
+        ids.append(r.json()["id"])
+    return ids
+
+
+async def _fire_events(client, headers, trip_ids, events, batch_size, rate, timeout, tally: Tally) -> dict:
+    """
+    Issue `events` draft -> draft status changes (still broadcast) cycling over
+    `trip_ids`: one PATCH each, or batches of `batch_size` per request.
+    Requests are paced at `rate` per second (0 = back to back).
+    """
+    rest_latencies, timeouts, errors = [], 0, 0
+    interval = 1.0 / rate if rate > 0 else 0
+    started = time.perf_counter()
+    for k, first in enumerate(range(0, events, batch_size)):
+        wait = started + k * interval - time.perf_counter()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        chunk = [trip_ids[i % len(trip_ids)] for i in range(first, min(first + batch_size, events))]
+        sent = time.perf_counter()
+        tally.sent += [(trip_id, sent) for trip_id in chunk]
+        try:
+            if batch_size == 1:
+                r = await client.patch(f"/api/trips/{chunk[0]}/status", headers=headers,
+                                       json={"status": "draft"}, timeout=timeout)
+            else:
+                r = await client.post("/api/trips/status:batch", headers=headers, timeout=timeout,
+                                      json={"updates": [{"trip_id": t, "status": "draft"} for t in chunk]})
+            if r.status_code >= 400:
+                errors += 1
+        except httpx.TimeoutException:
+            timeouts += 1
+        rest_latencies.append(time.perf_counter() - sent)
+    return {"rest_latencies": sorted(rest_latencies), "timeouts": timeouts, "errors": errors,
+            "elapsed": time.perf_counter() - started}
+
+
+# ========================
+#  SERVER
+# ========================
+def _start_server(port: int, workdir: str, workers: int = 1, **env_overrides: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'ws_bench.db')}",
+        "INVALIDATION_FEED_PATH": os.path.join(workdir, "invalidation.log"),
+        "RATE_LIMIT_ENABLED": "false",
+        **env_overrides,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--backlog", "4096", "--workers", str(workers)],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient, proc: Optional[subprocess.Popen]):
+    for _ in range(300):
+        if proc and proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not become ready")
+
+
+async def run(args) -> dict:
+    if websockets is None:
+        raise SystemExit("The websockets package is required: pip install websockets")
+    total_sockets = args.clients + args.slow_clients + args.dead_clients
+    _raise_fd_limit(total_sockets * 2 + 256)   # client + server ends when both run locally
+
+    workdir, proc = None, None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        workdir = tempfile.mkdtemp(prefix="fleetflow-ws-")
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        proc = _start_server(port, workdir)
+    host, port = httpx.URL(base_url).host, httpx.URL(base_url).port or 80
+    ws_url = base_url.replace("http", "ws", 1) + "/ws"
+    server_pid = proc.pid if proc else args.server_pid
+
+    tally = Tally()
+    stop = asyncio.Event()
+    tasks: List[asyncio.Task] = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            await _wait_ready(client, proc)
+            if proc:
+                await client.post("/api/seed")
+            headers = await _login(client)
+            trip_ids = await _create_drafts(client, headers, min(args.events, args.trips))
+            rss_idle = _rss_mb(server_pid)
+
+            # Ramp up healthy clients in batches; each connect also broadcasts dashboardUpdate to everyone
+            connect_started = time.perf_counter()
+            for offset in range(0, args.clients, args.connect_batch):
+                batch = min(args.connect_batch, args.clients - offset)
+                ready = [asyncio.Event() for _ in range(batch)]
+                tasks += [asyncio.create_task(_healthy_client(ws_url, tally, r, stop)) for r in ready]
+                await asyncio.gather(*(r.wait() for r in ready))
+            for _ in range(args.dead_clients):
+                await _dead_client(ws_url, tally)
+            tasks += [
+                asyncio.create_task(_slow_client(ws_url, host, port, args.slow_mode, args.slow_delay, tally, stop))
+                for _ in range(args.slow_clients)
+            ]
+            connect_elapsed = time.perf_counter() - connect_started
+            await asyncio.sleep(args.settle)
+            rss_connected = _rss_mb(server_pid)
+            messages_before = tally.messages
+
+            fired = await _fire_events(client, headers, trip_ids, args.events, args.batch_size,
+                                       args.rate, args.request_timeout, tally)
+
+            # Wait for stragglers
+            connected = args.clients - tally.connect_failures
+            expected = args.events * max(connected, 0)
+            deadline = time.perf_counter() + args.drain_timeout
+            while tally.event_messages < expected and time.perf_counter() < deadline:
+                await asyncio.sleep(0.05)
+            rss_after = _rss_mb(server_pid)
+    finally:
+        stop.set()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if proc:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    lat = sorted(tally.latencies)
+    ms = lambda v: round(v * 1000, 2)
+    window = (tally.last_event_at - tally.first_event_at) if tally.event_messages > 1 else None
+    per_conn_kb = (
+        round((rss_connected - rss_idle) * 1024 / total_sockets, 1)
+        if rss_idle is not None and rss_connected is not None and total_sockets else None
+    )
+    return {
+        "meta": {
+            "started_at": datetime.datetime.utcnow().isoformat() + "Z",
+            "git_commit": _git_commit(),
+            "clients": args.clients,
+            "slow_clients": args.slow_clients,
+            "slow_mode": args.slow_mode if args.slow_clients else None,
+            "dead_clients": args.dead_clients,
+            "events": args.events,
+            "batch_size": args.batch_size,
+            "rate": args.rate,
+        },
+        "connect": {
+            "elapsed_s": round(connect_elapsed, 2),
+            "connects_per_sec": round(total_sockets / connect_elapsed, 1) if connect_elapsed else None,
+            "failures": tally.connect_failures,
+            "messages_during_ramp": messages_before,
+        },
+        "delivery": {
+            "expected": expected,
+            "delivered": tally.event_messages,
+            "missing": max(expected - tally.event_messages, 0),
+            "latency_ms": {
+                "p50": ms(_percentile(lat, 50)), "p95": ms(_percentile(lat, 95)),
+                "p99": ms(_percentile(lat, 99)), "max": ms(lat[-1]) if lat else 0.0,
+                "mean": ms(statistics.fmean(lat)) if lat else 0.0,
+            },
+            "messages_per_sec": round((tally.messages - messages_before) / fired["elapsed"], 1) if fired["elapsed"] else None,
+            "event_deliveries_per_sec": round(tally.event_messages / window, 1) if window else None,
+        },
+        "rest": {
+            "requests": len(fired["rest_latencies"]),
+            "timeouts": fired["timeouts"],
+            "errors": fired["errors"],
+            "latency_ms": {
+                "p50": ms(_percentile(fired["rest_latencies"], 50)),
+                "p95": ms(_percentile(fired["rest_latencies"], 95)),
+                "p99": ms(_percentile(fired["rest_latencies"], 99)),
+            },
+        },
+        "sockets": {
+            "dropped_healthy": tally.dropped,
+            "slow_closed_by_server": tally.slow_closed,
+        },
+        "server_memory": {
+            "rss_idle_mb": rss_idle,
+            "rss_connected_mb": rss_connected,
+            "rss_after_events_mb": rss_after,
+            "per_connection_kb": per_conn_kb,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000, help="Healthy clients that read every message")
+    parser.add_argument("--slow-clients", type=int, default=0)
+    parser.add_argument("--slow-mode", choices=["stall", "lag"], default="stall")
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="Seconds between reads in lag mode")
+    parser.add_argument("--dead-clients", type=int, default=0)
+    parser.add_argument("--events", type=int, default=50, help="Trip status changes to fire")
+    parser.add_argument("--trips", type=int, default=200, help="Draft trips to create and cycle through")
+    parser.add_argument("--batch-size", type=int, default=1, help="Status changes per request (>1 uses status:batch)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests per second (0 = back to back)")
+    parser.add_argument("--connect-batch", type=int, default=200)
+    parser.add_argument("--settle", type=float, default=1.0, help="Seconds to wait after connecting")
+    parser.add_argument("--request-timeout", type=float, default=10.0)
+    parser.add_argument("--drain-timeout", type=float, default=15.0, help="Max seconds to wait for late deliveries")
+    parser.add_argument("--url", help="Target a running server instead of starting one (it must be seeded)")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, for memory readings")
+    parser.add_argument("--output", help="Result file (default: bench_results/websocket-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    d = result["delivery"]
+    print(
+        f"{args.clients} clients: delivered {d['delivered']}/{d['expected']}  "
+        f"p50 {d['latency_ms']['p50']}ms  p95 {d['latency_ms']['p95']}ms  p99 {d['latency_ms']['p99']}ms  "
+        f"{d['messages_per_sec']} msg/s  REST timeouts {result['rest']['timeouts']}  "
+        f"{result['server_memory']['per_connection_kb']} KB/conn",
+        file=sys.stderr,
+    )
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"websocket-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Synthetic fleet data generator for load and scale testing.
+
+Builds a realistic, reproducible fleet (vehicles, drivers, trips, fuel and
+maintenance logs) with consistent statuses: every on_trip vehicle has exactly
+one sent trip with an on_trip driver, in_shop vehicles have a recent
+maintenance log, done trips carry fuel logs. Rows are written with
+executemany in chunked transactions.
+
+Usage (from backend/):
+    python -m scripts.generate_fleet --preset large --database-url sqlite:///./fleet_large.db --reset
+    python -m scripts.generate_fleet --vehicles 50000 --drivers 100000 --trips 5000000 --seed 7
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+import uuid
+from sqlalchemy import event, select
+
+PRESETS = {
+    "small": {"vehicles": 1_000, "drivers": 2_000, "trips": 20_000},
+    "medium": {"vehicles": 10_000, "drivers": 20_000, "trips": 500_000},
+    "large": {"vehicles": 50_000, "drivers": 100_000, "trips": 5_000_000},
+}
+
+# (type, min kg, max kg, share of fleet)
+VEHICLE_TYPES = [
+    ("Cargo Bike", 60, 150, 0.04),
+    ("Cargo Van", 800, 1500, 0.18),
+    ("Sprinter Van", 1500, 2500, 0.18),
+    ("Delivery Van", 2500, 4000, 0.18),
+    ("Refrigerator Van", 3000, 6000, 0.10),
+    ("Flatbed Truck", 8000, 12000, 0.12),
+    ("Semi-Truck", 12000, 20000, 0.14),
+    ("Heavy Duty Truck", 20000, 30000, 0.06),
+]
+VEHICLE_STATUS_WEIGHTS = {"available": 0.55, "on_trip": 0.25, "in_shop": 0.12, "retired": 0.08}
+DRIVER_DUTY_WEIGHTS = {"on": 0.65, "off": 0.28, "suspended": 0.07}
+# Non-sent trips; sent trips are derived from on_trip vehicles
+TRIP_STATUS_WEIGHTS = {"done": 0.85, "draft": 0.10, "canceled": 0.05}
+
+CITIES = [
+    "Chicago, IL", "Houston, TX", "Milwaukee, WI", "Detroit, MI", "Dallas, TX", "Denver, CO",
+    "New York, NY", "Boston, MA", "Los Angeles, CA", "San Jose, CA", "Phoenix, AZ", "Las Vegas, NV",
+    "Seattle, WA", "Portland, OR", "Atlanta, GA", "Miami, FL", "Minneapolis, MN", "St. Louis, MO",
+    "Kansas City, MO", "Nashville, TN", "Charlotte, NC", "Philadelphia, PA", "Pittsburgh, PA",
+    "Salt Lake City, UT", "Albuquerque, NM", "San Antonio, TX", "Columbus, OH", "Indianapolis, IN",
+]
+FIRST_NAMES = [
+    "Robert", "Priya", "Alice", "Marcus", "James", "Sarah", "Cody", "Leo", "Mariam", "Ana", "Wei",
+    "Olga", "Tunde", "Diego", "Fatima", "Noah", "Emma", "Kenji", "Aisha", "Lucas", "Ivan", "Sofia",
+]
+LAST_NAMES = [
+    "Fox", "Sharma", "Johnson", "Rivera", "Okonkwo", "Nguyen", "Fisher", "Tran", "Yusuf", "Silva",
+    "Chen", "Petrova", "Adeyemi", "Garcia", "Khan", "Smith", "Brown", "Tanaka", "Bello", "Martin",
+]
+MAINTENANCE_JOBS = [
+    ("Routine oil change and filter replacement", 150, 450),
+    ("Tyre rotation and wheel alignment", 200, 700),
+    ("Brake pad replacement", 300, 1200),
+    ("Hydraulic brake system repair", 1500, 4000),
+    ("Refrigeration compressor overhaul", 2500, 6000),
+    ("Transmission service", 800, 3500),
+    ("Battery replacement", 150, 600),
+    ("Annual safety inspection", 100, 300),
+    ("Suspension repair", 600, 2500),
+    ("Engine diagnostics and tune-up", 250, 900),
+]
+DEMO_ACCOUNTS = [
+    ("Admin Flow", "admin@fleetflow.com", "Fleet Manager"),
+    ("Dispatcher Dan", "dispatcher@fleetflow.com", "Dispatcher"),
+    ("Safety Sam", "safety@fleetflow.com", "Safety Officer"),
+    ("Finance Fay", "finance@fleetflow.com", "Financial Analyst"),
+]
+DEMO_PASSWORD = "admin123"
+
+
+def _weighted(rng: random.Random, weights: dict, k: int) -> list:
+    return rng.choices(list(weights), weights=list(weights.values()), k=k)
+
+
+class FleetGenerator:
+    def __init__(self, engine, args):
+        self.engine = engine
+        self.rng = random.Random(args.seed)
+        self.args = args
+        self.now = datetime.datetime.utcnow().replace(microsecond=0)
+        self.today = self.now.date()
+        self.counts = {}
+        self.vehicles = []   # (id, max_weight)
+        self.on_trip_vehicles = []
+        self.in_shop_vehicles = []
+        self.drivers = []    # ids of drivers who can take trips
+        self.on_trip_drivers = []
+
+    # ---- helpers ----
+    def _insert(self, table, rows):
+        """One executemany in its own transaction per chunk."""
+        if rows:
+            with self.engine.begin() as conn:
+                conn.execute(table.insert(), rows)
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def _uid(self) -> str:
+        # Seeded UUID4s keep whole datasets reproducible, ids included
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _past(self, max_days: float) -> datetime.datetime:
+        return self.now - datetime.timedelta(seconds=self.rng.random() * max_days * 86400)
+
+    # ---- entities ----
+    def generate_users(self, models):
+        from auth import hash_password
+        with self.engine.connect() as conn:
+            existing = {row[0] for row in conn.execute(select(models.User.email))}
+        missing = [a for a in DEMO_ACCOUNTS if a[1] not in existing]
+        if not missing:
+            return
+        hashed = hash_password(DEMO_PASSWORD)
+        self._insert(models.User.__table__, [
+            {"id": self._uid(), "name": name, "email": email, "hashed_password": hashed,
+             "role": role, "is_active": True, "created_at": self.now}
+            for name, email, role in missing
+        ])
+
+    def generate_vehicles(self, models, n: int, chunk: int):
+        rng = self.rng
+        types = rng.choices(VEHICLE_TYPES, weights=[t[3] for t in VEHICLE_TYPES], k=n)
+        statuses = _weighted(rng, VEHICLE_STATUS_WEIGHTS, n)
+        rows = []
+        for i in range(n):
+            vtype, lo, hi, _ = types[i]
+            status = statuses[i]
+            vid = self._uid()
+            max_weight = float(round(rng.uniform(lo, hi), -1) or lo)
+            mileage = rng.uniform(200_000, 450_000) if status == "retired" else rng.uniform(1_000, 250_000)
+            rows.append({
+                "id": vid,
+                "plate_number": f"{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}{i:07d}",
+                "vehicle_type": vtype,
+                "max_weight": max_weight,
+                "mileage": round(mileage, 1),
+                "status": status,
+                "created_at": self._past(self.args.days * 2),
+            })
+            if status != "retired":
+                self.vehicles.append((vid, max_weight))
+            if status == "on_trip":
+                self.on_trip_vehicles.append((vid, max_weight))
+            elif status == "in_shop":
+                self.in_shop_vehicles.append(vid)
+            if len(rows) >= chunk:
+                self._insert(models.Vehicle.__table__, rows)
+                rows = []
+        self._insert(models.Vehicle.__table__, rows)
+
+    def generate_drivers(self, models, n: int, chunk: int):
+        rng = self.rng
+        duty = _weighted(rng, DRIVER_DUTY_WEIGHTS, n)
+        # One on_trip driver per on_trip vehicle, taken from the on-duty drivers
+        on_trip_needed = len(self.on_trip_vehicles)
+        rows = []
+        for i in range(n):
+            status = duty[i]
+            if status == "on" and on_trip_needed > 0:
+                status = "on_trip"
+                on_trip_needed -= 1
+            roll = rng.random()
+            if roll < 0.04:
+                expiry = self.today - datetime.timedelta(days=rng.randint(1, 730))
+            elif roll < 0.07:
+                expiry = self.today + datetime.timedelta(days=rng.randint(0, 30))
+            else:
+                expiry = self.today + datetime.timedelta(days=rng.randint(31, 5 * 365))
+            mean = 45 if status == "suspended" else 84
+            did = self._uid()
+            rows.append({
+                "id": did,
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "license_number": f"LIC-{i:08d}",
+                "license_expiry_date": expiry,
+                "safety_score": round(min(100.0, max(10.0, rng.gauss(mean, 9))), 1),
+                "duty_status": status,
+                "avatar_url": f"https://i.pravatar.cc/150?u={i % 70}",
+                "created_at": self._past(self.args.days * 2),
+            })
+            if status == "on_trip":
+                self.on_trip_drivers.append(did)
+            elif status != "suspended":
+                self.drivers.append(did)
+            if len(rows) >= chunk:
+                self._insert(models.Driver.__table__, rows)
+                rows = []
+        self._insert(models.Driver.__table__, rows)
+
+        # Not enough on-duty drivers: the surplus on_trip vehicles become available
+        surplus = self.on_trip_vehicles[len(self.on_trip_drivers):]
+        if surplus:
+            table = models.Vehicle.__table__
+            surplus_ids = [v[0] for v in surplus]
+            with self.engine.begin() as conn:
+                for i in range(0, len(surplus_ids), 500):
+                    conn.execute(
+                        table.update().where(table.c.id.in_(surplus_ids[i:i + 500])).values(status="available")
+                    )
+            del self.on_trip_vehicles[len(self.on_trip_drivers):]
+
+    def generate_trips(self, models, n: int, chunk: int):
+        rng = self.rng
+        trip_table, fuel_table = models.Trip.__table__, models.FuelLog.__table__
+        trips, fuel = [], []
+
+        def flush():
+            self._insert(trip_table, trips)
+            self._insert(fuel_table, fuel)
+            trips.clear()
+            fuel.clear()
+
+        def route():
+            a, b = rng.sample(CITIES, 2)
+            return f"{a} → {b}"
+
+        # Active trips first: exactly one sent trip per on_trip vehicle
+        sent = min(len(self.on_trip_vehicles), n)
+        for (vid, max_weight), did in zip(self.on_trip_vehicles[:sent], self.on_trip_drivers):
+            start = self.now - datetime.timedelta(minutes=rng.randint(10, 36 * 60))
+            trips.append({
+                "id": self._uid(), "vehicle_id": vid, "driver_id": did, "destination": route(),
+                "cargo_weight": round(max_weight * rng.uniform(0.3, 1.0), 1),
+                "start_time": start, "end_time": None, "status": "sent",
+                "created_at": start - datetime.timedelta(hours=rng.uniform(1, 24)),
+            })
+
+        statuses = _weighted(rng, TRIP_STATUS_WEIGHTS, n - sent)
+        for status in statuses:
+            vid, max_weight = rng.choice(self.vehicles)
+            did = rng.choice(self.drivers)
+            cargo = round(max_weight * rng.uniform(0.2, 1.0), 1)
+            start = end = None
+            if status == "draft":
+                created = self._past(7)
+            else:
+                created = self._past(self.args.days)
+                if status == "done":
+                    start = created + datetime.timedelta(hours=rng.uniform(0.5, 48))
+                    end = start + datetime.timedelta(hours=rng.uniform(1, 72))
+            tid = self._uid()
+            trips.append({
+                "id": tid, "vehicle_id": vid, "driver_id": did, "destination": route(),
+                "cargo_weight": cargo, "start_time": start, "end_time": end, "status": status,
+                "created_at": created,
+            })
+            if status == "done" and rng.random() < self.args.fuel_ratio:
+                # Bigger vehicles burn more; ~$1.45-1.95 per liter
+                liters = round(rng.uniform(15, 60) * (1 + max_weight / 8000), 1)
+                fuel.append({
+                    "id": self._uid(), "trip_id": tid, "fuel_used": liters,
+                    "fuel_cost": round(liters * rng.uniform(1.45, 1.95), 2),
+                    "created_at": min(end, self.now),
+                })
+            if len(trips) >= chunk:
+                flush()
+        flush()
+
+    def generate_maintenance(self, models, chunk: int):
+        rng = self.rng
+        table = models.MaintenanceLog.__table__
+        rows = []
+
+        def log(vid, created):
+            desc, lo, hi = rng.choice(MAINTENANCE_JOBS)
+            rows.append({
+                "id": self._uid(), "vehicle_id": vid, "description": desc,
+                "cost": round(rng.uniform(lo, hi), 2), "created_at": created,
+            })
+
+        # Every in_shop vehicle has a recent open job
+        for vid in self.in_shop_vehicles:
+            log(vid, self._past(5))
+        # Historical jobs spread across the time window
+        history = int(len(self.vehicles) * self.args.maintenance_per_vehicle)
+        for _ in range(history):
+            log(rng.choice(self.vehicles)[0], self._past(self.args.days))
+            if len(rows) >= chunk:
+                self._insert(table, rows)
+                rows = []
+        self._insert(table, rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="Size preset; explicit counts override it")
+    parser.add_argument("--vehicles", type=int)
+    parser.add_argument("--drivers", type=int)
+    parser.add_argument("--trips", type=int)
+    parser.add_argument("--maintenance-per-vehicle", type=float, default=3.0)
+    parser.add_argument("--fuel-ratio", type=float, default=0.9, help="Share of done trips with a fuel log")
+    parser.add_argument("--days", type=int, default=365, help="History window for created/start/end times")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL / .env")
+    parser.add_argument("--reset", action="store_true", help="Delete existing fleet data first (users are kept)")
+    args = parser.parse_args(argv)
+
+    sizes = dict(PRESETS[args.preset or "small"])
+    for key in ("vehicles", "drivers", "trips"):
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    # Imported late so --database-url takes effect
+    from database import engine, Base, add_missing_columns
+    import models
+    from availability_index import publish_vehicle_changes
+    from search import ensure_search_indexes, search_sync_suspended
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    ensure_search_indexes(engine)
+
+    if engine.dialect.name == "sqlite":
+        # Durability is irrelevant for generated data; WAL + no fsync per chunk
+        event.listen(engine, "connect", lambda dbapi_conn, _: dbapi_conn.execute("PRAGMA synchronous=OFF"))
+        engine.dispose()
+        with engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+    generator = FleetGenerator(engine, args)
+    started = time.perf_counter()
+
+    with search_sync_suspended(engine):
+        if args.reset:
+            with engine.begin() as conn:
+                for model in (models.TelemetryPing, models.FuelLog, models.MaintenanceLog, models.Trip,
+                              models.Driver, models.Vehicle):
+                    conn.execute(model.__table__.delete())
+            # Running workers cache vehicle ids (availability index, telemetry): tell them
+            publish_vehicle_changes()
+
+        steps = [
+            ("users", lambda: generator.generate_users(models)),
+            ("vehicles", lambda: generator.generate_vehicles(models, sizes["vehicles"], args.chunk_size)),
+            ("drivers", lambda: generator.generate_drivers(models, sizes["drivers"], args.chunk_size)),
+            ("trips + fuel logs", lambda: generator.generate_trips(models, sizes["trips"], args.chunk_size)),
+            ("maintenance logs", lambda: generator.generate_maintenance(models, args.chunk_size)),
+        ]
+        for label, step in steps:
+            t = time.perf_counter()
+            step()
+            print(f"  {label:<18} {time.perf_counter() - t:8.1f}s", file=sys.stderr)
+
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+    elapsed = time.perf_counter() - started
+    total = sum(generator.counts.values())
+    print(f"Generated {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)", file=sys.stderr)
+    for table, count in generator.counts.items():
+        print(f"  {table:<18} {count:>12,}", file=sys.stderr)
+    return generator.counts
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Concurrency stress test for trip reservations (optimistic versioning).
+
+Starts the API under uvicorn with several workers against a throwaway seeded
+database, then runs rounds of a double-booking race: --threads drafts share
+one vehicle (each with its own driver), and every thread sends its draft
+(PATCH /api/trips/{id}/status -> sent) at the same instant. Exactly one
+send per round may succeed; the others must get 409. After each round the
+trips table is checked: the vehicle is on_trip and carries exactly one sent
+trip of the round. The winner is then completed and the losers canceled, freeing the
+vehicle for the next round.
+
+Exits non-zero if any round double-booked the vehicle (or booked nothing).
+
+Usage (from backend/):
+    python -m scripts.stress_reservations --threads 32 --rounds 20 --workers 4
+"""
+import argparse
+import datetime
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import httpx
+
+from scripts.bench_websocket import BACKEND_DIR, _free_port, _start_server
+
+PASSWORD = "admin123"
+
+
+def _wait_ready(client: httpx.Client, proc):
+    for _ in range(300):
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if client.get("/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("server did not become ready")
+
+
+def _login(client: httpx.Client, email: str) -> dict:
+    r = client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['token']}"}
+
+
+def _setup(client: httpx.Client, headers: dict, threads: int):
+    """One available vehicle and `threads` fresh on-duty drivers."""
+    vehicle = next(v for v in client.get("/api/vehicles", headers=headers).json() if v["status"] == "available")
+    expiry = (datetime.date.today() + datetime.timedelta(days=365)).isoformat()
+    stamp = int(time.time())
+    drivers = []
+    for i in range(threads):
+        r = client.post("/api/drivers", headers=headers, json={
+            "name": f"Stress Driver {i}", "license_number": f"STRESS-{stamp}-{i}", "license_expiry_date": expiry,
+        })
+        r.raise_for_status()
+        drivers.append(r.json()["id"])
+    return vehicle, drivers
+
+
+def _round(base_url: str, headers: dict, client: httpx.Client, vehicle: dict, drivers: List[str]) -> dict:
+    drafts = []
+    for driver_id in drivers:
+        r = client.post("/api/trips", headers=headers, json={
+            "vehicle_id": vehicle["id"], "driver_id": driver_id, "destination": "Reservation Stress", "cargo_weight": 1,
+        })
+        r.raise_for_status()
+        drafts.append(r.json()["id"])
+
+    barrier = threading.Barrier(len(drafts))
+
+    def send(trip_id: str):
+        with httpx.Client(base_url=base_url, timeout=60) as c:
+            barrier.wait()
+            started = time.perf_counter()
+            r = c.patch(f"/api/trips/{trip_id}/status", headers=headers, json={"status": "sent"})
+            return trip_id, r.status_code, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=len(drafts)) as pool:
+        outcomes = list(pool.map(send, drafts))
+
+    trips = {t["id"]: t for t in client.get("/api/trips", headers=headers).json()}
+    sent = [trip_id for trip_id in drafts if trips[trip_id]["status"] == "sent"]
+    status = next(v for v in client.get("/api/vehicles", headers=headers).json() if v["id"] == vehicle["id"])["status"]
+
+    # Reset: finish the winner, cancel the rest
+    for trip_id, code, _ in outcomes:
+        client.patch(f"/api/trips/{trip_id}/status", headers=headers,
+                     json={"status": "done" if trips[trip_id]["status"] == "sent" else "canceled"})
+    return {
+        "codes": Counter(code for _, code, _ in outcomes),
+        "sent_trips": len(sent),
+        "vehicle_status": status,
+        "latencies": [elapsed for _, _, elapsed in outcomes],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent senders per round")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker processes")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="fleetflow-reserve-")
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    # Create the schema up front: workers racing create_all on an empty database trip over each other
+    subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND_DIR, check=True, env={
+        **os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'ws_bench.db')}",
+        "INVALIDATION_FEED_PATH": os.path.join(workdir, "invalidation.log"),
+    })
+    proc = _start_server(port, workdir, workers=args.workers)
+    codes: Counter = Counter()
+    violations = 0
+    latencies: List[float] = []
+    try:
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            _wait_ready(client, proc)
+            client.post("/api/seed")
+            manager, headers = (_login(client, email) for email in ("admin@fleetflow.com", "dispatcher@fleetflow.com"))
+            vehicle, drivers = _setup(client, manager, args.threads)
+
+            for n in range(args.rounds):
+                result = _round(base_url, headers, client, vehicle, drivers)
+                codes.update(result["codes"])
+                latencies.extend(result["latencies"])
+                ok = result["codes"][200] == 1 and result["sent_trips"] == 1 and result["vehicle_status"] == "on_trip"
+                violations += not ok
+                print(f"round {n + 1:>3}: {dict(result['codes'])}  drafts sent {result['sent_trips']}  "
+                      f"vehicle {result['vehicle_status']}{'' if ok else '  <-- VIOLATION'}", file=sys.stderr)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    latencies.sort()
+    print(
+        f"{args.rounds} rounds x {args.threads} threads, {args.workers} workers: {dict(codes)}  "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.1f}ms  max {latencies[-1] * 1000:.1f}ms  violations {violations}",
+        file=sys.stderr,
+    )
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Full-text search indexes.
+
+SQLite: one FTS5 table per searchable column, kept in sync by AFTER
+INSERT/UPDATE/DELETE triggers on the source table. The source tables are
+keyed by string ids and their implicit rowid may change on VACUUM, so FTS
+rows are keyed by a side table `<table>_search_ids` that gives every id a
+stable INTEGER PRIMARY KEY.
+Postgres: a GIN expression index on to_tsvector(...), which the database
+maintains on write by itself.
+
+Results from every target are merged in a single ranked, paginated query.
+"""
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Sequence
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+@dataclass(frozen=True)
+class SearchTarget:
+    kind: str       # result type exposed by the API
+    table: str      # source table
+    column: str     # indexed text column
+
+
+SEARCH_TARGETS = {
+    "trips": SearchTarget("trips", "trips", "destination"),
+    "maintenance": SearchTarget("maintenance", "maintenance_logs", "description"),
+    "drivers": SearchTarget("drivers", "drivers", "name"),
+    "vehicles": SearchTarget("vehicles", "vehicles", "plate_number"),
+}
+
+# Postgres text-search configuration: "simple" keeps place names and plates intact
+PG_TS_CONFIG = "simple"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts_table(target: SearchTarget) -> str:
+    return f"{target.table}_fts"
+
+
+def _ids_table(target: SearchTarget) -> str:
+    return f"{target.table}_search_ids"
+
+
+def _sqlite_ddl(target: SearchTarget) -> List[str]:
+    fts, ids, src, col = _fts_table(target), _ids_table(target), target.table, target.column
+    key = f"(SELECT search_rowid FROM {ids} WHERE id = {{row}}.id)"
+    return [
+        f"CREATE TABLE IF NOT EXISTS {ids} (search_rowid INTEGER PRIMARY KEY, id VARCHAR NOT NULL UNIQUE)",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({col}, prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {src} BEGIN "
+        f"INSERT OR IGNORE INTO {ids}(id) VALUES (new.id); "
+        f"INSERT INTO {fts}(rowid, {col}) VALUES ({key.format(row='new')}, new.{col}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {src} BEGIN "
+        f"DELETE FROM {fts} WHERE rowid = {key.format(row='old')}; "
+        f"DELETE FROM {ids} WHERE id = old.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col} ON {src} BEGIN "
+        f"UPDATE {fts} SET {col} = new.{col} WHERE rowid = {key.format(row='new')}; END",
+    ]
+
+
+def _sqlite_rebuild(target: SearchTarget) -> List[str]:
+    fts, ids, src, col = _fts_table(target), _ids_table(target), target.table, target.column
+    return [
+        f"DELETE FROM {ids} WHERE id NOT IN (SELECT id FROM {src})",
+        f"INSERT OR IGNORE INTO {ids}(id) SELECT id FROM {src}",
+        f"DELETE FROM {fts}",
+        f"INSERT INTO {fts}(rowid, {col}) SELECT {ids}.search_rowid, {src}.{col} "
+        f"FROM {ids} JOIN {src} ON {src}.id = {ids}.id",
+    ]
+
+
+def _drop_rowid_keyed_fts(conn, target: SearchTarget) -> None:
+    """Drop an FTS table from before the id side table (external content keyed by the implicit rowid)."""
+    fts = _fts_table(target)
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts},
+    ).scalar()
+    if sql and "content_rowid" in sql:
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{suffix}"))
+        conn.execute(text(f"DROP TABLE {fts}"))
+
+
+def _pg_ddl(target: SearchTarget) -> List[str]:
+    return [
+        f"CREATE INDEX IF NOT EXISTS ix_{target.table}_{target.column}_fts ON {target.table} "
+        f"USING GIN (to_tsvector('{PG_TS_CONFIG}', coalesce({target.column}, '')))",
+    ]
+
+
+def ensure_search_indexes(engine: Engine) -> None:
+    """Create the search indexes (idempotent). Backfills new SQLite FTS tables."""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        for target in SEARCH_TARGETS.values():
+            if dialect == "sqlite":
+                _drop_rowid_keyed_fts(conn, target)
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": _fts_table(target)},
+                ).first()
+                for ddl in _sqlite_ddl(target):
+                    conn.execute(text(ddl))
+                if not exists:
+                    for sql in _sqlite_rebuild(target):
+                        conn.execute(text(sql))
+            elif dialect == "postgresql":
+                for ddl in _pg_ddl(target):
+                    conn.execute(text(ddl))
+
+
+def rebuild_search_indexes(engine: Engine) -> None:
+    """Rebuild SQLite FTS tables from their source tables (after raw bulk loads)."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for target in SEARCH_TARGETS.values():
+            for sql in _sqlite_rebuild(target):
+                conn.execute(text(sql))
+
+
+@contextmanager
+def search_sync_suspended(engine: Engine):
+    """
+    Drop the SQLite sync triggers for the duration of a bulk load, then
+    recreate them and rebuild the FTS tables once. Much faster than firing
+    a trigger per row when generating millions of rows.
+    """
+    if engine.dialect.name != "sqlite":
+        yield
+        return
+    with engine.begin() as conn:
+        for target in SEARCH_TARGETS.values():
+            fts = _fts_table(target)
+            for suffix in ("ai", "ad", "au"):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{suffix}"))
+    try:
+        yield
+    finally:
+        ensure_search_indexes(engine)
+        rebuild_search_indexes(engine)
+
+
+def query_tokens(q: str) -> List[str]:
+    """Split free text into search tokens; punctuation such as '→' is dropped."""
+    return [t.lower() for t in _TOKEN_RE.findall(q)][:16]
+
+
+def _sqlite_select(target: SearchTarget, extra_where: str) -> str:
+    fts, ids, src, col = _fts_table(target), _ids_table(target), target.table, target.column
+    return (
+        f"SELECT '{target.kind}' AS kind, {src}.id AS id, {src}.{col} AS text, -bm25({fts}) AS score "
+        f"FROM {fts} JOIN {ids} ON {ids}.search_rowid = {fts}.rowid JOIN {src} ON {src}.id = {ids}.id "
+        f"WHERE {fts} MATCH :match{extra_where}"
+    )
+
+
+def _pg_select(target: SearchTarget, extra_where: str) -> str:
+    src = target.table
+    vector = f"to_tsvector('{PG_TS_CONFIG}', coalesce({src}.{target.column}, ''))"
+    return (
+        f"SELECT '{target.kind}' AS kind, {src}.id AS id, {src}.{target.column} AS text, "
+        f"ts_rank({vector}, to_tsquery('{PG_TS_CONFIG}', :match)) AS score "
+        f"FROM {src} "
+        f"WHERE {vector} @@ to_tsquery('{PG_TS_CONFIG}', :match){extra_where}"
+    )
+
+
+def search(
+    db: Session,
+    q: str,
+    kinds: Sequence[str],
+    limit: int = 20,
+    offset: int = 0,
+    extra_where: dict = None,
+) -> List[dict]:
+    """
+    Ranked prefix search across `kinds`. Every query token must match (AND).
+    `extra_where` maps a kind to an additional SQL condition on the source
+    table, used to carry row policies into the search.
+    """
+    tokens = query_tokens(q)
+    if not tokens or not kinds:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match = " ".join(f'"{t}"*' for t in tokens)
+        build = _sqlite_select
+    elif dialect == "postgresql":
+        match = " & ".join(f"{t}:*" for t in tokens)
+        build = _pg_select
+    else:
+        return []
+
+    extra_where = extra_where or {}
+    selects = []
+    for kind in kinds:
+        where = extra_where.get(kind)
+        selects.append(build(SEARCH_TARGETS[kind], f" AND ({where})" if where else ""))
+
+    sql = (
+        "SELECT kind, id, text, score FROM ("
+        + " UNION ALL ".join(selects)
+        + ") AS hits ORDER BY score DESC, id LIMIT :limit OFFSET :offset"
+    )
+    rows = db.execute(text(sql), {"match": match, "limit": limit, "offset": offset})
+    return [
+        {"type": r.kind, "id": r.id, "text": r.text, "score": round(float(r.score), 4)}
+        for r in rows
+    ]
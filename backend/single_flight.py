@@ -0,0 +1,48 @@
+"""
+Single-flight execution of identical concurrent computations.
+
+`await reports_flight.do(key, fn, *args)` runs `fn(*args)` in the
+threadpool unless a call with the same key is already running in this
+worker, in which case it waits for that one and shares its result (or its
+exception). The computation runs as its own task, so a waiter that gives up
+(client disconnect) does not cancel it for the others. Keys must include
+everything the result depends on: route, parameters and the data versions
+of the tables read (see data_versions.py). Finished results are not kept
+here; report_cache.py does that.
+"""
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+from fastapi.concurrency import run_in_threadpool
+
+import metrics
+
+SINGLE_FLIGHT_CALLS = metrics.registry.counter(
+    "fleetflow_single_flight_calls", "Coalesced computations by outcome.", ("name", "outcome"))
+
+
+class SingleFlight:
+    """Per-worker registry of running computations by key."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._running: Dict[Hashable, asyncio.Task] = {}
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        self._running.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark it retrieved even when every waiter gave up
+
+    async def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        task = self._running.get(key)
+        if task is None:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "computed").inc()
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+            self._running[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        else:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "shared").inc()
+        return await asyncio.shield(task)
+
+
+# Global singleton for report generation
+reports_flight = SingleFlight("reports")
@@ -0,0 +1,157 @@
+"""
+Slow-query log.
+
+Statements slower than SLOW_QUERY_MS are written as JSON lines to a rotating
+file together with the shape of their bound parameters (types and counts,
+never values), the route that issued them and, for SELECTs, the plan from
+EXPLAIN (PostgreSQL) / EXPLAIN QUERY PLAN (SQLite). Only a fraction
+(SLOW_QUERY_SAMPLE_RATE) of slow statements is logged, and each statement
+statement is EXPLAINed at most once per SLOW_QUERY_EXPLAIN_INTERVAL seconds, so
+the log can stay on in production.
+"""
+import datetime
+import json
+import logging
+import os
+import random
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from typing import List, Optional
+from dotenv import load_dotenv
+
+import metrics
+from request_context import current_route
+
+load_dotenv()
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60"))
+SLOW_QUERY_LOG_PATH = os.getenv("SLOW_QUERY_LOG_PATH", "./runtime/slow_queries.log")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "3"))
+MAX_STATEMENT_CHARS = 4000
+
+SLOW_QUERIES = metrics.registry.counter(
+    "fleetflow_slow_queries", "Statements slower than SLOW_QUERY_MS (before sampling).", ("shape",))
+
+_logger: Optional[logging.Logger] = None
+_logger_lock = threading.Lock()
+_last_explained = {}
+
+
+def enabled() -> bool:
+    return SLOW_QUERY_MS > 0
+
+
+def _get_logger() -> logging.Logger:
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                os.makedirs(os.path.dirname(SLOW_QUERY_LOG_PATH) or ".", exist_ok=True)
+                handler = RotatingFileHandler(
+                    SLOW_QUERY_LOG_PATH, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                    backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger("fleetflow.slow_queries")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+
+def parameter_shape(parameters, executemany: bool):
+    """Types of the bound parameters, e.g. ["str", "int"] or {"rows": 500, "row": [...]}."""
+    def one(params):
+        if isinstance(params, dict):
+            return {k: type(v).__name__ for k, v in params.items()}
+        if isinstance(params, (list, tuple)):
+            return [type(v).__name__ for v in params]
+        return type(params).__name__
+
+    if executemany:
+        rows = list(parameters or [])
+        return {"rows": len(rows), "row": one(rows[0]) if rows else None}
+    return one(parameters)
+
+
+def _should_explain(statement: str, executemany: bool) -> bool:
+    if executemany or not statement.lstrip()[:6].upper().startswith(("SELECT", "WITH")):
+        return False
+    now = time.monotonic()
+    if now - _last_explained.get(statement, float("-inf")) < SLOW_QUERY_EXPLAIN_INTERVAL:
+        return False
+    if len(_last_explained) > 5000:
+        _last_explained.clear()
+    _last_explained[statement] = now
+    return True
+
+
+def explain(cursor, dialect_name: str, statement: str, parameters) -> Optional[List[str]]:
+    """Plan for `statement`, run on a new cursor of the same DBAPI connection."""
+    prefix = "EXPLAIN QUERY PLAN " if dialect_name == "sqlite" else "EXPLAIN "
+    plan_cursor = cursor.connection.cursor()
+    try:
+        plan_cursor.execute(prefix + statement, parameters)
+        rows = plan_cursor.fetchall()
+    except Exception as exc:
+        return [f"EXPLAIN failed: {exc}"]
+    finally:
+        plan_cursor.close()
+    if dialect_name == "sqlite":
+        # (id, parent, notused, detail)
+        return [str(row[-1]) for row in rows]
+    return [str(row[0]) for row in rows]
+
+
+def record(cursor, dialect_name: str, statement: str, parameters, executemany: bool, elapsed: float):
+    """Called from the engine hook for every statement over the threshold."""
+    shape = metrics.statement_shape(statement)
+    SLOW_QUERIES.labels(shape).inc()
+    if SLOW_QUERY_SAMPLE_RATE < 1.0 and random.random() >= SLOW_QUERY_SAMPLE_RATE:
+        return
+
+    entry = {
+        "ts": datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+        "duration_ms": round(elapsed * 1000, 2),
+        "route": current_route(),
+        "shape": shape,
+        "statement": statement[:MAX_STATEMENT_CHARS],
+        "parameters": parameter_shape(parameters, executemany),
+        "pid": os.getpid(),
+    }
+    if _should_explain(statement, executemany):
+        entry["plan"] = explain(cursor, dialect_name, statement, parameters)
+    try:
+        _get_logger().info(json.dumps(entry, default=str))
+    except OSError:
+        pass
+
+
+def read_entries(limit: int = 100, route: Optional[str] = None, min_ms: float = 0) -> List[dict]:
+    """Newest-first entries from the current log file and its rotated backups."""
+    entries: List[dict] = []
+    paths = [SLOW_QUERY_LOG_PATH] + [f"{SLOW_QUERY_LOG_PATH}.{i}" for i in range(1, SLOW_QUERY_LOG_BACKUPS + 1)]
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            continue
+        for line in reversed(lines):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if route and route not in (entry.get("route") or ""):
+                continue
+            if entry.get("duration_ms", 0) < min_ms:
+                continue
+            entries.append(entry)
+            if len(entries) >= limit:
+                return entries
+    return entries
@@ -0,0 +1,286 @@
+"""
+Vehicle telemetry ingestion: odometer, GPS and fuel-level pings.
+
+Pings arrive in batches (POST /api/telemetry) or as a stream (WS
+/ws/telemetry) and are appended to a per-worker in-memory buffer. A flusher
+task, started from the app lifespan, takes the whole buffer every
+TELEMETRY_FLUSH_INTERVAL_MS (sooner once TELEMETRY_FLUSH_ROWS are waiting)
+and appends it to the `telemetry_pings` table off the event loop, as
+executemany INSERTs of up to TELEMETRY_FLUSH_ROWS rows per transaction.
+Rows are never updated.
+
+Backpressure: the buffer holds at most TELEMETRY_BUFFER_MAX_PINGS. While a
+chunk is being written the next one collects in the buffer, so a database
+that cannot keep up fills it and then:
+- a batch that does not fit is refused whole with 503 + Retry-After;
+- a stream stops reading frames until the flusher has made room, so TCP
+  pushes back on the sender.
+Buffered pings are lost if the worker dies; at most one flush interval's worth.
+A chunk the database rejects (a ping whose vehicle was deleted after it was
+buffered) is retried without the pings of vanished vehicles, then in halves,
+so one bad ping does not cost the rest of the chunk.
+
+trip_distances_km() turns the stored pings into the distance each trip's
+vehicle covered since the trip started: the odometer delta, or the GPS path
+length when there are no odometer readings. Completing a trip stores it in
+Trip.distance_km and adds it to Vehicle.mileage.
+"""
+import asyncio
+import datetime
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, func, insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import metrics
+import models
+from database import SessionLocal, engine
+from invalidation import feed
+
+load_dotenv()
+
+TELEMETRY_BUFFER_MAX_PINGS = int(os.getenv("TELEMETRY_BUFFER_MAX_PINGS", "200000"))
+TELEMETRY_FLUSH_ROWS = int(os.getenv("TELEMETRY_FLUSH_ROWS", "20000"))
+TELEMETRY_FLUSH_INTERVAL_MS = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_MS", "500"))
+TELEMETRY_RETRY_AFTER = os.getenv("TELEMETRY_RETRY_AFTER", "1")
+
+TELEMETRY_PINGS = metrics.registry.counter(
+    "fleetflow_telemetry_pings", "Telemetry pings by outcome.", ("outcome",))
+TELEMETRY_FLUSH_SECONDS = metrics.registry.histogram(
+    "fleetflow_telemetry_flush_seconds", "Time to append one chunk (up to TELEMETRY_FLUSH_ROWS) of pings.")
+
+logger = logging.getLogger("fleetflow.telemetry")
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class TelemetryBuffer:
+    """Bounded buffer of ping rows drained by a background flusher."""
+
+    def __init__(self, max_pings: int, flush_rows: int, flush_interval_ms: float):
+        self.max_pings = max_pings
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000
+        self._rows: List[dict] = []
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._wake = asyncio.Event()   # enough rows waiting: flush now
+        self._room = asyncio.Event()   # a flush emptied the buffer
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _add(self, rows: List[dict]) -> bool:
+        with self._lock:
+            if len(self._rows) + len(rows) > self.max_pings:
+                return False
+            self._rows.extend(rows)
+            waiting = len(self._rows)
+        TELEMETRY_PINGS.labels("accepted").inc(len(rows))
+        if waiting >= self.flush_rows:
+            self._wake.set()
+        return True
+
+    def offer(self, rows: List[dict]) -> bool:
+        """Buffer all of `rows`, or none of them (counted as shed) if they do not fit."""
+        if self._add(rows):
+            return True
+        TELEMETRY_PINGS.labels("shed").inc(len(rows))
+        return False
+
+    async def put(self, rows: List[dict]):
+        """Buffer `rows`, waiting for the flusher to make room if needed. Nothing is shed."""
+        while not self._add(rows):
+            self._room.clear()
+            try:
+                await asyncio.wait_for(self._room.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # ---- flusher ----
+    def _write(self, rows: List[dict]):
+        # One transaction per TELEMETRY_FLUSH_ROWS, so a backlog never holds the
+        # database write lock long enough to time out trip and vehicle updates
+        for start in range(0, len(rows), self.flush_rows):
+            self._write_chunk(rows[start:start + self.flush_rows])
+
+    def _insert(self, rows: List[dict]):
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(insert(models.TelemetryPing), rows)
+        TELEMETRY_PINGS.labels("written").inc(len(rows))
+        TELEMETRY_FLUSH_SECONDS.observe(time.perf_counter() - started)
+
+    def _write_chunk(self, rows: List[dict], retried: bool = False):
+        try:
+            self._insert(rows)
+        except IntegrityError:
+            if not retried:
+                # Usually pings of a vehicle deleted since they were buffered: drop those, keep the rest
+                rows = _without_vanished_vehicles(rows)
+                if rows:
+                    self._write_chunk(rows, retried=True)
+            elif len(rows) == 1:
+                TELEMETRY_PINGS.labels("dropped").inc(1)
+                logger.warning("telemetry ping rejected by the database: %r", rows[0])
+            else:
+                half = len(rows) // 2
+                self._write_chunk(rows[:half], retried=True)
+                self._write_chunk(rows[half:], retried=True)
+        except SQLAlchemyError:
+            TELEMETRY_PINGS.labels("dropped").inc(len(rows))
+            logger.exception("telemetry flush failed, %d pings dropped", len(rows))
+
+    async def flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+        self._room.set()
+        if rows:
+            await run_in_threadpool(self._write, rows)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        self._closing = False
+        # Fresh events: they bind to the loop they are first awaited on
+        self._wake, self._room = asyncio.Event(), asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Not cancel(): that would abandon a chunk whose write is in progress
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+# Global singleton buffer
+telemetry_buffer = TelemetryBuffer(TELEMETRY_BUFFER_MAX_PINGS, TELEMETRY_FLUSH_ROWS, TELEMETRY_FLUSH_INTERVAL_MS)
+
+metrics.registry.gauge(
+    "fleetflow_telemetry_buffer_pings", "Pings waiting to be flushed.",
+    fn=lambda: len(telemetry_buffer),
+)
+
+
+class KnownVehicles:
+    """
+    Per-worker set of vehicle ids seen to exist. The API only soft-deletes
+    vehicles, but a reset or `generate_fleet --reset` deletes them outright,
+    so the set follows the "vehicle" invalidation channel: a changed id is
+    forgotten, a whole-table change clears it. A lookup that overlaps an
+    invalidation does not keep what it read.
+    """
+
+    def __init__(self):
+        self._ids: Set[str] = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        feed.subscribe("vehicle", self.invalidate)
+
+    def invalidate(self, vehicle_id: Optional[str] = None):
+        with self._lock:
+            self._generation += 1
+            if vehicle_id is None:
+                self._ids.clear()
+            else:
+                self._ids.discard(vehicle_id)
+
+    def missing(self, vehicle_ids: Set[str]) -> Set[str]:
+        feed.poll()
+        return vehicle_ids - self._ids
+
+    def load(self, vehicle_ids: Set[str]) -> Set[str]:
+        """Look `vehicle_ids` up in the database; returns (and remembers) those that exist."""
+        generation = self._generation
+        with SessionLocal() as db:
+            found = {row[0] for row in db.query(models.Vehicle.id).filter(models.Vehicle.id.in_(vehicle_ids))}
+        with self._lock:
+            self._ids.difference_update(vehicle_ids - found)
+            if generation == self._generation:
+                self._ids.update(found)
+        return found
+
+    def __contains__(self, vehicle_id: str) -> bool:
+        return vehicle_id in self._ids
+
+
+known_vehicles = KnownVehicles()
+
+
+async def known_vehicle_ids(vehicle_ids: Iterable[str]) -> Set[str]:
+    """The subset of `vehicle_ids` that exist; misses of the per-worker cache cost one query."""
+    ids = set(vehicle_ids)
+    missing = known_vehicles.missing(ids)
+    found = await run_in_threadpool(known_vehicles.load, missing) if missing else set()
+    return {i for i in ids if i in known_vehicles or i in found}
+
+
+def _without_vanished_vehicles(rows: List[dict]) -> List[dict]:
+    """`rows` minus the pings of vehicles no longer in the database (counted as rejected)."""
+    existing = known_vehicles.load({r["vehicle_id"] for r in rows})
+    kept = [r for r in rows if r["vehicle_id"] in existing]
+    if len(kept) < len(rows):
+        TELEMETRY_PINGS.labels("rejected").inc(len(rows) - len(kept))
+    return kept
+
+
+# ========================
+#  DISTANCE
+# ========================
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def trip_distances_km(db: Session, trip_ids: Iterable[str], end: datetime.datetime) -> Dict[str, Optional[float]]:
+    """
+    Distance each trip's vehicle covered between the trip's stored start_time
+    and `end`, per its pings (None without pings). Two queries for any number
+    of trips: odometer deltas grouped by trip, then GPS points for the rest.
+    """
+    ids = set(trip_ids)
+    distances: Dict[str, Optional[float]] = dict.fromkeys(ids)
+    if not ids:
+        return distances
+    Ping, Trip = models.TelemetryPing, models.Trip
+    window = (
+        Ping.vehicle_id == Trip.vehicle_id,
+        Ping.recorded_at >= Trip.start_time,
+        Ping.recorded_at <= end,
+    )
+    for trip_id, low, high in db.query(Trip.id, func.min(Ping.odometer_km), func.max(Ping.odometer_km)).join(
+        Ping, and_(*window, Ping.odometer_km.isnot(None)),
+    ).filter(Trip.id.in_(ids)).group_by(Trip.id):
+        distances[trip_id] = round(high - low, 3)
+
+    gps_only = [trip_id for trip_id, distance in distances.items() if distance is None]
+    if gps_only:
+        points: Dict[str, list] = {}
+        for trip_id, lat, lon in db.query(Trip.id, Ping.lat, Ping.lon).join(
+            Ping, and_(*window, Ping.lat.isnot(None), Ping.lon.isnot(None)),
+        ).filter(Trip.id.in_(gps_only)).order_by(Trip.id, Ping.recorded_at):
+            points.setdefault(trip_id, []).append((lat, lon))
+        for trip_id, path in points.items():
+            if len(path) >= 2:
+                distances[trip_id] = round(sum(_haversine_km(*a, *b) for a, b in zip(path, path[1:])), 3)
+    return distances
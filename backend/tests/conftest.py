@@ -0,0 +1,32 @@
+"""
+Tests run the app in-process against a throwaway sqlite database. The
+environment is set before anything imports `database` or `main`.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_WORKDIR = tempfile.mkdtemp(prefix="fleetflow-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_WORKDIR, 'test.db')}"
+os.environ["INVALIDATION_FEED_PATH"] = os.path.join(_WORKDIR, "invalidation.log")
+os.environ["PROFILE_DIR"] = os.path.join(_WORKDIR, "profiles")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as c:
+        assert c.post("/api/seed").status_code == 200
+        yield c
+
+
+def login(client, email: str, password: str = "admin123") -> dict:
+    token = client.post("/auth/login", json={"email": email, "password": password}).json()["token"]
+    return {"Authorization": f"Bearer {token}"}
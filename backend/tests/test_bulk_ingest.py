@@ -0,0 +1,47 @@
+"""Streamed CSV parsing of the bulk ingest endpoints."""
+from routers import bulk_router
+
+from conftest import login
+
+
+def _chunks(body: bytes, size: int = 7):
+    # Small chunks so records and quoted fields straddle chunk boundaries
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def test_quoted_fields_may_span_lines(client):
+    headers = {**login(client, "admin@fleetflow.com"), "Content-Type": "text/csv"}
+    vehicle_id = client.get("/api/vehicles", headers=headers).json()[0]["id"]
+    body = (
+        "vehicle_id,description,cost\n"
+        f'{vehicle_id},"Brake pads\nand rotors",120\n'
+        f'{vehicle_id},"Oil, ""synthetic""",40\n'
+        f"{vehicle_id},missing cost\n"
+        f'{vehicle_id},"Wipers\r\n\r\nfront",15\n'
+    ).encode()
+
+    r = client.post("/api/bulk/maintenance?mark_in_shop=false", headers=headers, content=_chunks(body))
+    assert r.status_code == 200, r.text
+    result = r.json()
+    assert (result["received"], result["inserted"]) == (4, 3)
+    assert [e["line"] for e in result["errors"]] == [5]
+
+    descriptions = {m["description"] for m in client.get("/api/maintenance", headers=headers).json()}
+    assert {"Brake pads\nand rotors", 'Oil, "synthetic"', "Wipers\n\nfront"} <= descriptions
+
+
+def test_unclosed_quote_is_reported_at_its_line(client):
+    headers = {**login(client, "admin@fleetflow.com"), "Content-Type": "text/csv"}
+    body = b'plate_number,vehicle_type,max_weight\nQQ-9,"Van,900\n'
+    result = client.post("/api/bulk/vehicles", headers=headers, content=body).json()
+    assert result["inserted"] == 0
+    assert result["errors"] == [{"line": 2, "error": "Quoted field is not closed"}]
+
+
+def test_overlong_line_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(bulk_router, "BULK_MAX_LINE_BYTES", 64)
+    headers = {**login(client, "admin@fleetflow.com"), "Content-Type": "text/csv"}
+    body = b"plate_number,vehicle_type,max_weight\r" + b"QQ-1,Van,900\r" * 20   # CR-only line endings
+    r = client.post("/api/bulk/vehicles", headers=headers, content=_chunks(body))
+    assert r.status_code == 413
@@ -0,0 +1,33 @@
+"""A principal read before a suspension commits is not cached past it."""
+import pytest
+from fastapi import HTTPException
+
+import auth
+import models
+from database import SessionLocal
+
+
+def test_lookup_racing_a_suspension_does_not_cache_the_old_principal(client):
+    r = client.post("/auth/register", json={
+        "name": "Racing Rita", "email": "rita@fleetflow.com", "password": "secret1", "role": "Dispatcher",
+    })
+    assert r.status_code == 201, r.text
+    user_id = r.json()["id"]
+    token = client.post("/auth/login", json={"email": "rita@fleetflow.com", "password": "secret1"}).json()["token"]
+
+    # A cache miss reads the still-active row ...
+    auth.principal_cache.invalidate(user_id)
+    generation = auth.principal_cache.generation()
+    stale = auth.Principal(
+        id=user_id, name="Racing Rita", email="rita@fleetflow.com", role="Dispatcher", is_active=True,
+    )
+    # ... an admin suspends the user and commits ...
+    with SessionLocal() as db:
+        db.get(models.User, user_id).is_active = False
+        db.commit()
+    # ... and only then does the lookup try to cache what it read
+    auth.principal_cache.put(stale, generation)
+
+    with pytest.raises(HTTPException) as exc:
+        auth.resolve_principal(token)
+    assert exc.value.status_code == 403
@@ -0,0 +1,35 @@
+"""In-memory buckets stay bounded and keep each class's own refill window."""
+from rate_limit import MemoryStore, RATE_LIMITS
+
+
+def test_allowed_traffic_from_many_callers_is_pruned():
+    store = MemoryStore()
+    rate, burst = RATE_LIMITS["reads"]
+    now = 1000.0
+    for i in range(10_000):
+        assert store.take(f"ip:10.0.{i // 256}.{i % 256}:reads", rate, burst, now) == 0.0
+    # Every one of those buckets is full again long before the next sweep
+    later = now + store.prune_interval + burst / rate
+    store.take("ip:192.168.0.1:reads", rate, burst, later)
+    assert len(store._buckets) == 1
+
+
+def test_reads_denial_does_not_reset_an_idle_exports_bucket():
+    store = MemoryStore()
+    reads_rate, reads_burst = 1.0, 1.0          # refills in 1 s
+    exports_rate, exports_burst = 0.1, 3.0      # refills in 30 s
+    now = 1000.0
+    for _ in range(3):
+        assert store.take("user:1:exports", exports_rate, exports_burst, now) == 0.0
+    assert store.take("user:1:exports", exports_rate, exports_burst, now) > 0
+
+    # Seconds later another caller is denied reads and a sweep runs
+    store._next_prune = 0.0
+    now += 12
+    store.take("user:2:reads", reads_rate, reads_burst, now)
+    store.take("user:3:reads", reads_rate, reads_burst, now)
+    assert store.take("user:2:reads", reads_rate, reads_burst, now) > 0
+
+    # The exports bucket has refilled one token in 12 s, not a full burst
+    assert store.take("user:1:exports", exports_rate, exports_burst, now) == 0.0
+    assert store.take("user:1:exports", exports_rate, exports_burst, now) > 0
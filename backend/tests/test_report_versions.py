@@ -0,0 +1,39 @@
+"""Cached reports stay keyed to the data across invalidation-feed rotations."""
+import invalidation
+from data_versions import versions
+from invalidation import feed
+
+from conftest import login
+
+
+def _rotate(monkeypatch):
+    """Push the feed past its size limit once, start the next file, and let this worker notice."""
+    monkeypatch.setattr(invalidation, "INVALIDATION_FEED_MAX_BYTES", 256)
+    feed.publish("test-rotation", ["x" * 300])
+    monkeypatch.setattr(invalidation, "INVALIDATION_FEED_MAX_BYTES", 1024 * 1024)
+    feed.publish("test-rotation", ["y"])
+    feed.poll()
+
+
+def test_base_version_never_repeats_across_rotations(monkeypatch):
+    bases = []
+    for _ in range(4):
+        _rotate(monkeypatch)
+        bases.append(versions.get(["fuel_logs"]))
+    assert len(set(bases)) == len(bases)
+
+
+def test_report_written_between_rotations_is_not_served_stale(client, monkeypatch):
+    headers = login(client, "admin@fleetflow.com")
+    _rotate(monkeypatch)
+    before = client.get("/api/reports/monthly-expenses", headers=headers).json()
+
+    trip_id = client.get("/api/trips", headers=headers).json()[0]["id"]
+    r = client.post("/api/fuel", headers=headers, json={"trip_id": trip_id, "fuel_used": 1, "fuel_cost": 99999})
+    assert r.status_code == 201, r.text
+    after_write = client.get("/api/reports/monthly-expenses", headers=headers).json()
+    assert after_write != before
+
+    _rotate(monkeypatch)
+    _rotate(monkeypatch)
+    assert client.get("/api/reports/monthly-expenses", headers=headers).json() == after_write
@@ -0,0 +1,45 @@
+"""Sending drafts reserves the vehicle and driver exactly once under concurrency."""
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from conftest import login
+
+SENDERS = 8
+
+
+def test_concurrent_sends_of_one_vehicle_book_it_once(client):
+    headers = login(client, "dispatcher@fleetflow.com")
+    today = datetime.date.today().isoformat()
+    vehicle = next(v for v in client.get("/api/vehicles", headers=headers).json() if v["status"] == "available")
+    drivers = [
+        d for d in client.get("/api/drivers", headers=headers).json()
+        if d["duty_status"] == "on" and d["license_expiry_date"] > today
+    ]
+    assert drivers
+
+    drafts = []
+    for i in range(SENDERS):
+        r = client.post("/api/trips", headers=headers, json={
+            "vehicle_id": vehicle["id"],
+            "driver_id": drivers[i % len(drivers)]["id"],
+            "destination": f"Depot {i}",
+            "cargo_weight": 1,
+        })
+        assert r.status_code == 201, r.text
+        drafts.append(r.json()["id"])
+
+    start = Barrier(SENDERS)
+
+    def send(trip_id):
+        start.wait()
+        return client.patch(f"/api/trips/{trip_id}/status", headers=headers, json={"status": "sent"}).status_code
+
+    with ThreadPoolExecutor(SENDERS) as pool:
+        codes = list(pool.map(send, drafts))
+
+    assert sorted(codes) == [200] + [409] * (SENDERS - 1)
+    trips = {t["id"]: t for t in client.get("/api/trips", headers=headers).json()}
+    assert [trips[t]["status"] for t in drafts].count("sent") == 1
+    vehicles = {v["id"]: v for v in client.get("/api/vehicles", headers=headers).json()}
+    assert vehicles[vehicle["id"]]["status"] == "on_trip"
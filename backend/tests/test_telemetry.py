@@ -0,0 +1,55 @@
+"""Telemetry pings for deleted vehicles are refused and never cost other vehicles' pings."""
+import datetime
+
+from sqlalchemy import create_engine, event
+
+import models
+import telemetry
+from availability_index import publish_vehicle_changes
+from database import DATABASE_URL, SessionLocal
+
+from conftest import login
+
+
+def _ping(vehicle_id: str, odometer: float = 1.0) -> dict:
+    return {"vehicle_id": vehicle_id, "recorded_at": datetime.datetime.utcnow(), "odometer_km": odometer,
+            "lat": None, "lon": None, "fuel_level_pct": None}
+
+
+def test_deleted_vehicle_is_forgotten(client):
+    headers = login(client, "admin@fleetflow.com")
+    vehicle = client.post("/api/vehicles", headers=headers, json={
+        "plate_number": "TEL-DEL-1", "vehicle_type": "Van", "max_weight": 500,
+    }).json()
+    body = {"pings": [{"vehicle_id": vehicle["id"], "odometer_km": 1}]}
+    assert client.post("/api/telemetry", headers=headers, json=body).json()["accepted"] == 1
+    assert vehicle["id"] in telemetry.known_vehicles
+
+    with SessionLocal() as db:   # a hard delete, as a reset does
+        db.delete(db.get(models.Vehicle, vehicle["id"]))
+        db.commit()
+    assert client.post("/api/telemetry", headers=headers, json=body).json()["rejected"] == 1
+
+    seeded = client.get("/api/vehicles", headers=headers).json()[0]["id"]
+    client.post("/api/telemetry", headers=headers, json={"pings": [{"vehicle_id": seeded, "odometer_km": 1}]})
+    assert seeded in telemetry.known_vehicles
+    publish_vehicle_changes()   # whole table changed, as after a reset
+    assert seeded not in telemetry.known_vehicles
+
+
+def test_orphan_ping_does_not_drop_its_chunk(client, monkeypatch):
+    headers = login(client, "admin@fleetflow.com")
+    vehicle_id = client.get("/api/vehicles", headers=headers).json()[0]["id"]
+    strict = create_engine(DATABASE_URL)
+    event.listen(strict, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+    monkeypatch.setattr(telemetry, "engine", strict)
+
+    def stored() -> int:
+        with SessionLocal() as db:
+            return db.query(models.TelemetryPing).filter(models.TelemetryPing.vehicle_id == vehicle_id).count()
+
+    before = stored()
+    rows = [_ping(vehicle_id, i) for i in range(10)]
+    rows.insert(4, _ping("no-such-vehicle"))
+    telemetry.TelemetryBuffer(100, 100, 500)._write(rows)
+    assert stored() == before + 10
@@ -4,8 +4,10 @@ All connected clients receive live updates on fleet events.
 """
 import json
 import asyncio
+import time
 from typing import Dict, Set
 from fastapi import WebSocket
+import metrics
 
 
 class ConnectionManager:
@@ -23,13 +25,21 @@ class ConnectionManager:
         """Broadcast an event with optional payload to all connected clients."""
         message = json.dumps({"event": event, "data": data or {}})
         dead = set()
-        for ws in self.active_connections:
+        started = time.perf_counter()
+        # Iterate over a snapshot: clients may connect/disconnect while a send is awaited
+        targets = list(self.active_connections)
+        for ws in targets:
             try:
                 await ws.send_text(message)
             except Exception:
                 dead.add(ws)
         for ws in dead:
             self.active_connections.discard(ws)
+        metrics.WS_BROADCAST_DURATION.labels(event).observe(time.perf_counter() - started)
+        if len(targets) > len(dead):
+            metrics.WS_MESSAGES.labels("sent").inc(len(targets) - len(dead))
+        if dead:
+            metrics.WS_MESSAGES.labels("failed").inc(len(dead))
 
     async def send_alert(self, alert_type: str, message: str, severity: str, entity_id: str):
         await self.broadcast("alert", {
@@ -51,3 +61,8 @@ class ConnectionManager:
 
 # Global singleton manager
 manager = ConnectionManager()
+
+metrics.registry.gauge(
+    "fleetflow_ws_connections", "Open WebSocket connections.",
+    fn=lambda: len(manager.active_connections),
+)
@@ -4,10 +4,26 @@ const BASE = 'http://localhost:8001';
 
 const api = axios.create({ baseURL: BASE });
 
+// crypto.randomUUID only exists in secure contexts (HTTPS or localhost), not on plain-HTTP LAN origins
+const newIdempotencyKey = () => {
+    if (globalThis.crypto?.randomUUID) return crypto.randomUUID();
+    const bytes = new Uint8Array(16);
+    if (globalThis.crypto?.getRandomValues) crypto.getRandomValues(bytes);
+    else for (let i = 0; i < 16; i++) bytes[i] = Math.floor(Math.random() * 256);
+    bytes[6] = (bytes[6] & 0x0f) | 0x40;
+    bytes[8] = (bytes[8] & 0x3f) | 0x80;
+    const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+};
+
 // Attach JWT on every request
 api.interceptors.request.use((config) => {
     const token = localStorage.getItem('token');
     if (token) config.headers.Authorization = `Bearer ${token}`;
+    // One key per logical write; a retry of the same config reuses it and gets the stored response
+    if (['post', 'patch'].includes(config.method) && !config.headers['Idempotency-Key']) {
+        config.headers['Idempotency-Key'] = newIdempotencyKey();
+    }
     return config;
 });
 
@@ -16,12 +16,10 @@ export default function Dashboard() {
 
     const fetchData = async () => {
         try {
-            const [statsRes, tripsRes] = await Promise.all([
-                api.get('/api/stats'),
-                api.get('/api/trips'),
-            ]);
-            setStats(statsRes.data);
-            setTrips(tripsRes.data);
+            // One round-trip; sections the role cannot read are simply absent
+            const { data } = await api.get('/api/dashboard', { params: { sections: 'stats,trips' } });
+            if (data.stats) setStats(data.stats);
+            setTrips(data.trips || []);
         } catch (err) {
             console.error('Dashboard fetch error:', err);
         }
@@ -40,6 +38,8 @@ export default function Dashboard() {
                     if (msg.event === 'dashboardUpdate') {
                         if (msg.data?.active_vehicles !== undefined) setStats(msg.data);
                         else fetchData();
+                    } else if (msg.event === 'tripStatusBatchUpdated') {
+                        fetchData();
                     } else if (msg.event === 'alert') {
                         setAlerts(prev => [msg.data, ...prev].slice(0, 5));
                     }
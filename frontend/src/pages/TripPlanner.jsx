@@ -25,7 +25,7 @@ export default function TripPlanner() {
             ws.onmessage = (event) => {
                 try {
                     const msg = JSON.parse(event.data);
-                    if (msg.event === 'dashboardUpdate' || msg.event === 'tripStatusUpdated') loadData();
+                    if (msg.event === 'dashboardUpdate' || msg.event === 'tripStatusUpdated' || msg.event === 'tripStatusBatchUpdated') loadData();
                 } catch { }
             };
         } catch { }